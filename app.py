@@ -1,194 +1,1022 @@
 # app.py
+import time
+
+_STARTUP_BEGIN = time.perf_counter()  # Vor allen übrigen Imports, für die Startzeiten (startup_profile.py)
+
 import gevent.monkey
 
 gevent.monkey.patch_all()  # Wichtig: Frühzeitiges Patching für Stabilität mit gevent
 
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit
-from models import init_db, SessionLocal, Player, Route, PokemonCatch, GlobalOrder, LevelCap, reset_full_db
+from startup_profile import StartupProfile
+
+_startup = StartupProfile(_STARTUP_BEGIN)
+_startup.mark('gevent und Monkey-Patching')
+
+from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask_socketio import SocketIO, emit, join_room
+from sqlalchemy import insert, select, delete, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import (engine, read_engine, SessionLocal, ReadSessionLocal, Run, Player, Route, PokemonCatch,
+                    GlobalOrder, LevelCap, JournalEvent, JournalSnapshot, DEFAULT_RUN_ID, create_run, delete_run,
+                    restore_run, read_run_data)
+from pokemon_search import PokemonNameIndex
+from write_queue import WriteBehindQueue, WRITE_MODES, WRITE_MODE_SYNC, WRITE_MODE_ASYNC
+from broadcast import (EmitAggregator, run_room, compact_room, run_id_from_room, compact_run_id_from_room,
+                       entries_from_message, CONTROL_ROOM)
+from pubsub import create_client_manager, start_listening
+from run_state import RunState
+from link_view import LinkView
+from metrics import REGISTRY, instrument_app, instrument_engine, instrument_pool
+from db_session import RequestSessions
+from wire_format import (NameDictionary, JSON_MIMETYPE, FORMAT_NAMES, available_mimetypes, encode_snapshot,
+                         encode_changes, serialize, gzip_compress)
+from jobs import JobManager, chunked_delete, count_rows
+from config_manager import ConfigManager, ConfigError, CONFIG_FILES, apply_list_diff
+from journal import (record_event, write_snapshot, replay_state, find_undo_target, read_history, begin_reset,
+                     complete_reset)
+from state_store import RunStore, STATE_CHANGE_EVENTS, STATE_EVENTS
+from stats import StatsEngine
+from db_setup import prepare_database, sync_level_caps
+from run_archive import (ArchiveError, RunExistsError, NDJSON_MIMETYPE, GZIP_MIMETYPE, export_lines, encode_chunks,
+                         open_archive, import_run)
 import json
 import os
 import threading
-import time
 import socket
+import uuid
+import hashlib
+import atexit
+
+_startup.mark('Imports')
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'YOUR_SUPER_SECRET_KEY_HERE_CHANGE_THIS_IN_PRODUCTION'  # Wichtig: In Produktion ändern!
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')  # async_mode auf 'gevent' setzen
+# Schreibmodus für Fänge und Routenstatus: 'sync' (Standard), 'batched' (Group-Commit) oder 'async' (Write-Behind)
+app.config['WRITE_MODE'] = os.environ.get('SOULLINK_WRITE_MODE', WRITE_MODE_SYNC)
+app.config['WRITE_FLUSH_INTERVAL_MS'] = int(os.environ.get('SOULLINK_WRITE_FLUSH_INTERVAL_MS', 5))
+app.config['WRITE_FLUSH_MAX_OPS'] = int(os.environ.get('SOULLINK_WRITE_FLUSH_MAX_OPS', 100))
+# So lange (Sekunden) wartet eine Anfrage im Modus 'batched' höchstens auf den gemeinsamen Commit
+app.config['WRITE_WAIT_TIMEOUT'] = float(os.environ.get('SOULLINK_WRITE_WAIT_TIMEOUT', 10))
+if app.config['WRITE_MODE'] not in WRITE_MODES:
+    raise ValueError(f"Unbekannter SOULLINK_WRITE_MODE '{app.config['WRITE_MODE']}', erlaubt: {', '.join(WRITE_MODES)}")
+# Abstand in Sekunden, in dem die Konfigurationsdateien auf Änderungen geprüft werden (0 = aus)
+app.config['CONFIG_WATCH_INTERVAL'] = float(os.environ.get('SOULLINK_CONFIG_WATCH_INTERVAL', 1.0))
+# Zeitfenster, in dem Socket-Events eines Runs zu einem Frame zusammengefasst werden (0 = sofort senden)
+app.config['EMIT_TICK_MS'] = int(os.environ.get('SOULLINK_EMIT_TICK_MS', 10))
+# Mehr-Worker-Betrieb: Message-Queue, über die alle Worker Events austauschen (memory://, sqlite:///bus.db,
+# redis://...). Ohne Angabe läuft alles in einem Prozess wie bisher.
+app.config['MESSAGE_QUEUE'] = os.environ.get('SOULLINK_MESSAGE_QUEUE') or None
+CLUSTERED = app.config['MESSAGE_QUEUE'] is not None
+# Snapshots ab dieser Größe (Bytes) werden gzip-komprimiert, wenn der Client es anbietet (Accept-Encoding)
+app.config['GZIP_MIN_BYTES'] = int(os.environ.get('SOULLINK_GZIP_MIN_BYTES', 1024))
+# Anfragen ab dieser Dauer werden samt ihrer langsamsten SQL-Statements geloggt (Standard: aus)
+app.config['SLOW_REQUEST_MS'] = float(os.environ['SOULLINK_SLOW_REQUEST_MS']) if os.environ.get(
+    'SOULLINK_SLOW_REQUEST_MS') else None
+# So lange (Sekunden) darf /api/stats eine ältere Fassung ausliefern, bevor sie neu erzeugt wird
+app.config['STATS_MAX_AGE'] = float(os.environ.get('SOULLINK_STATS_MAX_AGE', 2.0))
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent',  # async_mode auf 'gevent' setzen
+                    client_manager=create_client_manager(app.config['MESSAGE_QUEUE']) if CLUSTERED else None)
+_emitter = EmitAggregator(socketio, tick=app.config['EMIT_TICK_MS'] / 1000)
+
+# --- Metriken (Prometheus-Textformat unter /metrics) ---
+instrument_engine(engine)
+instrument_engine(read_engine)
+instrument_pool(engine, 'write')
+instrument_pool(read_engine, 'read')
+instrument_app(app, slow_request_ms=app.config['SLOW_REQUEST_MS'])
+SNAPSHOT_SERIALIZE = REGISTRY.histogram('soullink_snapshot_serialize_seconds',
+                                        'Serialisierung des Zustands für /api/data (einmal pro Version und Format).',
+                                        ('format',))
+STATS_REBUILD = REGISTRY.histogram('soullink_stats_rebuild_seconds', 'Neuaufbau der Statistik per SQL.')
 
 # --- Globale Config-Verwaltung ---
 # Verwenden wir ein Dictionary, das wir neu laden können
 _app_config_data = {
     "ALL_ROUTES": [],
-    "ALL_POKEMON_NAMES": []
+    "ALL_POKEMON_NAMES": [],
+    "CONFIG_HASH": None,  # Inhalts-Hash des Config-Bundles, ändert sich nur mit den Namenslisten
+    "CONFIG_BUNDLE_BODY": None,  # Vorserialisiertes Bundle für /api/config_bundle
+    "NAME_DICTIONARY": None,  # Namensindizes des Bundles für die kompakte Darstellung (wire_format.py)
+    "POKEMON_INDEX": PokemonNameIndex([]),  # Suchindex für /api/pokemon/search
+}
+
+
+def _rebuild_config_bundle():
+    """Serialisiert das Config-Bundle neu; es wird über seinen Inhalts-Hash adressiert."""
+    bundle = {
+        'all_pokemon_names': _app_config_data["ALL_POKEMON_NAMES"],
+        'all_route_names': _app_config_data["ALL_ROUTES"],
+    }
+    config_hash = hashlib.sha256(app.json.dumps(bundle).encode('utf-8')).hexdigest()[:16]
+    bundle['config_hash'] = config_hash
+    _app_config_data["CONFIG_BUNDLE_BODY"] = app.json.dumps(bundle)
+    _app_config_data["CONFIG_HASH"] = config_hash
+    _app_config_data["NAME_DICTIONARY"] = NameDictionary(bundle)
+
+
+# Namenslisten im Speicher und ihr Schlüssel im Config-Bundle
+_CONFIG_LISTS = {
+    'routes.json': ("ALL_ROUTES", 'all_route_names'),
+    'pokemon_names.json': ("ALL_POKEMON_NAMES", 'all_pokemon_names'),
 }
 
 
-def _load_json_data_internal(filename):
-    """Interne Hilfsfunktion zum Laden einer JSON-Datei, auch für Config-Endpunkte."""
-    # Verwende os.path.abspath(__file__) um den absoluten Pfad des Skripts zu erhalten
-    # und dann os.path.join, um den vollständigen Pfad zur JSON-Datei zu bilden.
-    filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+def _on_config_file_changed(filename, new, diff):
+    """Übernimmt eine geänderte Konfigurationsdatei (siehe ConfigManager.check)."""
+    if filename == 'level_caps.json':
+        _sync_level_caps(new)
+        return
+    data_key, bundle_key = _CONFIG_LISTS[filename]
+    previous_hash = _app_config_data["CONFIG_HASH"]
+    # Nur die geänderten Einträge ersetzen; die Listen bleiben dieselben Objekte
+    apply_list_diff(_app_config_data[data_key], diff)
+    if filename == 'pokemon_names.json':
+        # Index vollständig neu bauen und erst danach austauschen, damit parallele Suchen nie einen halben Index sehen
+        _app_config_data["POKEMON_INDEX"] = PokemonNameIndex(_app_config_data["ALL_POKEMON_NAMES"])
+    _rebuild_config_bundle()
+    print(f"{filename} geändert ({len(diff)} Abschnitte), neuer Config-Hash {_app_config_data['CONFIG_HASH']}.")
+    # Clients mit dem vorherigen Bundle wenden nur das Diff an, alle anderen laden das Bundle über den Hash
+    broadcast_config_change('config_changed', {'filename': filename, 'previous_hash': previous_hash,
+                                               'config_hash': _app_config_data["CONFIG_HASH"],
+                                               'diff': {bundle_key: diff}})
+
+
+def _sync_level_caps(level_caps, broadcast=True):
+    """Gleicht die LevelCap-Zeilen aller Runs mit level_caps.json ab (db_setup.sync_level_caps), verteilt die Diffs."""
+    session = get_db_session()
     try:
-        if not os.path.exists(filepath):
-            print(f"Warning: {filename} not found at {filepath}. Returning empty list.")
-            return []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from {filename} at {filepath}. File might be corrupted.")
-        return []
+        changes = sync_level_caps(session, level_caps)
+        session.commit()
     except Exception as e:
-        print(f"An unexpected error occurred while loading {filename} from {filepath}: {e}")
-        return []
+        session.rollback()
+        print(f"Fehler beim Abgleich der Level-Caps mit level_caps.json: {e}")
+        return
+    finally:
+        session.close()
+    if changes:
+        print(f"Level-Caps aus level_caps.json in {len(changes)} Run(s) übernommen.")
+    if broadcast:
+        for run_id, diff in changes:
+            broadcast_change(run_id, 'level_caps_updated', diff)
+
+
+_config_files = ConfigManager(os.path.dirname(os.path.abspath(__file__)), on_change=_on_config_file_changed)
 
 
 def reload_app_configs():
-    """Lädt die globalen Konfigurationen (Routen, Pokemon-Namen) neu."""
-    print("Reloading application configurations (ALL_ROUTES, ALL_POKEMON_NAMES)...")
-    _app_config_data["ALL_ROUTES"] = [item['name'] for item in _load_json_data_internal('routes.json')]
-    _app_config_data["ALL_POKEMON_NAMES"] = [item['name'] for item in _load_json_data_internal('pokemon_names.json')]
-    print(
-        f"Loaded {len(_app_config_data['ALL_ROUTES'])} routes and {len(_app_config_data['ALL_POKEMON_NAMES'])} pokemon names.")
+    """Liest geänderte Konfigurationsdateien neu ein und übernimmt nur die Unterschiede."""
+    return _config_files.check()
 
 
 # Lade die Configs beim App-Start initial
-reload_app_configs()
+_config_files.load_all()
+_app_config_data["ALL_ROUTES"] = list(_config_files.data['routes.json'])
+_app_config_data["ALL_POKEMON_NAMES"] = list(_config_files.data['pokemon_names.json'])
+_app_config_data["POKEMON_INDEX"] = PokemonNameIndex(_app_config_data["ALL_POKEMON_NAMES"])
+_rebuild_config_bundle()
+print(f"Loaded {len(_app_config_data['ALL_ROUTES'])} routes and {len(_app_config_data['ALL_POKEMON_NAMES'])} "
+      f"pokemon names (config hash {_app_config_data['CONFIG_HASH']}).")
+_startup.mark('Konfigurationsdateien')
 
 # Jetzt greifen wir auf die globalen Daten über _app_config_data zu
-# Diese Variablen werden beim initialen Start gesetzt und dann über _app_config_data aktualisiert
-# Sie sind im Grunde nur Aliasse für die Daten in _app_config_data
+# Die Listen werden bei Änderungen nur verändert, nie ersetzt; die Aliasse bleiben also aktuell
 ALL_ROUTES = _app_config_data["ALL_ROUTES"]
 ALL_POKEMON_NAMES = _app_config_data["ALL_POKEMON_NAMES"]
 
 # --- Datenbank-Initialisierung beim Start der App ---
-with app.app_context():
-    init_db()
+# Ohne Änderungen an Schema oder Seed nur ein Abgleich des Stempels; level_caps.json ist schon validiert geladen.
+# Im Mehr-Worker-Betrieb hat das der Launcher (cluster.py) einmal für alle Worker erledigt.
+if not CLUSTERED:
+    with app.app_context():
+        prepare_database(_config_files.data['level_caps.json'], on_phase=_startup.mark)
+
+
+# --- Datenbank-Sessions ---
+# Handler nutzen die Sessions ihres Requests (_sessions.write() bzw. _sessions.read() für reine Lesezugriffe),
+# geschlossen werden sie im Teardown. Code ohne Request öffnet eigene Sessions über get_db_session().
+_sessions = RequestSessions(SessionLocal, ReadSessionLocal, app)
 
 
-# --- Hilfsfunktion für Datenbank-Session ---
 def get_db_session():
+    """Eigene Session für Code ohne Request (Hintergrund-Greenlets, Start); der Aufrufer schließt sie."""
     return SessionLocal()
 
 
+# --- Zustand pro Run: Snapshot-Cache für /api/data und Change-Log für die Delta-Synchronisation ---
+_BOOT_ID = uuid.uuid4().hex[:8]  # Damit ETags und Versionen eines alten Prozesses nach einem Neustart nicht mehr passen
+if CLUSTERED:
+    # Versionen kommen aus der Datenbank und gelten für alle Worker und über Neustarts hinweg
+    _BOOT_ID = 'cluster-' + hashlib.sha256(app.config['MESSAGE_QUEUE'].encode('utf-8')).hexdigest()[:8]
+_run_states = {}  # run_id -> RunState, nur für Runs, die es in der Datenbank gibt
+_run_states_lock = threading.Lock()
+
+
+def get_run_state(run_id):
+    """Gibt den RunState eines Runs zurück oder None, wenn es den Run nicht gibt."""
+    state = _run_states.get(run_id)
+    if state is not None:
+        return state
+    with _sessions.read_scope() as session:
+        version = session.scalar(select(Run.state_version).where(Run.id == run_id))
+    if version is None:
+        return None
+    with _run_states_lock:
+        # Im Mehr-Worker-Betrieb setzt der Change-Log an der aktuellen Version aus der Datenbank an
+        return _run_states.setdefault(run_id, RunState(run_id, version=version if CLUSTERED else 0))
+
+
+def _run_not_found(run_id):
+    return jsonify({'error': f'Run mit ID {run_id} nicht gefunden.'}), 404
+
+
+def broadcast_change(run_id, event, data=None):
+    """Erhöht die Zustandsversion des Runs, legt die Änderung im Change-Log ab und sendet sie per SocketIO."""
+    seqs = broadcast_changes(run_id, [(event, data)])
+    return seqs[0] if seqs else None
+
+
+def broadcast_changes(run_id, changes):
+    """Wie broadcast_change für mehrere (event, data)-Paare; gibt die vergebenen Sequenznummern zurück.
+
+    Gesendet wird über den EmitAggregator in den Raum des Runs, so dass Änderungen aus einem kurzen
+    Zeitfenster als ein Frame rausgehen.
+    """
+    state = get_run_state(run_id)
+    if state is None:
+        return []
+    if not CLUSTERED:
+        def publish(recorded):
+            _emitter.emit(run_room(run_id), recorded)
+
+        with state.lock:
+            entries = state.record(changes, publish=publish)
+            _update_store(state, entries)
+            # Link-Sicht inkrementell nachziehen; ihre Events folgen direkt auf die auslösenden Änderungen
+            derived = _derive_link_changes(state, entries)
+            if derived:
+                state.record(derived, publish=publish)
+        return [entry['seq'] for entry in entries]
+
+    # Mehr-Worker-Betrieb: Die Datenbank vergibt die Sequenznummern, in den Change-Log kommen die
+    # Einträge erst über den Bus (_on_cluster_message), auf allen Workern auf demselben Weg
+    with state.lock:
+        seqs = _allocate_seqs(run_id, len(changes))
+        state.local_seqs.update(seqs)  # Die Link-Events dazu sendet dieser Worker, sobald sie vom Bus zurückkommen
+        entries = [{'seq': seq, 'event': event, 'data': dict(data or {}, seq=seq)}
+                   for seq, (event, data) in zip(seqs, changes)]
+        _emitter.emit(run_room(run_id), entries)
+    return seqs
+
+
+def _encode_compact_frame(run_id, entries):
+    """Frame für die Clients im kompakten Format (siehe EmitAggregator); None, wenn keiner zuhört."""
+    # Im Mehr-Worker-Betrieb können die Zuhörer an anderen Workern hängen, dort wird immer kodiert
+    if not CLUSTERED and not socketio.server.manager.rooms.get('/', {}).get(compact_room(run_id)):
+        return None
+    return encode_changes(entries, _app_config_data["NAME_DICTIONARY"])
+
+
+_emitter.compact_encoder = _encode_compact_frame
+
+
+def _allocate_seqs(run_id, count):
+    """Reserviert `count` Sequenznummern eines Runs in der Datenbank (atomar über alle Worker)."""
+    session = get_db_session()
+    try:
+        last = session.execute(update(Run).where(Run.id == run_id)
+                               .values(state_version=Run.state_version + count)
+                               .returning(Run.state_version)).scalar()
+        session.commit()
+    finally:
+        session.close()
+    if last is None:
+        return []  # Run wurde inzwischen gelöscht
+    return list(range(last - count + 1, last + 1))
+
+
+def _db_state_version(run_id):
+    with _sessions.read_scope() as session:
+        return session.scalar(select(Run.state_version).where(Run.id == run_id))
+
+
+def broadcast_config_change(event, data=None):
+    """Config-Änderungen betreffen alle Runs und landen daher im Change-Log jedes aktiven Runs."""
+    if CLUSTERED:
+        # Andere Worker laden die Dateien neu; Clients erreicht jeder Run, auch wenn er hier nicht geladen ist
+        socketio.emit('reload_configs', {'config_hash': _app_config_data["CONFIG_HASH"]}, to=CONTROL_ROOM)
+        with _sessions.read_scope() as session:
+            run_ids = session.scalars(select(Run.id)).all()
+    else:
+        run_ids = list(_run_states)
+    for run_id in run_ids:
+        broadcast_change(run_id, event, data)
+
+
+def _run_store(state):
+    """Gibt den Zustand des Runs im Speicher zurück; er wird beim ersten Zugriff einmal aus der Datenbank geladen.
+
+    Danach laufen alle Änderungen nach ihrem Commit über den Change-Log hinein (_update_store). Im
+    Mehr-Worker-Betrieb schreiben auch andere Worker, dort gibt es keinen Speicher-Zustand (None) und
+    gelesen wird weiter aus der Datenbank.
+    """
+    if CLUSTERED:
+        return None
+    with state.lock:
+        if state.store is None:
+            with _sessions.read_scope() as session:
+                state.store = RunStore.from_data(read_run_data(session, state.run_id))
+        return state.store
+
+
+def _update_store(state, entries):
+    """Schreibt Einträge aus dem Change-Log in die Statistik und den Speicher-Zustand ein (falls geladen)."""
+    with state.lock:
+        for entry in entries:
+            if entry['event'] not in STATE_CHANGE_EVENTS:
+                continue
+            # Die Statistik braucht den Stand vor der Änderung, also vor store.apply
+            _stats.apply(state.run_id, state.store, entry['event'], entry['data'])
+            if state.store is None:
+                continue
+            if entry['event'] in STATE_EVENTS:
+                state.store = None  # Im Change-Log fehlt der Zustand; wird beim nächsten Zugriff neu geladen
+            else:
+                state.store.apply(entry['event'], entry['data'])
+
+
+def _read_run_data(state):
+    """Zustand des Runs im Format von read_run_data(), aus dem Speicher oder (Mehr-Worker-Betrieb) aus der Datenbank."""
+    store = _run_store(state)
+    if store is not None:
+        with state.lock:
+            return store.to_data()
+    with _sessions.read_scope() as session:
+        return read_run_data(session, state.run_id)
+
+
+def _link_view(state):
+    """Gibt die Link-Sicht eines Runs zurück und baut sie beim ersten Zugriff aus dem Run-Zustand."""
+    with state.lock:
+        if state.link_view is None:
+            payload = _build_state_payload(state)
+            state.link_view = LinkView(payload['players'], payload['routes'], payload['catches'],
+                                       payload['global_orders'], payload['level_caps'])
+        return state.link_view
+
+
+def _derive_link_changes(state, entries):
+    """Schreibt Änderungen aus dem Change-Log in die Link-Sicht ein und gibt die abgeleiteten Events zurück."""
+    with state.lock:
+        if any(entry['event'] in ('full_db_reset', 'run_restored') for entry in entries):
+            state.link_view = None  # Wird beim nächsten Zugriff neu gebaut
+            return [('link_view_reset', {})]
+        view = _link_view(state)
+        derived = []
+        for entry in entries:
+            derived.extend(view.apply(entry['event'], entry['data']))
+        return derived
+
+
+def _build_state_payload(state):
+    """Kompletter Live-Zustand eines Runs."""
+    payload = {'run_id': state.run_id}
+    payload.update(_read_run_data(state))
+    # Namenslisten liegen im Config-Bundle, hier steht nur dessen Hash
+    payload['config_hash'] = _app_config_data["CONFIG_HASH"]
+    return payload
+
+
+def get_state_snapshot(state, mimetype=JSON_MIMETYPE, accept_gzip=False):
+    """Gibt (serialisierter Zustand, ETag, gzip-komprimiert?) eines Runs zurück.
+
+    Der Zustand wird nur bei neuer Version gelesen (aus dem Speicher, siehe _run_store), jede Darstellung
+    (JSON, kompakt, jeweils auch gzip-komprimiert) nur einmal pro Version serialisiert.
+    """
+    format_name = FORMAT_NAMES[mimetype]
+
+    def build(version):
+        payload = _build_state_payload(state)
+        payload['state_version'] = version
+        payload['boot_id'] = _BOOT_ID
+        return payload
+
+    def encode(payload):
+        start = time.perf_counter()
+        if mimetype == JSON_MIMETYPE:
+            body = app.json.dumps(payload)
+        else:
+            body = serialize(encode_snapshot(payload, _app_config_data["NAME_DICTIONARY"]), mimetype)
+        SNAPSHOT_SERIALIZE.observe(time.perf_counter() - start, format=format_name)
+        return body
+
+    # Im Mehr-Worker-Betrieb zählt die Version aus der Datenbank. Sie wird VOR den Daten gelesen, der
+    # Snapshot enthält also mindestens diesen Stand; spätere Änderungen lassen sich erneut anwenden.
+    version = _db_state_version(state.run_id) if CLUSTERED else None
+    version, body = state.snapshot(build, version, format_name, encode)
+    etag = f"{_BOOT_ID}-{state.run_id}-{version}"
+    if mimetype != JSON_MIMETYPE:
+        etag += f"-{format_name}"
+    if not accept_gzip or len(body) < app.config['GZIP_MIN_BYTES']:
+        return body, etag, False
+    plain = body
+    version, body = state.snapshot(build, version, f"{format_name}+gzip", lambda payload: gzip_compress(plain))
+    return body, f"{etag}-gzip", True
+
+
+# --- Statistik über alle Runs (siehe stats.py) ---
+_stats = StatsEngine()
+_stats_cache = {'version': None, 'body': None, 'built_at': 0.0}
+_stats_cache_lock = threading.Lock()
+
+
+def get_stats_body():
+    """Gibt (JSON der Statistik, ETag) zurück.
+
+    Neu erzeugt wird nur bei neuer Version und höchstens alle STATS_MAX_AGE Sekunden; gleichzeitige
+    Abrufe warten auf denselben Neuaufbau statt ihn jeder für sich zu starten.
+    """
+    with _stats_cache_lock:
+        now = time.monotonic()
+        cached = _stats_cache['body'] is not None
+        if cached and (_stats_cache['version'] == _stats.version
+                       or now - _stats_cache['built_at'] < app.config['STATS_MAX_AGE']):
+            return _stats_cache['body'], f"{_BOOT_ID}-stats-{_stats_cache['version']}"
+        if _stats.dirty:
+            start = time.perf_counter()
+            with _sessions.read_scope() as session:
+                _stats.rebuild(session)
+            STATS_REBUILD.observe(time.perf_counter() - start)
+        names = {lc['order_number']: lc['name'] for lc in _config_files.data['level_caps.json']}
+        payload = _stats.to_payload(names)
+        _stats_cache.update(version=payload['version'], body=app.json.dumps(payload), built_at=now)
+        return _stats_cache['body'], f"{_BOOT_ID}-stats-{payload['version']}"
+
+
 # --- Routen für HTML-Seiten ---
-@app.route('/')
-def index():
-    return render_template('index.html')
+# Die Seiten ohne Run-ID zeigen den Standard-Run, /runs/<id>/ einen beliebigen Run
+@app.route('/', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/runs/<int:run_id>/')
+def index(run_id):
+    if get_run_state(run_id) is None:
+        return f"Run {run_id} nicht gefunden.", 404
+    return render_template('index.html', run_id=run_id)
 
 
-@app.route('/summary')
-def summary():
-    return render_template('summary.html')
+@app.route('/summary', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/runs/<int:run_id>/summary')
+def summary(run_id):
+    if get_run_state(run_id) is None:
+        return f"Run {run_id} nicht gefunden.", 404
+    return render_template('summary.html', run_id=run_id)
 
 
 # --- API Routen (bestehende) ---
-@app.route('/api/data')
-def get_all_data():
+# Jeder Endpunkt existiert unter /api/... für den Standard-Run und unter /api/runs/<run_id>/... für jeden Run
+@app.route('/api/data', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/data')
+def get_all_data(run_id):
+    state = get_run_state(run_id)
+    if state is None:
+        return _run_not_found(run_id)
+    # Darstellung per Accept (JSON oder kompakt, siehe wire_format.py), Kompression per Accept-Encoding
+    mimetype = request.accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+    body, etag, compressed = get_state_snapshot(state, mimetype, 'gzip' in request.accept_encodings)
+    response = app.response_class(body, mimetype=mimetype)
+    if compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    response.set_etag(etag)
+    # no-cache: Der Browser darf die Antwort speichern, muss sie aber per If-None-Match revalidieren
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/api/links', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/links')
+def get_link_view(run_id):
+    """Soul-Link-Sicht des Runs: Links pro Route, Zähler, nutzbare Teams und aktives Level-Cap."""
+    state = get_run_state(run_id)
+    if state is None:
+        return _run_not_found(run_id)
+    with state.lock:
+        payload = _link_view(state).to_payload()
+        version = state.version
+    payload['run_id'] = run_id
+    payload['state_version'] = version
+    response = app.response_class(app.json.dumps(payload), mimetype='application/json')
+    response.set_etag(f"{_BOOT_ID}-{run_id}-{version}-links")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/api/stats')
+def get_stats():
+    """Statistik über alle Runs: Pokémon und Todesrate pro Route, genutzte Routen pro Meilenstein."""
+    try:
+        body, etag = get_stats_body()
+    except Exception as e:
+        print(f"Fehler beim Erstellen der Statistik: {e}")
+        return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
+    response = app.response_class(body, mimetype=JSON_MIMETYPE)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"max-age={int(app.config['STATS_MAX_AGE'])}"
+    return response.make_conditional(request)
+
+
+@app.route('/api/config_bundle')
+def get_current_config_bundle():
+    """Leitet auf das inhaltsadressierte Bundle der aktuellen Konfiguration weiter."""
+    response = redirect(url_for('get_config_bundle', config_hash=_app_config_data["CONFIG_HASH"]))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/config_bundle/<config_hash>')
+def get_config_bundle(config_hash):
+    """Liefert Pokémon- und Routennamen; die URL ändert sich mit dem Inhalt, daher unbegrenzt cachebar."""
+    if config_hash != _app_config_data["CONFIG_HASH"]:
+        # Veralteter Hash: nicht cachen, sondern auf den aktuellen Stand verweisen
+        return get_current_config_bundle()
+    response = app.response_class(_app_config_data["CONFIG_BUNDLE_BODY"], mimetype='application/json')
+    response.set_etag(config_hash)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response.make_conditional(request)
+
+
+@app.route('/api/pokemon/search')
+def search_pokemon():
+    """Autocomplete für Pokémon-Namen: exakte, Präfix- und tippfehlertolerante Treffer in Rangfolge."""
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'Ungültiger Wert für limit.'}), 400
+
+    results = _app_config_data["POKEMON_INDEX"].search(query, limit=limit)
+    return jsonify({'query': query, 'results': results, 'config_hash': _app_config_data["CONFIG_HASH"]}), 200
+
+
+@app.route('/api/changes', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/changes')
+def get_changes(run_id):
+    """Liefert alle Änderungen eines Runs seit einer Zustandsversion (Delta-Sync nach Lücken oder Reconnect)."""
+    state = get_run_state(run_id)
+    if state is None:
+        return _run_not_found(run_id)
+    try:
+        since = int(request.args.get('since', ''))
+    except ValueError:
+        return jsonify({'error': 'Parameter since fehlt oder ist ungültig.'}), 400
+
+    # Nach einem Server-Neustart beginnen die Versionen wieder bei 0
+    boot_id = request.args.get('boot_id')
+    changes = state.changes_since(since) if boot_id in (None, _BOOT_ID) else None
+    if changes is None:
+        return jsonify({'truncated': True, 'boot_id': _BOOT_ID}), 200
+    return jsonify({'truncated': False, 'boot_id': _BOOT_ID, 'changes': changes}), 200
+
+
+# --- Verwaltung der Runs ---
+@app.route('/api/runs', methods=['GET'])
+def list_runs():
+    runs = _sessions.read().query(Run).order_by(Run.id).all()
+    return jsonify({'runs': [{'id': run.id, 'name': run.name} for run in runs]}), 200
+
+
+@app.route('/api/runs', methods=['POST'])
+def add_run():
+    """Legt einen neuen Run mit eigenen Level-Caps und Orden an."""
+    data = request.json
+    run_name = data.get('name', '').strip() if isinstance(data, dict) else ''
+    if not run_name:
+        return jsonify({'error': 'Run-Name fehlt'}), 400
+
+    session = _sessions.write()
+    try:
+        if session.query(Run).filter_by(name=run_name).first():
+            return jsonify({'error': 'Run existiert bereits'}), 409
+
+        run = create_run(session, run_name, _config_files.data['level_caps.json'])
+        session.flush()
+        write_snapshot(session, run.id, 0, read_run_data(session, run.id))  # Ausgangspunkt für das Journal
+        session.commit()
+        return jsonify({'message': 'Run angelegt', 'run': {'id': run.id, 'name': run.name}}), 201
+    except Exception as e:
+        session.rollback()
+        print(f"Fehler beim Anlegen des Runs: {e}")
+        return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
+
+
+@app.route('/api/runs/<int:run_id>', methods=['DELETE'])
+def remove_run(run_id):
+    """Löscht einen Run mit allen Daten im Hintergrund. Der Standard-Run bleibt immer erhalten."""
+    if run_id == DEFAULT_RUN_ID:
+        return jsonify({'error': 'Der Standard-Run kann nicht gelöscht werden.'}), 400
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+
+    def work(job):
+        _delete_run_rows(job, (PokemonCatch, Player, Route, GlobalOrder, LevelCap, JournalEvent, JournalSnapshot))
+        session = get_db_session()
+        try:
+            delete_run(session, run_id)  # Nur noch der Run selbst, alle übrigen Zeilen sind schon weg
+            session.commit()
+        finally:
+            session.close()
+        # Eigenes Event statt 'full_db_reset': den Run gibt es nicht mehr, ein Neuladen liefe ins 404.
+        # Die Clients verlassen den Run; im Mehr-Worker-Betrieb verwirft jeder Worker dabei seinen Zustand.
+        for room in (run_room(run_id), compact_room(run_id)):
+            socketio.emit('run_deleted', {'run_id': run_id}, to=room)
+        _forget_run(run_id)
+
+    return _start_job('delete_run', run_id, work, f'Run {run_id} wird gelöscht.')
+
+
+def _forget_run(run_id):
+    """Verwirft den Zustand eines gelöschten Runs in diesem Prozess."""
+    with _run_states_lock:
+        _run_states.pop(run_id, None)
+    _stats.invalidate()
+
+
+# --- Archive: Export und Import von Runs als NDJSON (siehe run_archive.py) ---
+@app.route('/api/export', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/export')
+def export_run(run_id):
+    """Run als NDJSON-Archiv zum Herunterladen; mit ?gzip=1 gzip-komprimiert. Wird beim Lesen gestreamt."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+    flush_pending_writes()
+    compress = request.args.get('gzip', '0') not in ('', '0', 'false')
+
+    def generate():
+        # Eigene Session: Der Body wird erst nach dem Ende des Handlers (und dem Request-Teardown) erzeugt
+        session = ReadSessionLocal()
+        try:
+            yield from encode_chunks(export_lines(session, run_id), compress)
+        finally:
+            session.close()
+
+    filename = f"run-{run_id}.ndjson{'.gz' if compress else ''}"
+    response = app.response_class(generate(), mimetype=GZIP_MIMETYPE if compress else NDJSON_MIMETYPE)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@app.route('/api/import', methods=['POST'])
+def import_run_archive():
+    """Legt aus einem NDJSON-Archiv (gzip oder unkomprimiert, als Request-Body) einen neuen Run an.
+
+    Der Body wird zeilenweise gelesen und in Blöcken geschrieben; ?name= überschreibt den Namen aus dem Archiv.
+    """
+    session = _sessions.write()
+    try:
+        run_id, counts = import_run(session, open_archive(request.stream), request.args.get('name'),
+                                    _config_files.data['level_caps.json'])
+        name = session.scalar(select(Run.name).where(Run.id == run_id))
+        _stats.invalidate()
+        return jsonify({'message': 'Run importiert', 'run': {'id': run_id, 'name': name}, 'counts': counts}), 201
+    except RunExistsError as e:
+        return jsonify({'error': str(e)}), 409
+    except (ArchiveError, OSError, EOFError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Ungültiges Archiv: {e}'}), 400
+    except Exception as e:
+        print(f"Fehler beim Importieren des Runs: {e}")
+        return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
+
+
+# --- Hintergrundjobs für große Löschvorgänge ---
+def _emit_job_progress(job):
+    # Fortschritt ist kein Zustand: direkt an den Raum des Runs, ohne Sequenznummer und Change-Log
+    socketio.emit('job_progress', job.to_dict(), to=[run_room(job.run_id), compact_room(job.run_id)])
+
+
+_jobs = JobManager(_emit_job_progress)
+
+
+@app.before_request
+def _reject_writes_during_job():
+    """Während ein Job einen Run umbaut, sind weitere Änderungen an diesem Run gesperrt."""
+    if request.method not in ('POST', 'DELETE') or not request.view_args or 'run_id' not in request.view_args:
+        return None
+    job = _jobs.active_job(request.view_args['run_id'])
+    if job is None:
+        return None
+    return jsonify({'error': 'Für diesen Run läuft gerade ein Hintergrundjob.', 'job': job.to_dict()}), 409
+
+
+def _start_job(kind, run_id, work, message):
+    """Startet einen Job für den Run und antwortet mit 202 und der Status-URL."""
+    flush_pending_writes()  # Eingereihte Änderungen gehören zum Stand vor dem Job
+    job = _jobs.start(kind, run_id, work)
+    if job is None:
+        return jsonify({'error': 'Für diesen Run läuft gerade ein Hintergrundjob.',
+                        'job': _jobs.active_job(run_id).to_dict()}), 409
+    response = jsonify({'message': message, 'job': job.to_dict()})
+    response.status_code = 202
+    response.headers['Location'] = url_for('get_job', job_id=job.id)
+    return response
+
+
+def _delete_run_rows(job, models, progress_share=0.9):
+    """Löscht die Zeilen eines Runs in den Tabellen `models` stückweise und meldet den Fortschritt."""
     session = get_db_session()
-    # Wichtig: Routen nach ID sortieren, um die Einfügereihenfolge zu behalten
-    routes = session.query(Route).order_by(Route.id).all()
-    players = session.query(Player).all()
-    catches = session.query(PokemonCatch).all()
-    global_orders = session.query(GlobalOrder).all()
-    level_caps = session.query(LevelCap).all()
-
-    players_data = [{'id': p.id, 'name': p.name} for p in players]
-    routes_data = [{'id': r.id, 'name': r.name, 'status': r.status} for r in routes]
-    catches_data = [
-        {'player_id': c.player_id, 'route_id': c.route_id, 'pokemon_name': c.pokemon_name}
-        for c in catches
-    ]
-    global_orders_data = [
-        {'order_number': go.order_number, 'is_obtained': go.is_obtained}
-        for go in global_orders
-    ]
-    level_caps_data = [
-        {'name': lc.name, 'order_number': lc.order_number, 'max_level': lc.max_level,
-         'adjusted_level': lc.adjusted_level}
-        for lc in level_caps
-    ]
-
-    session.close()
-    return jsonify({
-        'players': players_data,
-        'routes': routes_data,
-        'catches': catches_data,
-        'global_orders': global_orders_data,
-        'level_caps': level_caps_data,
-        'all_pokemon_names': _app_config_data["ALL_POKEMON_NAMES"],  # Greife auf die neu ladbare Config zu
-        'all_route_names': _app_config_data["ALL_ROUTES"],  # Greife auf die neu ladbare Config zu
-    })
-
-
-@app.route('/api/add_player', methods=['POST'])
-def add_player():
+    try:
+        total = sum(count_rows(session, model, model.run_id == job.run_id) for model in models)
+    finally:
+        session.close()
+    deleted = 0
+    for model in models:
+        for count in chunked_delete(get_db_session, model, model.run_id == job.run_id):
+            deleted += count
+            job.report(progress_share * deleted / max(total, 1), f'{deleted} von {total} Zeilen gelöscht')
+
+
+def _run_reset(job, kind, models):
+    """Reset-Job: erst 'reset_started' ins Journal, dann stückweise löschen, dann abschließen (complete_reset).
+
+    Die Löschschritte committen einzeln. Bricht einer ab, wird der Rest in einer Transaktion erledigt; stirbt
+    der Prozess, schließt der nächste Start den Reset anhand der offenen Markierung ab (journal.recover_run).
+    """
+    session = get_db_session()
+    try:
+        begin_reset(session, job.run_id, kind)
+        session.commit()
+    finally:
+        session.close()
+    try:
+        _delete_run_rows(job, models)
+    except Exception as e:
+        print(f"Stückweises Löschen für {kind} in Run {job.run_id} abgebrochen ({e}), Rest in einer Transaktion")
+    session = get_db_session()
+    try:
+        complete_reset(session, job.run_id, kind, _config_files.data['level_caps.json'])
+        session.commit()
+    finally:
+        session.close()
+    broadcast_change(job.run_id, kind)
+
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Status eines Hintergrundjobs (running, done oder failed) samt Fortschritt."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} nicht gefunden.'}), 404
+    return jsonify({'job': job.to_dict()}), 200
+
+
+# --- Set-basiertes Anlegen von Spielern und Routen ---
+def _insert_players(session, run_id, names):
+    """Legt Spieler per executemany an, ohne zu committen. Fang-Zeilen entstehen erst beim ersten Fang."""
+    session.execute(insert(Player), [{'run_id': run_id, 'name': name} for name in names])
+    created = session.execute(select(Player.id, Player.name).where(
+        Player.run_id == run_id, Player.name.in_(names)).order_by(Player.id)).all()
+    return [{'id': player_id, 'name': name} for player_id, name in created]
+
+
+def _insert_routes(session, run_id, names):
+    """Legt Routen per executemany an, ohne zu committen."""
+    session.execute(insert(Route), [{'run_id': run_id, 'name': name, 'status': ""} for name in names])
+    created = session.execute(select(Route.id, Route.name, Route.status).where(
+        Route.run_id == run_id, Route.name.in_(names)).order_by(Route.id)).all()
+    return [{'id': route_id, 'name': name, 'status': status} for route_id, name, status in created]
+
+
+def _names_from_request(data):
+    """Liest eine Namensliste aus {'names': [...]}; Einträge dürfen Strings oder {'name': ...} (wie in routes.json) sein."""
+    items = data.get('names') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return None
+    names = []
+    for item in items:
+        name = item.get('name') if isinstance(item, dict) else item
+        if not isinstance(name, str) or not name.strip():
+            return None
+        names.append(name.strip())
+    return list(dict.fromkeys(names))  # Duplikate entfernen, Reihenfolge beibehalten
+
+
+@app.route('/api/add_player', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/add_player', methods=['POST'])
+def add_player(run_id):
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
     data = request.json
     player_name = data.get('name')
     if not player_name:
         return jsonify({'error': 'Spielername fehlt'}), 400
 
-    session = get_db_session()
+    session = _sessions.write()
     try:
-        existing_player = session.query(Player).filter_by(name=player_name).first()
+        existing_player = session.query(Player).filter_by(run_id=run_id, name=player_name).first()
         if existing_player:
             return jsonify({'error': 'Spieler existiert bereits'}), 409
 
-        new_player = Player(name=player_name)
-        session.add(new_player)
-        session.commit()
-
-        routes = session.query(Route).all()
-        for route in routes:
-            session.add(PokemonCatch(player_id=new_player.id, route_id=route.id, pokemon_name=None))
+        new_player = _insert_players(session, run_id, [player_name])[0]
+        record_event(session, run_id, 'player_added', new_player)
         session.commit()
-
-        socketio.emit('player_added', {'id': new_player.id, 'name': new_player.name})
-        return jsonify(
-            {'message': 'Spieler hinzugefügt', 'player': {'id': new_player.id, 'name': new_player.name}}), 201
+        broadcast_change(run_id, 'player_added', new_player)
+        return jsonify({'message': 'Spieler hinzugefügt', 'player': new_player}), 201
     except Exception as e:
         session.rollback()
         print(f"Fehler beim Hinzufügen des Spielers: {e}")
         return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
-    finally:
-        session.close()
 
 
-@app.route('/api/add_route', methods=['POST'])
-def add_route():
+@app.route('/api/add_route', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/add_route', methods=['POST'])
+def add_route(run_id):
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
     data = request.json
     route_name = data.get('name')
     if not route_name:
         return jsonify({'error': 'Routenname fehlt'}), 400
 
-    session = get_db_session()
+    session = _sessions.write()
     try:
-        existing_route = session.query(Route).filter_by(name=route_name).first()
+        existing_route = session.query(Route).filter_by(run_id=run_id, name=route_name).first()
         if existing_route:
             return jsonify({'error': 'Route existiert bereits'}), 409
 
-        new_route = Route(name=route_name, status="")
-        session.add(new_route)
+        new_route = _insert_routes(session, run_id, [route_name])[0]
+        record_event(session, run_id, 'route_added', new_route)
         session.commit()
+        broadcast_change(run_id, 'route_added', new_route)
+        return jsonify({'message': 'Route hinzugefügt', 'route': new_route}), 201
+    except Exception as e:
+        session.rollback()
+        print(f"Fehler beim Hinzufügen der Route: {e}")
+        return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
+
 
-        players = session.query(Player).all()
-        for player in players:
-            session.add(PokemonCatch(player_id=player.id, route_id=new_route.id, pokemon_name=None))
+@app.route('/api/players/bulk', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/players/bulk', methods=['POST'])
+def add_players_bulk(run_id):
+    """Legt mehrere Spieler in einer Transaktion an; bereits vorhandene Namen werden übersprungen."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+    names = _names_from_request(request.json)
+    if not names:
+        return jsonify({'error': 'Liste der Spielernamen fehlt oder ist ungültig'}), 400
+
+    session = _sessions.write()
+    try:
+        existing = set(session.scalars(select(Player.name).where(Player.run_id == run_id, Player.name.in_(names))))
+        new_names = [name for name in names if name not in existing]
+        created = _insert_players(session, run_id, new_names) if new_names else []
+        if created:
+            record_event(session, run_id, 'players_added', {'players': created})
         session.commit()
+        if created:
+            broadcast_change(run_id, 'players_added', {'players': created})
+        return jsonify({'message': f'{len(created)} Spieler hinzugefügt', 'players': created,
+                        'skipped': sorted(existing)}), 201 if created else 200  # Nichts angelegt: kein 201
+    except Exception as e:
+        session.rollback()
+        print(f"Fehler beim Hinzufügen mehrerer Spieler: {e}")
+        return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
+
 
-        socketio.emit('route_added', {'id': new_route.id, 'name': new_route.name, 'status': new_route.status})
-        return jsonify({'message': 'Route hinzugefügt',
-                        'route': {'id': new_route.id, 'name': new_route.name, 'status': new_route.status}}), 201
+@app.route('/api/routes/bulk', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/routes/bulk', methods=['POST'])
+def add_routes_bulk(run_id):
+    """Legt mehrere Routen (z.B. den kompletten Inhalt von routes.json) in einer Transaktion an."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+    names = _names_from_request(request.json)
+    if not names:
+        return jsonify({'error': 'Liste der Routennamen fehlt oder ist ungültig'}), 400
+
+    session = _sessions.write()
+    try:
+        existing = set(session.scalars(select(Route.name).where(Route.run_id == run_id, Route.name.in_(names))))
+        new_names = [name for name in names if name not in existing]
+        created = _insert_routes(session, run_id, new_names) if new_names else []
+        if created:
+            record_event(session, run_id, 'routes_added', {'routes': created})
+        session.commit()
+        if created:
+            broadcast_change(run_id, 'routes_added', {'routes': created})
+        return jsonify({'message': f'{len(created)} Routen hinzugefügt', 'routes': created,
+                        'skipped': sorted(existing)}), 201 if created else 200
     except Exception as e:
         session.rollback()
-        print(f"Fehler beim Hinzufügen der Route: {e}")
+        print(f"Fehler beim Hinzufügen mehrerer Routen: {e}")
         return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
-    finally:
-        session.close()
 
 
-@app.route('/api/update_catch', methods=['POST'])
-def update_catch():
+# --- Einzeländerungen an Fängen und Routenstatus (direkt oder über die Schreib-Warteschlange) ---
+def _apply_catch(session, run_id, player_id, route_id, pokemon_name):
+    """Schreibt einen Fang in die Session: Upsert, oder Löschen bei leerem Namen."""
+    if pokemon_name is None:
+        session.execute(delete(PokemonCatch).where(PokemonCatch.player_id == player_id,
+                                                   PokemonCatch.route_id == route_id))
+    else:
+        # Echtes Upsert über den eindeutigen Index (player_id, route_id)
+        stmt = sqlite_insert(PokemonCatch).values(run_id=run_id, player_id=player_id, route_id=route_id,
+                                                  pokemon_name=pokemon_name)
+        session.execute(stmt.on_conflict_do_update(index_elements=['player_id', 'route_id'],
+                                                   set_={'pokemon_name': stmt.excluded.pokemon_name}))
+    return 'catch_updated', {'player_id': player_id, 'route_id': route_id, 'pokemon_name': pokemon_name}
+
+
+def _apply_route_status(session, run_id, route_id, status_text):
+    session.query(Route).filter_by(id=route_id, run_id=run_id).update({Route.status: status_text})
+    return 'route_status_updated', {'route_id': route_id, 'status_text': status_text}
+
+
+def _apply_queued_operation(session, key, value):
+    """Schlüssel: ('catch', run_id, player_id, route_id) oder ('route_status', run_id, route_id)."""
+    kind, run_id = key[0], key[1]
+    if kind == 'catch':
+        change = _apply_catch(session, run_id, key[2], key[3], value)
+    elif kind == 'route_status':
+        change = _apply_route_status(session, run_id, key[2], value)
+    else:
+        raise ValueError(f"Unbekannte Operation in der Schreib-Warteschlange: {key}")
+    record_event(session, run_id, *change)  # Im selben Commit wie die Änderung
+    return run_id, change
+
+
+def _broadcast_flushed(changes):
+    """Verteilt die Änderungen eines Flushs auf die Runs; pro Run geht ein gemeinsamer Broadcast raus."""
+    by_run = {}
+    for run_id, change in changes:
+        by_run.setdefault(run_id, []).append(change)
+    for run_id, run_changes in by_run.items():
+        broadcast_changes(run_id, run_changes)
+
+
+_write_queue = WriteBehindQueue(
+    get_db_session,
+    _apply_queued_operation,
+    _broadcast_flushed,  # Alle Änderungen eines Flushs gehen pro Run als ein Event raus
+    flush_interval=app.config['WRITE_FLUSH_INTERVAL_MS'] / 1000,
+    max_batch=app.config['WRITE_FLUSH_MAX_OPS'],
+)
+
+
+def _submit_write(key, value):
+    """Reiht eine Änderung ein; im Modus 'batched' wird bis zum gemeinsamen Commit gewartet."""
+    result = _write_queue.submit(key, value)
+    if app.config['WRITE_MODE'] != WRITE_MODE_ASYNC:
+        try:
+            result.get(timeout=app.config['WRITE_WAIT_TIMEOUT'])  # Wirft die Exception des Flushs weiter
+        except gevent.Timeout:
+            # gevent.Timeout ist keine Exception; als TimeoutError landet sie in der üblichen 500-Antwort
+            raise TimeoutError(f"Änderung nach {app.config['WRITE_WAIT_TIMEOUT']} s noch nicht geschrieben")
+
+
+def flush_pending_writes():
+    """Schreibt anstehende Änderungen, bevor eine Operation läuft, die von ihnen abhängt (z.B. Resets)."""
+    if len(_write_queue):
+        _write_queue.flush()
+
+
+# Beim Beenden nichts in der Warteschlange zurücklassen
+atexit.register(flush_pending_writes)
+
+
+def _connected_clients():
+    # Clients dieses Workers pro Run und Format, direkt aus den Räumen des Socket.IO-Managers
+    rooms = socketio.server.manager.rooms.get('/', {})
+    clients = {}
+    for room, sids in list(rooms.items()):
+        if run_id_from_room(room) is not None:
+            clients[(str(run_id_from_room(room)), 'json')] = len(sids)
+        elif compact_run_id_from_room(room) is not None:
+            clients[(str(compact_run_id_from_room(room)), 'compact')] = len(sids)
+    return clients
+
+
+REGISTRY.gauge('soullink_socket_clients', 'Verbundene Socket.IO-Clients pro Run und Format.', ('run', 'format'),
+               callback=_connected_clients)
+REGISTRY.counter('soullink_emit_frames_total', 'Gesendete Socket-Frames (Einzel-Events und changes_batch).',
+                 callback=lambda: _emitter.frames_sent)
+REGISTRY.counter('soullink_emit_events_total', 'Gesendete Änderungen, auch die in changes_batch gebündelten.',
+                 callback=lambda: _emitter.events_sent)
+REGISTRY.gauge('soullink_emit_pending', 'Änderungen, die im EmitAggregator auf ihren Tick warten.',
+               callback=_emitter.pending)
+REGISTRY.gauge('soullink_write_queue_depth', 'Nicht geschriebene Änderungen in der Schreib-Warteschlange.',
+               callback=lambda: len(_write_queue))
+REGISTRY.gauge('soullink_change_log_entries', 'Einträge im Change-Log pro Run.', ('run',),
+               callback=lambda: {(str(run_id),): len(state.change_log) for run_id, state in list(_run_states.items())})
+
+
+@app.route('/metrics')
+def metrics():
+    """Laufzeit-Metriken dieses Workers im Prometheus-Textformat."""
+    return app.response_class(REGISTRY.render(), content_type=REGISTRY.content_type)
+
+
+@app.route('/api/update_catch', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/update_catch', methods=['POST'])
+def update_catch(run_id):
+    state = get_run_state(run_id)
+    if state is None:
+        return _run_not_found(run_id)
     data = request.json
     player_id = data.get('player_id')
     route_id = data.get('route_id')
@@ -196,35 +1024,52 @@ def update_catch():
 
     if not all([player_id, route_id]):
         return jsonify({'error': 'Spieler-ID oder Routen-ID fehlt'}), 400
-
-    session = get_db_session()
     try:
-        catch_entry = session.query(PokemonCatch).filter_by(player_id=player_id, route_id=route_id).first()
-
-        if not catch_entry:
-            catch_entry = PokemonCatch(player_id=player_id, route_id=route_id, pokemon_name=pokemon_name)
-            session.add(catch_entry)
-        else:
-            catch_entry.pokemon_name = pokemon_name
+        # IDs als Zahlen, so wie sie im Run-Zustand und im Change-Log stehen
+        player_id, route_id = int(player_id), int(route_id)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Ungültige Spieler-ID oder Routen-ID'}), 400
+
+    if not pokemon_name:
+        pokemon_name = None  # Leerer Name = Fang entfernen
+
+    # Spieler und Route müssen zum Run gehören, sonst könnte ein Run in die Daten eines anderen schreiben
+    store = _run_store(state)
+    if store is not None:
+        player_ok, route_ok = player_id in store.players, route_id in store.routes
+    else:
+        session = _sessions.read()
+        player_ok = session.query(Player.id).filter_by(id=player_id, run_id=run_id).first() is not None
+        route_ok = session.query(Route.id).filter_by(id=route_id, run_id=run_id).first() is not None
+    if not (player_ok and route_ok):
+        return jsonify({'error': f'Spieler oder Route gehört nicht zu Run {run_id}.'}), 404
+
+    if app.config['WRITE_MODE'] != WRITE_MODE_SYNC:
+        try:
+            _submit_write(('catch', run_id, player_id, route_id), pokemon_name)
+        except Exception as e:
+            print(f"Fehler beim Aktualisieren des Fangs: {e}")
+            return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
+        return jsonify({'message': 'Fang aktualisiert'}), 200
 
+    session = _sessions.write()
+    try:
+        change = _apply_catch(session, run_id, player_id, route_id, pokemon_name)
+        record_event(session, run_id, *change)
         session.commit()
-
-        socketio.emit('catch_updated', {
-            'player_id': player_id,
-            'route_id': route_id,
-            'pokemon_name': pokemon_name
-        })
+        broadcast_change(run_id, *change)
         return jsonify({'message': 'Fang aktualisiert'}), 200
     except Exception as e:
         session.rollback()
         print(f"Fehler beim Aktualisieren des Fangs: {e}")
         return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
-    finally:
-        session.close()
 
 
-@app.route('/api/toggle_global_order', methods=['POST'])
-def toggle_global_order():
+@app.route('/api/toggle_global_order', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/toggle_global_order', methods=['POST'])
+def toggle_global_order(run_id):
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
     data = request.json
     order_number = data.get('order_number')
 
@@ -233,121 +1078,235 @@ def toggle_global_order():
     except (TypeError, ValueError):
         return jsonify({'error': 'Ungültige Ordensnummer bereitgestellt.'}), 400
 
-    session = get_db_session()
+    session = _sessions.write()
     try:
-        order_entry = session.query(GlobalOrder).filter_by(order_number=order_number).first()
+        order_entry = session.query(GlobalOrder).filter_by(run_id=run_id, order_number=order_number).first()
 
         if not order_entry:
             return jsonify({'error': f'Orden/Meilenstein mit Nummer {order_number} nicht gefunden.'}), 404
 
         order_entry.is_obtained = not order_entry.is_obtained
+        change_data = {'order_number': order_number, 'is_obtained': order_entry.is_obtained}
+        record_event(session, run_id, 'global_order_toggled', change_data)
         session.commit()
-
-        socketio.emit('global_order_toggled', {
-            'order_number': order_number,
-            'is_obtained': order_entry.is_obtained
-        })
+        broadcast_change(run_id, 'global_order_toggled', change_data)
         return jsonify({'message': 'Globaler Orden-Status aktualisiert', 'is_obtained': order_entry.is_obtained}), 200
     except Exception as e:
         session.rollback()
         print(f"Fehler beim Umschalten des globalen Orden-Status: {e}")
         return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
-    finally:
-        session.close()
 
 
-@app.route('/api/update_route_status', methods=['POST'])
-def update_route_status():
+@app.route('/api/update_route_status', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/update_route_status', methods=['POST'])
+def update_route_status(run_id):
+    state = get_run_state(run_id)
+    if state is None:
+        return _run_not_found(run_id)
     data = request.json
     route_id = data.get('route_id')
     status_text = data.get('status_text', "")
 
     if route_id is None:
         return jsonify({'error': 'Routen-ID fehlt.'}), 400
-
-    session = get_db_session()
     try:
-        route_entry = session.query(Route).filter_by(id=route_id).first()
-        if not route_entry:
-            return jsonify({'error': f'Route mit ID {route_id} nicht gefunden.'}), 404
+        route_id = int(route_id)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Ungültige Routen-ID.'}), 400
+
+    store = _run_store(state)
+    if store is not None:
+        route_ok = route_id in store.routes
+    else:
+        route_ok = _sessions.read().query(Route.id).filter_by(id=route_id, run_id=run_id).first() is not None
+    if not route_ok:
+        return jsonify({'error': f'Route mit ID {route_id} nicht gefunden.'}), 404
+
+    message = {'message': 'Routenstatus aktualisiert', 'route_id': route_id, 'status_text': status_text}
+    if app.config['WRITE_MODE'] != WRITE_MODE_SYNC:
+        # Geschrieben wird in der Schreib-Warteschlange, der Request braucht keine eigene Schreib-Session
+        try:
+            _submit_write(('route_status', run_id, route_id), status_text)
+        except Exception as e:
+            print(f"Fehler beim Aktualisieren des Routenstatus: {e}")
+            return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
+        return jsonify(message), 200
 
-        route_entry.status = status_text
+    session = _sessions.write()
+    try:
+        change = _apply_route_status(session, run_id, route_id, status_text)
+        record_event(session, run_id, *change)
         session.commit()
-
-        socketio.emit('route_status_updated', {'route_id': route_id, 'status_text': status_text})
-        return jsonify({'message': 'Routenstatus aktualisiert', 'route_id': route_id, 'status_text': status_text}), 200
+        broadcast_change(run_id, *change)
+        return jsonify(message), 200
     except Exception as e:
         session.rollback()
         print(f"Fehler beim Aktualisieren des Routenstatus: {e}")
         return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
-    finally:
-        session.close()
 
 
-@app.route('/api/reset_all_data', methods=['POST'])
-def reset_all_data():
-    session = get_db_session()
-    try:
-        session.query(PokemonCatch).update({PokemonCatch.pokemon_name: None})
-        session.query(Route).update({Route.status: ""})
-        session.commit()
-        socketio.emit('all_data_reset')
-        return jsonify({'message': 'Alle Pokémon-Fänge und Routen-Stati zurückgesetzt.'}), 200
-    except Exception as e:
-        session.rollback()
-        print(f"Fehler beim Zurücksetzen aller Daten: {e}")
-        return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
-    finally:
-        session.close()
+@app.route('/api/reset_all_data', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/reset_all_data', methods=['POST'])
+def reset_all_data(run_id):
+    """Löscht im Hintergrund alle Fänge des Runs und leert die Routen-Stati."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
 
+    def work(job):
+        _run_reset(job, 'all_data_reset', (PokemonCatch,))
 
-@app.route('/api/clear_route_data', methods=['POST'])
-def clear_route_data():
+    return _start_job('reset_all_data', run_id, work, 'Fänge und Routen-Stati werden zurückgesetzt.')
+
+
+@app.route('/api/clear_route_data', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/clear_route_data', methods=['POST'])
+def clear_route_data(run_id):
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
     data = request.json
     route_id = data.get('route_id')
 
     if route_id is None:
         return jsonify({'error': 'Routen-ID fehlt.'}), 400
+    try:
+        route_id = int(route_id)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Ungültige Routen-ID.'}), 400
 
-    session = get_db_session()
+    flush_pending_writes()
+    session = _sessions.write()
     try:
-        route_to_delete = session.query(Route).filter_by(id=route_id).first()
-        if not route_to_delete:
+        route_name = session.scalar(select(Route.name).where(Route.id == route_id, Route.run_id == run_id))
+        if route_name is None:
             return jsonify({'error': f'Route mit ID {route_id} nicht gefunden.'}), 404
 
-        session.delete(route_to_delete)
+        # Set-basiert statt ORM-Cascade, die jeden Fang der Route erst laden würde
+        session.execute(delete(PokemonCatch).where(PokemonCatch.route_id == route_id))
+        session.execute(delete(Route).where(Route.id == route_id))
+        record_event(session, run_id, 'route_deleted', {'route_id': route_id})
         session.commit()
-        socketio.emit('route_deleted', {'route_id': route_id})
-        return jsonify({'message': f'Route {route_to_delete.name} und zugehörige Daten gelöscht.'}), 200
+        broadcast_change(run_id, 'route_deleted', {'route_id': route_id})
+        return jsonify({'message': f'Route {route_name} und zugehörige Daten gelöscht.'}), 200
     except Exception as e:
         session.rollback()
         print(f"Fehler beim Löschen der Route: {e}")
         return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
-    finally:
-        session.close()
 
 
-@app.route('/api/full_db_reset', methods=['POST'])
-def full_db_reset():
+@app.route('/api/full_db_reset', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/full_db_reset', methods=['POST'])
+def full_db_reset(run_id):
+    """Setzt einen Run im Hintergrund vollständig zurück. Andere Runs und das Schema bleiben unberührt."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+
+    def work(job):
+        _run_reset(job, 'full_db_reset', (PokemonCatch, Player, Route))
+
+    return _start_job('full_db_reset', run_id, work, 'Run wird vollständig zurückgesetzt.')
+
+
+# --- Journal: Undo und Zeitreise ---
+def _undo_change(session, run_id, target, before):
+    """Schreibt die Umkehrung von `target` in die Session und gibt (event, data) für den Broadcast zurück.
+
+    Einzeländerungen werden gezielt zurückgesetzt und gehen als normales Event raus; alles andere
+    (Resets, neue oder gelöschte Spieler und Routen) stellt den kompletten Zustand vor dem Event wieder her.
+    """
+    data = json.loads(target.data)
+    previous = RunStore.from_data(before)
+    if target.event == 'catch_updated':
+        key = (data['player_id'], data['route_id'])
+        if data['route_id'] in previous.routes and data['player_id'] in previous.players:
+            change = _apply_catch(session, run_id, data['player_id'], data['route_id'], previous.catches.get(key))
+            record_event(session, run_id, *change, undo_of=target.id)
+            return change
+    elif target.event == 'route_status_updated' and data['route_id'] in previous.routes:
+        change = _apply_route_status(session, run_id, data['route_id'], previous.routes[data['route_id']].status)
+        record_event(session, run_id, *change, undo_of=target.id)
+        return change
+    elif target.event == 'global_order_toggled':
+        is_obtained = previous.global_orders.get(data['order_number'], False)
+        session.query(GlobalOrder).filter_by(run_id=run_id, order_number=data['order_number']).update(
+            {GlobalOrder.is_obtained: is_obtained})
+        change = ('global_order_toggled', {'order_number': data['order_number'], 'is_obtained': is_obtained})
+        record_event(session, run_id, *change, undo_of=target.id)
+        return change
+
+    restore_run(session, run_id, before)
+    record_event(session, run_id, 'run_restored', {'state': before}, undo_of=target.id)
+    return 'run_restored', {'undo_of': target.id}
+
+
+@app.route('/api/undo', methods=['POST'], defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/undo', methods=['POST'])
+def undo_last_change(run_id):
+    """Macht die letzte Änderung des Runs rückgängig; wiederholte Aufrufe gehen weiter zurück."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+    flush_pending_writes()
+    session = _sessions.write()
     try:
-        reset_full_db()
-        socketio.emit('full_db_reset')
-        return jsonify({'message': 'Datenbank vollständig zurückgesetzt.'}), 200
+        target = find_undo_target(session, run_id)
+        if target is None:
+            return jsonify({'error': 'Keine Änderung zum Rückgängigmachen vorhanden.'}), 409
+        replayed = replay_state(session, run_id, upto=target.id - 1)
+        if replayed is None:
+            return jsonify({'error': 'Der Zustand vor dieser Änderung ist nicht im Journal enthalten.'}), 409
+
+        change = _undo_change(session, run_id, target, replayed[0])
+        session.commit()
+        broadcast_change(run_id, *change)
+        return jsonify({'message': 'Änderung rückgängig gemacht',
+                        'undone': {'event_id': target.id, 'event': target.event}}), 200
     except Exception as e:
-        print(f"Fehler beim vollständigen Datenbank-Reset: {e}")
+        session.rollback()
+        print(f"Fehler beim Rückgängigmachen: {e}")
         return jsonify({'error': f'Interner Serverfehler: {str(e)}'}), 500
 
 
+@app.route('/api/history', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/history')
+def get_history(run_id):
+    """Journal des Runs, neueste Einträge zuerst; mit before=<event_id> wird weiter zurückgeblättert."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+    try:
+        before = request.args.get('before', type=int)
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'Ungültiger Wert für limit.'}), 400
+
+    history = read_history(_sessions.read(), run_id, before=before, limit=limit)
+    return jsonify({'run_id': run_id, 'events': history}), 200
+
+
+@app.route('/api/state_at', defaults={'run_id': DEFAULT_RUN_ID})
+@app.route('/api/runs/<int:run_id>/state_at')
+def get_state_at(run_id):
+    """Zustand des Runs nach einem bestimmten Journal-Event (Zeitreise), aus Snapshot und Rest-Events."""
+    if get_run_state(run_id) is None:
+        return _run_not_found(run_id)
+    event_id = request.args.get('event', type=int)
+    if event_id is None:
+        return jsonify({'error': 'Parameter event fehlt oder ist ungültig.'}), 400
+
+    replayed = replay_state(_sessions.read(), run_id, upto=event_id)
+    if replayed is None:
+        return jsonify({'error': f'Für Event {event_id} gibt es keinen Snapshot im Journal.'}), 404
+    data, last_event_id, _ = replayed
+    return jsonify(dict(data, run_id=run_id, event_id=last_event_id)), 200
+
+
 # NEUE API-ENDPUNKTE FÜR KONFIGURATIONSVERWALTUNG
 @app.route('/api/config/<filename>', methods=['GET'])
 def get_config_file(filename):
     """Gibt den Inhalt einer JSON-Konfigurationsdatei zurück."""
-    if filename not in ['routes.json', 'pokemon_names.json', 'level_caps.json']:
+    if filename not in CONFIG_FILES:
         return jsonify({'error': 'Unbekannte Konfigurationsdatei'}), 400
 
-    filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
+        with open(_config_files.path(filename), 'r', encoding='utf-8') as f:
             content = f.read()
         return jsonify({'content': content}), 200
     except FileNotFoundError:
@@ -358,8 +1317,8 @@ def get_config_file(filename):
 
 @app.route('/api/config/<filename>', methods=['POST'])
 def save_config_file(filename):
-    """Speichert den Inhalt einer JSON-Konfigurationsdatei."""
-    if filename not in ['routes.json', 'pokemon_names.json', 'level_caps.json']:
+    """Prüft und speichert eine JSON-Konfigurationsdatei; übernommen und verteilt wird nur das Diff."""
+    if filename not in CONFIG_FILES:
         return jsonify({'error': 'Unbekannte Konfigurationsdatei'}), 400
 
     data = request.json
@@ -367,37 +1326,90 @@ def save_config_file(filename):
     if content is None:
         return jsonify({'error': 'Inhalt fehlt'}), 400
 
-    filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
     try:
-        # Versuche, den JSON-Inhalt zu parsen, um Syntaxfehler zu vermeiden
-        json.loads(content)
-
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-
-        # NEU: Lade Konfigurationen nach dem Speichern neu
-        if filename in ['routes.json', 'pokemon_names.json']:
-            reload_app_configs()  # Lädt nur die in-memory Listen neu
-
-        socketio.emit('config_saved', {'filename': filename})  # SocketIO-Event senden
-        return jsonify({'message': f'Datei {filename} erfolgreich gespeichert.'}), 200
+        diff = _config_files.save(filename, content)
+        if not diff:
+            return jsonify({'message': f'Datei {filename} gespeichert, keine inhaltlichen Änderungen.'}), 200
+        return jsonify({'message': f'Datei {filename} erfolgreich gespeichert.', 'diff': diff}), 200
     except json.JSONDecodeError as e:
         return jsonify({'error': f'Ungültiges JSON-Format in {filename}: {str(e)}'}), 400
+    except ConfigError as e:
+        return jsonify({'error': f'Ungültiger Inhalt: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': f'Fehler beim Schreiben von {filename}: {str(e)}'}), 500
 
 
 @app.route('/api/reload_configs', methods=['POST'])
 def reload_configs_api():
-    """Trigger zum Neuladen der Konfigurationsdateien."""
-    reload_app_configs()
-    socketio.emit('configs_reloaded')  # SocketIO-Event senden
-    return jsonify({'message': 'App-Konfigurationen neu geladen.'}), 200
+    """Trigger zum Neuladen der Konfigurationsdateien (normalerweise erkennt der Watcher Änderungen selbst)."""
+    changes = reload_app_configs()
+    return jsonify({'message': 'App-Konfigurationen neu geladen.', 'changed_files': sorted(changes)}), 200
+
+
+# --- Mehr-Worker-Betrieb: Nachrichten vom Bus ---
+def _on_cluster_message(event, data, room):
+    """Läuft auf jedem Worker für jede Nachricht über den Bus (siehe pubsub.ClusterManagerMixin)."""
+    if room == CONTROL_ROOM:
+        if event == 'reload_configs' and data.get('config_hash') != _app_config_data["CONFIG_HASH"]:
+            reload_app_configs()
+        return
+    run_id = run_id_from_room(room)
+    if run_id is None:
+        return
+    if event == 'run_deleted':
+        _forget_run(run_id)
+        return
+    entries = entries_from_message(event, data)
+    if any(entry['event'] in STATE_CHANGE_EVENTS for entry in entries):
+        _stats.invalidate()  # Auch für Runs, die hier nicht geladen sind
+    state = _run_states.get(run_id)
+    if state is None:
+        return
+    derived = []
+    with state.lock:
+        for entry in state.ingest(entries):
+            # Die Link-Sicht jedes Workers folgt dem Change-Log; senden muss sie nur der Worker der Änderung
+            entry_derived = _derive_link_changes(state, [entry])
+            if entry['seq'] in state.local_seqs:
+                derived.extend(entry_derived)
+        state.local_seqs = {seq for seq in state.local_seqs if seq > state.version}
+    if derived:
+        broadcast_changes(run_id, derived)
+
+
+def load_run_stores():
+    """Lädt beim Start den Zustand aller Runs in den Speicher; danach wird nur noch dort gelesen."""
+    start = time.perf_counter()
+    session = get_db_session()
+    try:
+        run_ids = session.scalars(select(Run.id)).all()
+    finally:
+        session.close()
+    for run_id in run_ids:
+        state = get_run_state(run_id)
+        if state is not None:
+            _run_store(state)
+    print(f"Zustand von {len(run_ids)} Run(s) geladen ({(time.perf_counter() - start) * 1000:.1f} ms).")
+
+
+if CLUSTERED:
+    socketio.server.manager.add_listener(_on_cluster_message)
+    start_listening(socketio.server)
+else:
+    load_run_stores()
+    _startup.mark('Run-Zustand laden')
+
+if app.config['CONFIG_WATCH_INTERVAL'] > 0:
+    _config_files.watch(app.config['CONFIG_WATCH_INTERVAL'])
 
 
 @socketio.on('connect')
 def handle_connect():
-    print('Client verbunden!')
+    # Jeder Client hört nur auf den Raum seines Runs; mit format=compact auf den für 'changes_compact'
+    run_id = request.args.get('run_id', DEFAULT_RUN_ID, type=int)
+    compact = request.args.get('format') == 'compact'
+    join_room(compact_room(run_id) if compact else run_room(run_id))
+    print(f'Client verbunden! (Run {run_id}{", kompakt" if compact else ""})')
 
 
 @socketio.on('disconnect')
@@ -405,6 +1417,12 @@ def handle_disconnect():
     print('Client getrennt!')
 
 
+_startup.mark('Routen und Socket-Handler')
+_startup.report()
+REGISTRY.gauge('soullink_startup_seconds', 'Dauer der Startphasen dieses Prozesses.', ('phase',),
+               callback=lambda: {(phase,): seconds for phase, seconds in _startup.phases})
+
+
 if __name__ == '__main__':
     FLASK_HOST = "0.0.0.0"
     FLASK_PORT = 5000
@@ -0,0 +1,156 @@
+# benchmarks/bench_db_contention.py
+"""Schreib-Contention-Benchmark: Standard-SQLite-Engine gegen das getunte Profil aus models.py.
+
+Mehrere Schreiber-Threads führen Fang-Upserts wie /api/update_catch aus (eine Transaktion pro Änderung),
+gleichzeitig lesen Leser-Threads den kompletten Zustand wie /api/data. Gemessen werden Latenzen,
+Durchsatz und "database is locked"-Fehler.
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_db_contention.py [--writers 8] [--readers 4] [--ops 200] [--json ergebnis.json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from models import (Base, Run, Player, Route, PokemonCatch, GlobalOrder, LevelCap,  # noqa: E402
+                    DEFAULT_RUN_ID, SQLITE_PRAGMAS, create_db_engine)
+
+PROFILES = {
+    'default': None,  # Verhalten vor dem Tuning: Rollback-Journal, Treiber-Standardwerte
+    'tuned': SQLITE_PRAGMAS,
+}
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _seed(session_factory, players, routes):
+    session = session_factory()
+    session.add(Run(id=DEFAULT_RUN_ID, name='Benchmark'))
+    session.flush()
+    session.execute(insert(Player), [{'run_id': DEFAULT_RUN_ID, 'name': f'Spieler {i}'} for i in range(players)])
+    session.execute(insert(Route), [{'run_id': DEFAULT_RUN_ID, 'name': f'Route {i}', 'status': ''}
+                                    for i in range(routes)])
+    session.commit()
+    session.close()
+
+
+def run_profile(profile, args):
+    directory = tempfile.mkdtemp(prefix='soullink-bench-')
+    db_engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", pragmas=PROFILES[profile])
+    Base.metadata.create_all(bind=db_engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    _seed(session_factory, args.players, args.routes)
+
+    write_latencies = []
+    read_latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop_readers = threading.Event()
+
+    def writer(seed):
+        rng = random.Random(seed)
+        for _ in range(args.ops):
+            player_id, route_id = rng.randint(1, args.players), rng.randint(1, args.routes)
+            start = time.perf_counter()
+            session = session_factory()
+            try:
+                stmt = sqlite_insert(PokemonCatch).values(run_id=DEFAULT_RUN_ID, player_id=player_id,
+                                                          route_id=route_id,
+                                                          pokemon_name=f'Pokemon {rng.randint(1, 500)}')
+                session.execute(stmt.on_conflict_do_update(index_elements=['player_id', 'route_id'],
+                                                           set_={'pokemon_name': stmt.excluded.pokemon_name}))
+                session.commit()
+                with lock:
+                    write_latencies.append(time.perf_counter() - start)
+            except OperationalError as e:
+                session.rollback()
+                with lock:
+                    errors.append(str(e.orig))
+            finally:
+                session.close()
+
+    def reader():
+        while not stop_readers.is_set():
+            start = time.perf_counter()
+            session = session_factory()
+            try:
+                for model in (Route, Player, PokemonCatch, GlobalOrder, LevelCap):
+                    session.query(model).all()
+                with lock:
+                    read_latencies.append(time.perf_counter() - start)
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+            finally:
+                session.close()
+
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    writers = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    start = time.perf_counter()
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop_readers.set()
+    for thread in readers:
+        thread.join()
+    db_engine.dispose()
+
+    return {
+        'profile': profile,
+        'writers': args.writers,
+        'readers': args.readers,
+        'writes_ok': len(write_latencies),
+        'writes_per_s': len(write_latencies) / elapsed,
+        'write_p50_ms': _percentile(write_latencies, 0.5) * 1000,
+        'write_p99_ms': _percentile(write_latencies, 0.99) * 1000,
+        'reads': len(read_latencies),
+        'read_p50_ms': statistics.median(read_latencies) * 1000 if read_latencies else 0.0,
+        'locked_errors': sum('locked' in error for error in errors),
+        'other_errors': sum('locked' not in error for error in errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--ops', type=int, default=200, help='Schreibvorgänge pro Schreiber-Thread')
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--routes', type=int, default=100)
+    parser.add_argument('--json', help='Ergebnisse zusätzlich als JSON in diese Datei schreiben')
+    args = parser.parse_args()
+
+    results = [run_profile(profile, args) for profile in PROFILES]
+
+    print(f"{'Profil':8} {'Writes/s':>9} {'W p50 ms':>9} {'W p99 ms':>9} {'Reads':>7} {'R p50 ms':>9} {'locked':>7}")
+    for r in results:
+        print(f"{r['profile']:8} {r['writes_per_s']:9.0f} {r['write_p50_ms']:9.2f} {r['write_p99_ms']:9.2f} "
+              f"{r['reads']:7d} {r['read_p50_ms']:9.2f} {r['locked_errors']:7d}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+# benchmarks/bench_load.py
+"""Last-Benchmark für die echte App: HTTP-Latenzen, Event-Fan-out an Socket.IO-Clients und DB-Contention.
+
+Die App läuft im Prozess (Flask- und Socket.IO-Test-Clients, kein Netzwerk) in einem temporären
+Verzeichnis mit eigener Datenbank. Gemessen werden:
+  - Latenzen von /api/data (voll und per ETag), /api/update_catch, /api/add_route, /api/toggle_global_order
+  - Fan-out: Zeit vom Absenden eines Fangs bis das Event bei jedem verbundenen Client angekommen ist
+  - Gemischte Last aus mehreren Greenlets gleichzeitig: Durchsatz und Fehler (z.B. "database is locked")
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_load.py [--players 4] [--routes 100] [--clients 50] [--ops 300]
+                                    [--concurrency 8] [--write-mode sync] [--json ergebnis.json]
+
+Die JSON-Ausgabe enthält Commit und Parameter, damit sich Läufe verschiedener Stände vergleichen lassen.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+POKEMON = ['Bisasam', 'Glumanda', 'Schiggy', 'Pikachu', 'Evoli', 'Mew', 'Nebulak', 'Karpador', 'Dratini', 'Relaxo']
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summary(latencies, errors=0):
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'p50_ms': _percentile(latencies, 0.5) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class LoadBenchmark:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+        # Eigene Datenbank im temporären Verzeichnis; die App liest DATABASE_URL relativ zum Arbeitsverzeichnis
+        os.chdir(tempfile.mkdtemp(prefix='soullink-load-'))
+        os.environ['SOULLINK_WRITE_MODE'] = args.write_mode
+        os.environ['SOULLINK_EMIT_TICK_MS'] = str(args.emit_tick_ms)
+        import app as app_module  # Erst jetzt: app.py legt beim Import die Datenbank an
+        self.app_module = app_module
+        self.http = app_module.app.test_client()
+        self.gevent = __import__('gevent')
+
+        self.player_ids = []
+        self.route_ids = []
+        self.clients = []
+
+    def _request(self, method, url, **kwargs):
+        start = time.perf_counter()
+        response = self.http.open(url, method=method, **kwargs)
+        return time.perf_counter() - start, response
+
+    def setup(self):
+        args = self.args
+        _, response = self._request('POST', '/api/players/bulk',
+                                    json={'names': [f'Spieler {i}' for i in range(args.players)]})
+        self.player_ids = [p['id'] for p in response.get_json()['players']]
+        _, response = self._request('POST', '/api/routes/bulk',
+                                    json={'names': [f'Route {i}' for i in range(args.routes)]})
+        self.route_ids = [r['id'] for r in response.get_json()['routes']]
+        # Grundbestand an Fängen, damit /api/data eine realistische Größe hat
+        for route_id in self.route_ids:
+            for player_id in self.player_ids:
+                if self.rng.random() < 0.7:
+                    self._request('POST', '/api/update_catch', json={
+                        'player_id': player_id, 'route_id': route_id, 'pokemon_name': self.rng.choice(POKEMON)})
+        for _ in range(args.clients):
+            self.clients.append(self.app_module.socketio.test_client(self.app_module.app, query_string='run_id=1'))
+        self._drain()
+
+    def _drain(self):
+        for client in self.clients:
+            client.get_received()
+
+    def _random_catch(self):
+        return {'player_id': self.rng.choice(self.player_ids), 'route_id': self.rng.choice(self.route_ids),
+                'pokemon_name': self.rng.choice(POKEMON)}
+
+    def bench_data(self):
+        """Voller Snapshot nach jeder Änderung und Revalidierung per ETag."""
+        full, conditional = [], []
+        for _ in range(self.args.ops // 3):
+            self._request('POST', '/api/update_catch', json=self._random_catch())
+            elapsed, response = self._request('GET', '/api/data')
+            full.append(elapsed)
+            elapsed, _ = self._request('GET', '/api/data', headers={'If-None-Match': response.headers['ETag']})
+            conditional.append(elapsed)
+        self._drain()
+        return {'get_all_data': _summary(full), 'get_all_data_304': _summary(conditional)}
+
+    def bench_writes(self):
+        results = {}
+        for name, make_request in (
+                ('update_catch', lambda i: ('/api/update_catch', self._random_catch())),
+                ('add_route', lambda i: ('/api/add_route', {'name': f'Zusatzroute {i}'})),
+                ('toggle_global_order', lambda i: ('/api/toggle_global_order', {'order_number': i % 13 + 1}))):
+            latencies, errors = [], 0
+            for i in range(self.args.ops):
+                url, body = make_request(i)
+                elapsed, response = self._request('POST', url, json=body)
+                latencies.append(elapsed)
+                errors += response.status_code >= 400
+                if i % 50 == 0:
+                    self._drain()
+            results[name] = _summary(latencies, errors)
+        self._drain()
+        return results
+
+    def bench_fanout(self):
+        """Zeit vom Absenden eines Fangs, bis das Event bei allen Clients im Empfangspuffer liegt."""
+        latencies = []
+        timeouts = 0
+        for _ in range(self.args.fanout_samples):
+            catch = self._random_catch()
+            catch['pokemon_name'] = f"Fanout {self.rng.random()}"  # Eindeutig, damit das Event erkennbar ist
+            start = time.perf_counter()
+            self._request('POST', '/api/update_catch', json=catch)
+            pending = set(range(len(self.clients)))
+            deadline = start + 2.0
+            while pending and time.perf_counter() < deadline:
+                for index in list(pending):
+                    if any(self._contains_catch(packet, catch['pokemon_name'])
+                           for packet in self.clients[index].get_received()):
+                        latencies.append(time.perf_counter() - start)
+                        pending.discard(index)
+                if pending:
+                    self.gevent.sleep(0.0005)  # Aggregator und Flush-Greenlets laufen lassen
+            timeouts += len(pending)
+        result = _summary(latencies)
+        result['timeouts'] = timeouts
+        return {'catch_fanout': result}
+
+    @staticmethod
+    def _contains_catch(packet, pokemon_name):
+        payload = packet['args'][0] if packet['args'] else {}
+        if packet['name'] == 'changes_batch':
+            return any(change['data'].get('pokemon_name') == pokemon_name for change in payload['changes'])
+        return packet['name'] == 'catch_updated' and payload.get('pokemon_name') == pokemon_name
+
+    def bench_mixed(self):
+        """Mehrere Greenlets gleichzeitig: 80% Fänge, 10% Snapshots, 10% Orden."""
+        latencies = {'update_catch': [], 'get_all_data': [], 'toggle_global_order': []}
+        errors = {name: 0 for name in latencies}
+        ops_per_worker = max(1, self.args.ops // self.args.concurrency)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(ops_per_worker):
+                roll = rng.random()
+                if roll < 0.8:
+                    name, method, url, body = 'update_catch', 'POST', '/api/update_catch', self._random_catch()
+                elif roll < 0.9:
+                    name, method, url, body = 'get_all_data', 'GET', '/api/data', None
+                else:
+                    name, method, url, body = ('toggle_global_order', 'POST', '/api/toggle_global_order',
+                                               {'order_number': rng.randint(1, 13)})
+                elapsed, response = self._request(method, url, json=body)
+                latencies[name].append(elapsed)
+                errors[name] += response.status_code >= 400
+                self.gevent.sleep(0)  # Anderen Greenlets Gelegenheit geben
+
+        start = time.perf_counter()
+        self.gevent.joinall([self.gevent.spawn(worker, i) for i in range(self.args.concurrency)])
+        elapsed = time.perf_counter() - start
+        self.app_module.flush_pending_writes()
+        self._drain()
+
+        results = {f'mixed_{name}': _summary(values, errors[name]) for name, values in latencies.items()}
+        total = sum(len(values) for values in latencies.values())
+        results['mixed_total'] = {'count': total, 'errors': sum(errors.values()), 'ops_per_s': total / elapsed}
+        return results
+
+    def run(self):
+        start = time.perf_counter()
+        self.setup()
+        setup_s = time.perf_counter() - start
+        results = {}
+        results.update(self.bench_data())
+        results.update(self.bench_writes())
+        results.update(self.bench_fanout())
+        results.update(self.bench_mixed())
+        for client in self.clients:
+            client.disconnect()
+        return {
+            'meta': {
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'players': self.args.players,
+                'routes': self.args.routes,
+                'clients': self.args.clients,
+                'ops': self.args.ops,
+                'concurrency': self.args.concurrency,
+                'write_mode': self.args.write_mode,
+                'emit_tick_ms': self.args.emit_tick_ms,
+                'setup_s': setup_s,
+            },
+            'results': results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--routes', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=50, help='Anzahl simulierter Socket.IO-Clients')
+    parser.add_argument('--ops', type=int, default=300, help='Anfragen pro Messung')
+    parser.add_argument('--concurrency', type=int, default=8, help='Gleichzeitige Greenlets bei gemischter Last')
+    parser.add_argument('--fanout-samples', type=int, default=50)
+    parser.add_argument('--write-mode', default='sync', choices=['sync', 'batched', 'async'])
+    parser.add_argument('--emit-tick-ms', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Ergebnisse zusätzlich als JSON in diese Datei schreiben')
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)  # Vor dem Wechsel ins temporäre Verzeichnis auflösen
+
+    report = LoadBenchmark(args).run()
+
+    meta = report['meta']
+    print(f"Commit {meta['commit']}: {meta['players']} Spieler x {meta['routes']} Routen, {meta['clients']} Clients, "
+          f"Schreibmodus {meta['write_mode']}, Emit-Tick {meta['emit_tick_ms']} ms")
+    print(f"{'Messung':28} {'Anzahl':>7} {'Fehler':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, r in report['results'].items():
+        if 'p50_ms' in r:
+            print(f"{name:28} {r['count']:7d} {r['errors']:7d} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} {r['max_ms']:9.2f}")
+    mixed = report['results']['mixed_total']
+    print(f"Gemischte Last: {mixed['ops_per_s']:.0f} Anfragen/s, {mixed['errors']} Fehler; "
+          f"Fan-out-Timeouts: {report['results']['catch_fanout']['timeouts']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
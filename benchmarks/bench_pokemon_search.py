@@ -0,0 +1,83 @@
+# benchmarks/bench_pokemon_search.py
+"""Micro-Benchmark: PokemonNameIndex gegen einen naiven linearen Scan.
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_pokemon_search.py [--names 1200] [--repeat 200]
+"""
+import argparse
+import difflib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pokemon_search import PokemonNameIndex, normalize_name  # noqa: E402
+
+SYLLABLES = ['bi', 'sa', 'flor', 'glu', 'rak', 'tur', 'tok', 'pi', 'ka', 'chu', 'mau', 'zi', 'gar', 'dos',
+             'pam', 'ras', 'kno', 'gga', 'lix', 'ter', 'quap', 'pel', 'ron', 'dra', 'sti', 'fel', 'wo', 'mel']
+
+
+def build_name_list(target_size, seed=42):
+    """Echte Namen aus pokemon_names.json, aufgefüllt mit künstlichen Namen weiterer 'Generationen'."""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(base_dir, 'pokemon_names.json'), 'r', encoding='utf-8') as f:
+        names = [item['name'] for item in json.load(f)]
+
+    rng = random.Random(seed)
+    seen = set(names)
+    while len(names) < target_size:
+        candidate = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if candidate not in seen:
+            seen.add(candidate)
+            names.append(candidate)
+    return names
+
+
+def naive_search(names, query, limit=10):
+    """Linearer Scan wie im bisherigen Browser-Dropdown, plus difflib als unscharfer Fallback."""
+    normalized_query = normalize_name(query)
+    hits = sorted(name for name in names if normalized_query in normalize_name(name))
+    if len(hits) < limit:
+        hits += [name for name in difflib.get_close_matches(query, names, n=limit, cutoff=0.6) if name not in hits]
+    return hits[:limit]
+
+
+def _time_per_query(func, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - start) / (repeat * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=1200, help='Größe der Namensliste (Standard: 1200)')
+    parser.add_argument('--repeat', type=int, default=200, help='Wiederholungen pro Query-Satz')
+    args = parser.parse_args()
+
+    names = build_name_list(args.names)
+    queries = ['Bisaflor', 'bisa', 'Bisaflro', 'bsaflor', 'glu', 'Turtk', 'pika', 'Glurakk', 'ka', 'xyz']
+
+    start = time.perf_counter()
+    index = PokemonNameIndex(names)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    indexed = _time_per_query(lambda q: index.search(q), queries, args.repeat)
+    naive = _time_per_query(lambda q: naive_search(names, q), queries, max(1, args.repeat // 10))
+
+    print(f"Namen:            {len(names)}")
+    print(f"Index-Aufbau:     {build_ms:.1f} ms")
+    print(f"Index-Suche:      {indexed * 1e6:.1f} µs/Query")
+    print(f"Linearer Scan:    {naive * 1e6:.1f} µs/Query")
+    print(f"Faktor:           {naive / indexed:.1f}x")
+    print()
+    for query in queries[:4]:
+        print(f"{query!r:12} -> {index.search(query, limit=5)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+# benchmarks/bench_wire_format.py
+"""Vergleich der Darstellungen von Snapshot und Socket-Events: Größe sowie Zeit für Kodieren und Dekodieren.
+
+Verglichen werden das bisherige JSON (wie /api/data und die Socket-Events es senden) und die kompakte
+Darstellung aus wire_format.py als JSON und, falls msgpack installiert ist, als MessagePack; jeweils
+roh und gzip-komprimiert. Der Zustand ist synthetisch, die Namen stammen aus routes.json und
+pokemon_names.json, damit die Wörterbuch-Kodierung realistisch trifft. Dekodieren misst Parsen plus
+Rückübersetzung in die gewohnte Form (so wie state_sync.js es im Browser macht).
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_wire_format.py [--players 4] [--routes 100] [--events 1000] [--json ergebnis.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from wire_format import (NameDictionary, COMPACT_MIMETYPE, MSGPACK_MIMETYPE, msgpack, encode_snapshot,
+                         decode_snapshot, encode_changes, decode_changes, serialize, deserialize, gzip_compress)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load_names(filename):
+    with open(os.path.join(PROJECT_DIR, filename), 'r', encoding='utf-8') as f:
+        return [item['name'] for item in json.load(f)]
+
+
+def _timed(function, repeat):
+    """Bestes Ergebnis aus `repeat` Läufen in Sekunden (weniger Rauschen als der Mittelwert)."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class WireFormatBenchmark:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        bundle = {'all_route_names': _load_names('routes.json'), 'all_pokemon_names': _load_names('pokemon_names.json'),
+                  'config_hash': 'benchmark'}
+        self.bundle = bundle
+        self.names = NameDictionary(bundle)
+
+    def _pokemon(self):
+        # Einige Namen außerhalb der Liste (Tippfehler, Spitznamen) bleiben in der kompakten Form Strings
+        if self.rng.random() < 0.05:
+            return f"Spitzname {self.rng.randint(1, 999)}"
+        return self.rng.choice(self.bundle['all_pokemon_names'])
+
+    def make_snapshot(self):
+        args = self.args
+        route_names = self.bundle['all_route_names']
+        routes = [{'id': i + 1, 'name': route_names[i] if i < len(route_names) else f"Eigene Route {i}",
+                   'status': self.rng.choice(["", "", "", "Fehlgeschlagen"])} for i in range(args.routes)]
+        players = [{'id': i + 1, 'name': f"Spieler {i + 1}"} for i in range(args.players)]
+        catches = [{'player_id': player['id'], 'route_id': route['id'], 'pokemon_name': self._pokemon()}
+                   for route in routes for player in players if self.rng.random() < 0.8]
+        return {
+            'run_id': 1,
+            'players': players,
+            'routes': routes,
+            'catches': catches,
+            'global_orders': [{'order_number': i, 'is_obtained': i < 5} for i in range(1, 14)],
+            'level_caps': [{'name': f"{i}. Arena", 'order_number': i, 'max_level': 10 + 5 * i,
+                            'adjusted_level': 9 + 5 * i} for i in range(1, 14)],
+            'config_hash': 'benchmark',
+            'state_version': 1234,
+            'boot_id': 'abcdef012345',
+        }
+
+    def make_frames(self):
+        """Frames wie sie der EmitAggregator sendet: meist einzelne Fänge, ab und zu ein Batch mit Link-Event."""
+        frames = []
+        seq = 0
+        for _ in range(self.args.events):
+            seq += 1
+            catch = {'player_id': self.rng.randint(1, self.args.players), 'route_id': self.rng.randint(1, self.args.routes),
+                     'pokemon_name': self._pokemon()}
+            entries = [{'seq': seq, 'event': 'catch_updated', 'data': dict(catch, seq=seq)}]
+            if self.rng.random() < 0.3:
+                seq += 1
+                link = {'route_id': catch['route_id'], 'name': self.rng.choice(self.bundle['all_route_names']),
+                        'state': 'alive', 'pokemon': [self._pokemon() for _ in range(self.args.players)],
+                        'counts': {'alive': 10, 'dead': 2, 'failed': 1, 'open': 87}}
+                entries.append({'seq': seq, 'event': 'link_updated', 'data': dict(link, seq=seq)})
+            frames.append(entries)
+        return frames
+
+    def _formats(self):
+        formats = [('json', None), ('compact', COMPACT_MIMETYPE)]
+        if msgpack is not None:
+            formats.append(('msgpack', MSGPACK_MIMETYPE))
+        return formats
+
+    def bench_snapshot(self):
+        payload = self.make_snapshot()
+        repeat = self.args.repeat
+        results = {}
+        for name, mimetype in self._formats():
+            if mimetype is None:
+                encode = lambda: json.dumps(payload).encode('utf-8')  # Wie app.json.dumps (Flask)
+                decode = lambda body: json.loads(body)
+            else:
+                encode = lambda: serialize(encode_snapshot(payload, self.names), mimetype)
+                decode = lambda body: decode_snapshot(deserialize(body, mimetype), self.names)
+            encode_s, body = _timed(encode, repeat)
+            decode_s, decoded = _timed(lambda: decode(body), repeat)
+            assert decoded == payload, f"{name}: Dekodierter Snapshot weicht ab"
+            gzip_s, compressed = _timed(lambda: gzip_compress(body), repeat)
+            results[f'snapshot_{name}'] = {
+                'bytes': len(body), 'gzip_bytes': len(compressed), 'encode_ms': encode_s * 1000,
+                'decode_ms': decode_s * 1000, 'gzip_ms': gzip_s * 1000,
+                'gunzip_ms': _timed(lambda: gzip.decompress(compressed), repeat)[0] * 1000,
+            }
+        return results
+
+    def bench_events(self):
+        """Summe über alle Frames; Socket.IO sendet JSON ohne Leerzeichen, daher separators wie dort."""
+        frames = self.make_frames()
+        repeat = self.args.repeat
+        results = {}
+        verbose = [entries[0]['data'] if len(entries) == 1 else {'changes': entries} for entries in frames]
+        encode_s, bodies = _timed(lambda: [json.dumps(frame, separators=(',', ':')) for frame in verbose], repeat)
+        decode_s, _ = _timed(lambda: [json.loads(body) for body in bodies], repeat)
+        results['events_json'] = {'bytes': sum(len(body.encode('utf-8')) for body in bodies),
+                                  'encode_ms': encode_s * 1000, 'decode_ms': decode_s * 1000}
+        encode_s, bodies = _timed(lambda: [json.dumps(encode_changes(entries, self.names), separators=(',', ':'),
+                                                      ensure_ascii=False) for entries in frames], repeat)
+        decode_s, decoded = _timed(lambda: [decode_changes(json.loads(body), self.names) for body in bodies], repeat)
+        assert decoded == frames, "Kompakte Events weichen nach dem Dekodieren ab"
+        results['events_compact'] = {'bytes': sum(len(body.encode('utf-8')) for body in bodies),
+                                     'encode_ms': encode_s * 1000, 'decode_ms': decode_s * 1000}
+        return results
+
+    def run(self):
+        results = {}
+        results.update(self.bench_snapshot())
+        results.update(self.bench_events())
+        return {
+            'meta': {
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'msgpack': msgpack is not None,
+                'players': self.args.players,
+                'routes': self.args.routes,
+                'events': self.args.events,
+                'repeat': self.args.repeat,
+            },
+            'results': results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--routes', type=int, default=100)
+    parser.add_argument('--events', type=int, default=1000, help='Anzahl Socket-Frames')
+    parser.add_argument('--repeat', type=int, default=20, help='Wiederholungen je Messung (bestes Ergebnis zählt)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Ergebnisse zusätzlich als JSON in diese Datei schreiben')
+    args = parser.parse_args()
+
+    report = WireFormatBenchmark(args).run()
+
+    meta = report['meta']
+    print(f"Commit {meta['commit']}: {meta['players']} Spieler x {meta['routes']} Routen, {meta['events']} Socket-Frames"
+          f"{'' if meta['msgpack'] else ' (msgpack nicht installiert)'}")
+    print(f"{'Darstellung':20} {'Bytes':>9} {'gzip':>9} {'kodieren ms':>12} {'dekodieren ms':>14}")
+    for name, r in report['results'].items():
+        gzip_bytes = f"{r['gzip_bytes']:9d}" if 'gzip_bytes' in r else f"{'-':>9}"
+        print(f"{name:20} {r['bytes']:9d} {gzip_bytes} {r['encode_ms']:12.3f} {r['decode_ms']:14.3f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
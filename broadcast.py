@@ -0,0 +1,105 @@
+# broadcast.py
+import gevent
+from gevent.lock import RLock
+
+
+# Raum ohne Clients für Nachrichten zwischen den Workern (z.B. Config-Reload), siehe pubsub.py
+CONTROL_ROOM = "cluster:control"
+
+
+def run_room(run_id):
+    """SocketIO-Raum aller Zuschauer eines Challenge-Runs."""
+    return f"run:{run_id}"
+
+
+def compact_room(run_id):
+    """Raum der Zuschauer eines Runs, die Änderungen im kompakten Format bekommen (siehe wire_format.py)."""
+    return f"run:{run_id}:compact"
+
+
+def run_id_from_room(room):
+    """Umkehrung von run_room; None für alle anderen Räume."""
+    if isinstance(room, str) and room.startswith("run:"):
+        try:
+            return int(room[4:])
+        except ValueError:
+            return None
+    return None
+
+
+def compact_run_id_from_room(room):
+    """Umkehrung von compact_room; None für alle anderen Räume."""
+    if isinstance(room, str) and room.endswith(":compact"):
+        return run_id_from_room(room[:-len(":compact")])
+    return None
+
+
+def entries_from_message(event, data):
+    """Liest die {seq, event, data}-Einträge aus einem Frame, wie ihn EmitAggregator sendet."""
+    if event == 'changes_batch':
+        return list(data.get('changes', []))
+    if isinstance(data, dict) and isinstance(data.get('seq'), int):
+        return [{'seq': data['seq'], 'event': event, 'data': data}]
+    return []
+
+
+class EmitAggregator:
+    """Fasst Änderungen, die innerhalb eines kurzen Ticks für denselben Raum anfallen, zu einem Frame zusammen.
+
+    Einzelne Änderungen gehen unter ihrem eigenen Event-Namen raus, mehrere als 'changes_batch' mit der
+    Liste der {seq, event, data}-Einträge. Die Reihenfolge pro Raum bleibt erhalten. Mit tick=0 wird
+    sofort gesendet.
+
+    Mit `compact_encoder` geht jeder Frame eines Run-Raums zusätzlich als 'changes_compact' an
+    compact_room(run_id); compact_encoder(run_id, entries) liefert den Frame oder None (niemand hört zu).
+    """
+
+    def __init__(self, socketio, tick=0.01, compact_encoder=None):
+        self.socketio = socketio
+        self.tick = tick
+        self.compact_encoder = compact_encoder
+        self._buffers = {}  # room -> [entry, ...]
+        self._lock = RLock()
+        self.frames_sent = 0
+        self.events_sent = 0
+
+    def emit(self, room, entries):
+        if not entries:
+            return
+        if self.tick <= 0:
+            self._send(room, list(entries))
+            return
+        with self._lock:
+            buffer = self._buffers.get(room)
+            if buffer is None:
+                self._buffers[room] = list(entries)
+                gevent.spawn_later(self.tick, self.flush, room)
+            else:
+                buffer.extend(entries)
+
+    def pending(self):
+        """Zahl der Änderungen, die noch auf ihren Tick warten."""
+        with self._lock:
+            return sum(len(entries) for entries in self._buffers.values())
+
+    def flush(self, room=None):
+        """Sendet die gepufferten Änderungen eines Raums (oder aller Räume) sofort."""
+        with self._lock:
+            rooms = [room] if room is not None else list(self._buffers)
+            pending = [(r, self._buffers.pop(r)) for r in rooms if r in self._buffers]
+            # Unter dem Lock senden, damit ein paralleler Flush die Reihenfolge nicht vertauscht
+            for r, entries in pending:
+                self._send(r, entries)
+
+    def _send(self, room, entries):
+        self.frames_sent += 1
+        self.events_sent += len(entries)
+        if len(entries) == 1:
+            self.socketio.emit(entries[0]['event'], entries[0]['data'], to=room)
+        else:
+            self.socketio.emit('changes_batch', {'changes': entries}, to=room)
+        run_id = run_id_from_room(room)
+        if self.compact_encoder is not None and run_id is not None:
+            frame = self.compact_encoder(run_id, entries)
+            if frame is not None:
+                self.socketio.emit('changes_compact', frame, to=compact_room(run_id))
@@ -0,0 +1,66 @@
+# cluster.py
+"""Startet mehrere Worker-Prozesse der App, verbunden über eine gemeinsame Message-Queue.
+
+Jeder Worker ist ein eigener Prozess mit eigenem gevent-Hub; JSON-Serialisierung und Snapshots verteilen
+sich so auf mehrere CPU-Kerne. Socket-Events, Change-Logs und Config-Reloads laufen über den Bus
+(SOULLINK_MESSAGE_QUEUE), die Sequenznummern vergibt die gemeinsame Datenbank.
+
+Aufruf aus dem Projektverzeichnis:
+    python cluster.py [--workers 4] [--port 5001] [--message-queue sqlite:///soullink_bus.db]
+
+Worker i lauscht auf port + i. Davor gehört ein Load-Balancer mit Sticky Sessions (z.B. nginx ip_hash),
+weil Socket.IO beim Long-Polling alle Anfragen eines Clients am selben Worker erwartet.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+
+def serve(host, port):
+    from app import app, socketio  # Import erst hier: app.py liest SOULLINK_MESSAGE_QUEUE beim Laden
+    print(f"Worker {os.getpid()} lauscht auf {host}:{port}")
+    socketio.run(app, host=host, port=port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001, help='Port des ersten Workers')
+    parser.add_argument('--message-queue', default=os.environ.get('SOULLINK_MESSAGE_QUEUE', 'sqlite:///soullink_bus.db'),
+                        help='memory:// funktioniert nur innerhalb eines Prozesses und ist hier nicht sinnvoll')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)  # Intern: diesen Prozess als Worker starten
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.host, args.serve)
+        return
+
+    env = dict(os.environ, SOULLINK_MESSAGE_QUEUE=args.message_queue)
+    # Migrationen, Journal- und Level-Cap-Abgleich einmal vorab, sonst liefen sie in allen Workern gleichzeitig
+    subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db_setup.py')],
+                   check=True)
+    workers = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--host', args.host, '--serve', str(args.port + i)],
+                         env=env)
+        for i in range(args.workers)
+    ]
+    # Auch bei SIGTERM (nicht nur Strg+C) die Worker mit beenden
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"{len(workers)} Worker gestartet (Ports {args.port}-{args.port + len(workers) - 1}, Bus {args.message_queue})")
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+# config_manager.py
+import difflib
+import json
+import os
+import stat
+import tempfile
+
+import gevent
+from gevent.lock import RLock
+
+CONFIG_FILES = ('routes.json', 'pokemon_names.json', 'level_caps.json')
+LEVEL_CAP_FIELDS = ('name', 'order_number', 'max_level', 'adjusted_level')
+
+
+class ConfigError(ValueError):
+    """Inhalt einer Konfigurationsdatei hat nicht das erwartete Format."""
+
+
+# --- Validierung ---
+def _validate_names(filename, data):
+    """routes.json und pokemon_names.json: Liste von {"name": ...}; gibt die Namen zurück."""
+    if not isinstance(data, list):
+        raise ConfigError(f"{filename} muss eine Liste enthalten.")
+    names = []
+    for position, item in enumerate(data, start=1):
+        name = item.get('name') if isinstance(item, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            raise ConfigError(f"Eintrag {position} in {filename} hat keinen gültigen Namen.")
+        names.append(name)
+    return names
+
+
+def _validate_level_caps(filename, data):
+    """level_caps.json: Liste von Level-Caps mit eindeutiger order_number; gibt sie nach order_number sortiert zurück."""
+    if not isinstance(data, list):
+        raise ConfigError(f"{filename} muss eine Liste enthalten.")
+    level_caps = {}
+    for position, item in enumerate(data, start=1):
+        if not isinstance(item, dict) or not isinstance(item.get('name'), str) or not all(
+                isinstance(item.get(field), int) and not isinstance(item.get(field), bool)
+                for field in ('order_number', 'max_level', 'adjusted_level')):
+            raise ConfigError(f"Eintrag {position} in {filename} braucht name, order_number, max_level und "
+                              f"adjusted_level.")
+        if item['order_number'] in level_caps:
+            raise ConfigError(f"order_number {item['order_number']} kommt in {filename} mehrfach vor.")
+        level_caps[item['order_number']] = {field: item[field] for field in LEVEL_CAP_FIELDS}
+    return [level_caps[number] for number in sorted(level_caps)]
+
+
+_VALIDATORS = {
+    'routes.json': _validate_names,
+    'pokemon_names.json': _validate_names,
+    'level_caps.json': _validate_level_caps,
+}
+
+
+# --- Diffs ---
+def diff_list(old, new):
+    """Minimale Änderungen zwischen zwei Listen als [[von, bis, [neue Einträge]], ...] (Indizes in `old`).
+
+    Rückwärts angewendet (apply_list_diff) ergibt sich aus `old` wieder genau `new`.
+    """
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    return [[i1, i2, new[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def apply_list_diff(items, diff):
+    """Wendet ein Diff aus diff_list auf `items` an (ändert die Liste)."""
+    for start, end, replacement in reversed(diff):
+        items[start:end] = replacement
+    return items
+
+
+def diff_level_caps(old, new):
+    """Unterschied zweier Level-Cap-Listen als {'upsert': [...], 'removed': [order_number, ...]}; leer = gleich."""
+    old_by_number = {lc['order_number']: lc for lc in old}
+    new_by_number = {lc['order_number']: lc for lc in new}
+    diff = {}
+    upsert = [lc for number, lc in sorted(new_by_number.items()) if old_by_number.get(number) != lc]
+    removed = sorted(number for number in old_by_number if number not in new_by_number)
+    if upsert:
+        diff['upsert'] = upsert
+    if removed:
+        diff['removed'] = removed
+    return diff
+
+
+def apply_level_cap_diff(level_caps, diff):
+    """Wendet ein Diff aus diff_level_caps an; gibt eine neue, nach order_number sortierte Liste zurück."""
+    by_number = {lc['order_number']: lc for lc in level_caps}
+    for number in diff.get('removed', ()):
+        by_number.pop(number, None)
+    for lc in diff.get('upsert', ()):
+        by_number[lc['order_number']] = dict(lc)
+    return [by_number[number] for number in sorted(by_number)]
+
+
+class ConfigManager:
+    """Hält die drei Konfigurationsdateien validiert im Speicher und gleicht sie mit der Platte ab.
+
+    check() vergleicht mtime und Größe jeder Datei und liest nur geänderte Dateien neu. Ist der neue
+    Inhalt gültig und anders als der alte, wird on_change(filename, new, diff) aufgerufen; ungültige
+    Dateien werden gemeldet, der alte Stand bleibt dann aktiv. save() schreibt atomar über eine
+    temporäre Datei und os.replace, ein gleichzeitiger Leser sieht also nie eine halbe Datei.
+    """
+
+    def __init__(self, base_dir, on_change=None):
+        self.base_dir = base_dir
+        self.on_change = on_change
+        self.data = {filename: [] for filename in CONFIG_FILES}  # filename -> validierter Inhalt
+        self._stats = {}  # filename -> (mtime_ns, size, inode) beim letzten Einlesen
+        self._lock = RLock()
+        self._watcher = None
+
+    def path(self, filename):
+        return os.path.join(self.base_dir, filename)
+
+    def _stat(self, filename):
+        try:
+            file_stat = os.stat(self.path(filename))
+        except FileNotFoundError:
+            return None
+        # Mit Inode: save() ersetzt die Datei per os.replace, das fällt auch bei grober mtime-Auflösung auf
+        return file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino
+
+    def _read(self, filename):
+        with open(self.path(filename), 'r', encoding='utf-8') as f:
+            return _VALIDATORS[filename](filename, json.load(f))
+
+    def load_all(self):
+        """Erstes Einlesen beim Start; fehlende oder ungültige Dateien ergeben leere Listen."""
+        with self._lock:
+            for filename in CONFIG_FILES:
+                self._stats[filename] = self._stat(filename)
+                try:
+                    self.data[filename] = self._read(filename)
+                except FileNotFoundError:
+                    print(f"Warning: {filename} not found at {self.path(filename)}. Returning empty list.")
+                    self.data[filename] = []
+                except (json.JSONDecodeError, ConfigError) as e:
+                    print(f"Error: {filename} at {self.path(filename)} is invalid ({e}). Returning empty list.")
+                    self.data[filename] = []
+
+    def check(self, force=False):
+        """Liest geänderte Dateien neu ein und meldet Unterschiede. Gibt {filename: diff} zurück."""
+        changes = {}
+        with self._lock:
+            for filename in CONFIG_FILES:
+                file_stat = self._stat(filename)
+                if not force and file_stat == self._stats.get(filename):
+                    continue
+                self._stats[filename] = file_stat
+                if file_stat is None:
+                    continue  # Gelöschte Datei: letzter Stand bleibt aktiv
+                try:
+                    new = self._read(filename)
+                except (OSError, json.JSONDecodeError, ConfigError) as e:
+                    print(f"Konfigurationsdatei {filename} ist ungültig, der bisherige Stand bleibt aktiv: {e}")
+                    continue
+                old = self.data[filename]
+                diff = diff_level_caps(old, new) if filename == 'level_caps.json' else diff_list(old, new)
+                if not diff:
+                    continue
+                self.data[filename] = new
+                changes[filename] = diff
+                if self.on_change is not None:
+                    self.on_change(filename, new, diff)
+        return changes
+
+    def save(self, filename, content):
+        """Prüft und schreibt eine Datei atomar und übernimmt die Änderungen. Gibt das Diff zurück (None = gleich).
+
+        Wirft json.JSONDecodeError oder ConfigError, ohne die Datei anzufassen.
+        """
+        _VALIDATORS[filename](filename, json.loads(content))
+        with self._lock:
+            try:
+                mode = stat.S_IMODE(os.stat(self.path(filename)).st_mode)
+            except FileNotFoundError:
+                mode = 0o644
+            fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, prefix=f'.{filename}.', suffix='.tmp')
+            try:
+                os.chmod(tmp_path, mode)  # mkstemp legt mit 0600 an; os.replace würde das übernehmen
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path(filename))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return self.check().get(filename)
+
+    def watch(self, interval):
+        """Prüft die Dateien im Hintergrund alle `interval` Sekunden (Änderungen von Hand oder von anderen Workern)."""
+        def run():
+            while True:
+                gevent.sleep(interval)
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"Fehler beim Prüfen der Konfigurationsdateien: {e}")
+
+        if self._watcher is None or self._watcher.dead:
+            self._watcher = gevent.spawn(run)
@@ -0,0 +1,66 @@
+# db_session.py
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+from metrics import DB_SESSIONS
+
+
+class RequestSessions:
+    """Datenbank-Sessions mit dem Lebenszyklus eines Requests.
+
+    write() liefert die schreibende Session des laufenden Requests, read() eine lesende ohne Transaktion
+    (eigener Pool, siehe models.read_engine). Beide werden erst beim ersten Zugriff geöffnet und im
+    Teardown geschlossen, auch wenn der Handler mit einer Exception abbricht; offene Transaktionen
+    werden dabei zurückgerollt. Committen muss der Handler selbst.
+
+    Hintergrund-Greenlets (Schreib-Warteschlange, Jobs, Watcher) haben keinen Request und öffnen ihre
+    Sessions weiter selbst.
+    """
+
+    def __init__(self, write_factory, read_factory, app=None):
+        self.write_factory = write_factory
+        self.read_factory = read_factory
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.teardown_appcontext(self.teardown)
+
+    def _get(self, kind, factory):
+        sessions = g.setdefault('db_sessions', {})
+        session = sessions.get(kind)
+        if session is None:
+            session = sessions[kind] = factory()
+            DB_SESSIONS.inc(kind=kind)
+        return session
+
+    def write(self):
+        if not has_request_context():
+            raise RuntimeError("Request-Session außerhalb eines Requests; dort eine eigene Session öffnen.")
+        return self._get('write', self.write_factory)
+
+    def read(self):
+        if not has_request_context():
+            raise RuntimeError("Request-Session außerhalb eines Requests; dort eine eigene Session öffnen.")
+        return self._get('read', self.read_factory)
+
+    @contextmanager
+    def read_scope(self):
+        """Lesende Session für Code mit und ohne Request: im Request die des Requests, sonst eine eigene."""
+        if has_request_context():
+            yield self.read()
+            return
+        session = self.read_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def teardown(self, exception=None):
+        for kind, session in g.pop('db_sessions', {}).items():
+            try:
+                if exception is not None and kind == 'write':
+                    session.rollback()
+            finally:
+                session.close()  # Gibt die Verbindung an den Pool zurück; close() rollt Offenes ebenfalls zurück
@@ -0,0 +1,108 @@
+# db_setup.py
+"""Vorbereitung der Datenbank beim Start: Schema und Seed, Journal-Abgleich, Level-Caps aus level_caps.json.
+
+Im Ein-Prozess-Betrieb ruft app.py prepare_database() beim Laden auf. Im Mehr-Worker-Betrieb läuft es
+einmal im Launcher (cluster.py), bevor die Worker starten; die Worker laden danach nur noch den Zustand.
+Sonst würden N Worker gleichzeitig dieselben Ausgangs-Snapshots und level_caps_updated-Events schreiben.
+
+Aufruf aus dem Projektverzeichnis:
+    python db_setup.py
+"""
+import os
+
+from sqlalchemy import select
+
+from models import init_db, SessionLocal, Run, LevelCap
+from config_manager import ConfigManager, LEVEL_CAP_FIELDS, diff_level_caps
+from journal import record_event, recover_run, runs_to_recover
+
+
+def recover_journals(session, level_caps=None, run_ids=None):
+    """Gleicht das Journal der Runs (Standard: alle) mit den Tabellen ab, je jüngster Snapshot plus Rest-Events.
+
+    Committet nicht.
+    """
+    if run_ids is None:
+        run_ids = session.scalars(select(Run.id)).all()
+    for run_id in run_ids:
+        print(f"Journal: {recover_run(session, run_id, level_caps)}")
+
+
+def sync_level_caps(session, level_caps):
+    """Gleicht die LevelCap-Zeilen aller Runs mit level_caps.json ab und schreibt nur geänderte Zeilen.
+
+    Pro Run mit Änderungen entsteht ein 'level_caps_updated'-Event mit dem Diff ({'upsert', 'removed'}).
+    Committet nicht; gibt [(run_id, diff)] zurück.
+    """
+    changes = []
+    # Eine Abfrage nur mit den Spalten für die Level-Caps aller Runs; ORM-Objekte nur für Runs mit Änderungen
+    current_by_run = {}
+    columns = [getattr(LevelCap, field) for field in LEVEL_CAP_FIELDS]
+    for row in session.execute(select(LevelCap.run_id, *columns)).mappings():
+        current_by_run.setdefault(row['run_id'], []).append({field: row[field] for field in LEVEL_CAP_FIELDS})
+    for run_id in session.scalars(select(Run.id)).all():
+        diff = diff_level_caps(current_by_run.get(run_id, []), level_caps)
+        if not diff:
+            continue
+        rows = {lc.order_number: lc for lc in session.query(LevelCap).filter_by(run_id=run_id)}
+        for number in diff.get('removed', ()):
+            session.delete(rows[number])
+        for item in diff.get('upsert', ()):
+            row = rows.get(item['order_number'])
+            if row is None:
+                session.add(LevelCap(run_id=run_id, **item))
+            else:
+                for field, value in item.items():
+                    setattr(row, field, value)
+        record_event(session, run_id, 'level_caps_updated', diff)
+        changes.append((run_id, diff))
+    return changes
+
+
+def prepare_database(level_caps, on_phase=None):
+    """Schema und Seed (init_db), danach Journal-Abgleich und Level-Cap-Abgleich, je in einer Transaktion.
+
+    on_phase(name) wird nach jeder Phase aufgerufen (für die Startzeiten).
+    """
+    on_phase = on_phase or (lambda phase: None)
+    seeded = init_db(level_caps)
+    on_phase('Datenbank-Init')
+
+    session = SessionLocal()
+    try:
+        # Sind Schema und Seed unverändert, genügen die Runs mit Events nach ihrem jüngsten Snapshot
+        run_ids = None if seeded else runs_to_recover(session)
+        recover_journals(session, level_caps, run_ids)
+        if run_ids is not None:
+            print(f"Journal: {len(run_ids)} Run(s) mit Events nach dem letzten Snapshot abgeglichen, übrige aktuell.")
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        print(f"Fehler beim Abgleich des Journals: {e}")
+    finally:
+        session.close()
+    on_phase('Journal-Abgleich')
+
+    # level_caps.json kann sich geändert haben, während der Server aus war
+    session = SessionLocal()
+    try:
+        changes = sync_level_caps(session, level_caps)
+        session.commit()
+        if changes:
+            print(f"Level-Caps aus level_caps.json in {len(changes)} Run(s) übernommen.")
+    except Exception as e:
+        session.rollback()
+        print(f"Fehler beim Abgleich der Level-Caps mit level_caps.json: {e}")
+    finally:
+        session.close()
+    on_phase('Level-Cap-Abgleich')
+
+
+def main():
+    config_files = ConfigManager(os.path.dirname(os.path.abspath(__file__)))
+    config_files.load_all()
+    prepare_database(config_files.data['level_caps.json'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# jobs.py
+import time
+import uuid
+
+import gevent
+from sqlalchemy import delete, select, func
+
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+DELETE_CHUNK_SIZE = 500  # Zeilen pro Lösch-Transaktion; kurze Transaktionen halten die Schreibsperre nur kurz
+PROGRESS_INTERVAL = 0.1  # Sekunden zwischen zwei Fortschrittsmeldungen
+FINISHED_JOB_TTL = 3600  # So lange bleibt der Status beendeter Jobs abrufbar
+
+
+class Job:
+    """Ein Hintergrundjob für einen Run (z.B. vollständiger Reset) mit Status und Fortschritt (0.0 bis 1.0)."""
+
+    def __init__(self, kind, run_id, on_progress):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.run_id = run_id
+        self.status = JOB_RUNNING
+        self.progress = 0.0
+        self.message = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._on_progress = on_progress
+        self._last_report = 0.0
+
+    def report(self, progress, message=None, force=False):
+        """Setzt den Fortschritt; gemeldet wird höchstens alle PROGRESS_INTERVAL Sekunden (außer mit force)."""
+        self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if force or now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self._on_progress(self)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'run_id': self.run_id,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'message': self.message,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """Startet Jobs als Greenlets und merkt sich ihren Status; pro Run läuft höchstens ein Job.
+
+    on_progress(job) wird bei jeder Fortschrittsmeldung sowie beim Start und Ende aufgerufen.
+    Jobs leben nur im Speicher dieses Prozesses.
+    """
+
+    def __init__(self, on_progress):
+        self.on_progress = on_progress
+        self._jobs = {}  # job_id -> Job
+
+    def start(self, kind, run_id, work):
+        """Startet work(job) im Hintergrund. Gibt None zurück, wenn für den Run schon ein Job läuft."""
+        if self.active_job(run_id) is not None:
+            return None
+        self._prune()
+        job = Job(kind, run_id, self.on_progress)
+        self._jobs[job.id] = job
+        job.report(0.0, force=True)
+        gevent.spawn(self._run, job, work)
+        return job
+
+    def _run(self, job, work):
+        try:
+            work(job)
+            job.status = JOB_DONE
+            job.progress = 1.0
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            print(f"Fehler im Hintergrundjob {job.kind} für Run {job.run_id}: {e}")
+        finally:
+            job.finished_at = time.time()
+            job.report(job.progress, force=True)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def active_job(self, run_id):
+        for job in self._jobs.values():
+            if job.run_id == run_id and job.status == JOB_RUNNING:
+                return job
+        return None
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_JOB_TTL
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+def count_rows(session, model, condition):
+    return session.scalar(select(func.count()).select_from(model).where(condition))
+
+
+def chunked_delete(session_factory, model, condition, chunk_size=DELETE_CHUNK_SIZE):
+    """Löscht alle Zeilen von `model`, auf die `condition` passt, in Transaktionen zu je `chunk_size` Zeilen.
+
+    Set-basiert per DELETE ... WHERE id IN (SELECT ... LIMIT n), ohne Zeilen in die Session zu laden.
+    Zwischen den Transaktionen kommen andere Greenlets zum Zug. Liefert die Zahl der gelöschten Zeilen
+    pro Transaktion.
+    """
+    while True:
+        session = session_factory()
+        try:
+            chunk = select(model.id).where(condition).limit(chunk_size)
+            deleted = session.execute(delete(model).where(model.id.in_(chunk))).rowcount
+            session.commit()
+        finally:
+            session.close()
+        if not deleted:
+            return
+        yield deleted
+        gevent.sleep(0)
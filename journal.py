@@ -0,0 +1,227 @@
+# journal.py
+import json
+import time
+
+import gevent
+from sqlalchemy import select, func, delete, update, event, or_
+from sqlalchemy.orm import Session
+
+from models import SessionLocal, Run, JournalEvent, JournalSnapshot, PokemonCatch, Route, read_run_data, reset_run
+from state_store import RunStore, MARKER_EVENTS
+
+SNAPSHOT_INTERVAL = 200  # Nach so vielen Events eines Runs wird ein neuer Snapshot geschrieben
+UNDO_SCAN_LIMIT = 1000  # So weit wird beim Rückgängigmachen höchstens zurückgeschaut
+
+# Events aus Konfigurationsdateien; sie werden nachgespielt, aber nicht rückgängig gemacht
+CONFIG_EVENTS = ('level_caps_updated',)
+# Resets, die stückweise in mehreren Transaktionen löschen; davor steht ein 'reset_started' im Journal
+RESET_EVENTS = ('all_data_reset', 'full_db_reset')
+
+_events_since_snapshot = {}  # run_id -> Events seit dem letzten Snapshot (pro Prozess)
+_compacting = set()
+# Runs mit begonnenem, noch nicht abgeschlossenem Reset. So lange kein Snapshot, sonst stünde die offene
+# Markierung schon in einem Snapshot und runs_to_recover würde den Run beim nächsten Start überspringen.
+_open_resets = set()
+
+
+# --- Schreiben ---
+def record_event(session, run_id, event, data=None, undo_of=None):
+    """Hängt eine Änderung an das Journal an. Gehört in dieselbe Transaktion wie die Änderung selbst; committet nicht."""
+    session.add(JournalEvent(run_id=run_id, event=event, data=json.dumps(data or {}), undo_of=undo_of,
+                             created_at=time.time()))
+    # Gezählt wird erst nach dem Commit (_count_committed_events); zurückgerollte Events zählen nicht
+    pending = session.info.setdefault('journal_pending', {})
+    pending[run_id] = pending.get(run_id, 0) + 1
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_committed_events(session):
+    _open_resets.difference_update(session.info.pop('journal_closed_resets', ()))
+    for run_id, added in session.info.pop('journal_pending', {}).items():
+        count = _events_since_snapshot.get(run_id, 0) + added
+        _events_since_snapshot[run_id] = count
+        if count >= SNAPSHOT_INTERVAL and run_id not in _compacting and run_id not in _open_resets:
+            _compacting.add(run_id)
+            gevent.spawn(compact, run_id)  # Eigene Session, läuft, sobald der aufrufende Greenlet abgibt
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_uncommitted_events(session, transaction):
+    # Nach einem Commit ist die Liste schon leer; sonst (Rollback, close ohne Commit) verfallen die Events
+    if transaction.parent is None:
+        session.info.pop('journal_pending', None)
+        session.info.pop('journal_closed_resets', None)
+
+
+def begin_reset(session, run_id, kind):
+    """Trägt den Beginn eines Resets (`kind` aus RESET_EVENTS) ein, vor dem ersten Löschschritt. Committet nicht."""
+    _open_resets.add(run_id)
+    record_event(session, run_id, 'reset_started', {'event': kind})
+
+
+def complete_reset(session, run_id, kind, level_caps=None):
+    """Schließt einen Reset (`kind` aus RESET_EVENTS) set-basiert ab und trägt sein Event ein. Committet nicht.
+
+    Vorher schon stückweise gelöschte Zeilen fehlen einfach; der Rest geht in dieser Transaktion.
+    """
+    if kind == 'all_data_reset':
+        session.execute(delete(PokemonCatch).where(PokemonCatch.run_id == run_id))
+        session.execute(update(Route).where(Route.run_id == run_id).values(status=""))
+        record_event(session, run_id, kind)
+    else:
+        # Orden und Level-Caps neu anlegen
+        reset_run(session, run_id, level_caps)
+        session.flush()
+        # Der Zustand danach steht komplett im Journal, der Reset lässt sich per Undo zurücknehmen
+        record_event(session, run_id, kind, {'state': read_run_data(session, run_id)})
+    session.info.setdefault('journal_closed_resets', set()).add(run_id)  # Erst mit dem Commit abgeschlossen
+
+
+def _interrupted_reset(session, run_id):
+    """Art des zuletzt begonnenen, aber nie abgeschlossenen Resets eines Runs, sonst None."""
+    started = session.execute(select(JournalEvent.id, JournalEvent.data)
+                              .where(JournalEvent.run_id == run_id, JournalEvent.event == 'reset_started')
+                              .order_by(JournalEvent.id.desc()).limit(1)).first()
+    if started is None:
+        return None
+    kind = json.loads(started.data).get('event')
+    finished = session.scalar(select(JournalEvent.id).where(JournalEvent.run_id == run_id, JournalEvent.id > started.id,
+                                                           JournalEvent.event == kind).limit(1))
+    return kind if finished is None and kind in RESET_EVENTS else None
+
+
+def write_snapshot(session, run_id, event_id, data):
+    """Speichert den Zustand eines Runs nach Event `event_id` (0 = vor allen Events). Committet nicht."""
+    session.add(JournalSnapshot(run_id=run_id, event_id=event_id, state=json.dumps(data), created_at=time.time()))
+
+
+def compact(run_id):
+    """Schreibt einen Snapshot des aktuellen Journal-Stands, damit spätere Replays nur den Rest nachspielen."""
+    session = SessionLocal()
+    try:
+        replayed = replay_state(session, run_id)
+        if replayed is not None and replayed[2]:
+            data, event_id, _ = replayed
+            write_snapshot(session, run_id, event_id, data)
+            session.commit()
+        _events_since_snapshot[run_id] = 0
+    except Exception as e:
+        session.rollback()
+        print(f"Fehler beim Schreiben des Journal-Snapshots für Run {run_id}: {e}")
+    finally:
+        _compacting.discard(run_id)
+        session.close()
+
+
+# --- Lesen ---
+def _latest_snapshot(session, run_id, upto=None):
+    query = select(JournalSnapshot.event_id, JournalSnapshot.state).where(JournalSnapshot.run_id == run_id)
+    if upto is not None:
+        query = query.where(JournalSnapshot.event_id <= upto)
+    return session.execute(query.order_by(JournalSnapshot.event_id.desc(), JournalSnapshot.id.desc())
+                           .limit(1)).first()
+
+
+def replay_state(session, run_id, upto=None):
+    """Zustand eines Runs nach Event `upto` (ohne Angabe: nach dem letzten Event).
+
+    Lädt den jüngsten Snapshot davor und spielt nur die Events danach nach. Gibt
+    (Zustand im Format von read_run_data(), ID des letzten berücksichtigten Events, Zahl der nachgespielten
+    Events) zurück, oder None, wenn es keinen passenden Snapshot gibt.
+    """
+    snapshot = _latest_snapshot(session, run_id, upto)
+    if snapshot is None:
+        return None
+    state = RunStore.from_data(json.loads(snapshot.state))
+    last_event_id = snapshot.event_id
+    query = (select(JournalEvent.id, JournalEvent.event, JournalEvent.data)
+             .where(JournalEvent.run_id == run_id, JournalEvent.id > snapshot.event_id))
+    if upto is not None:
+        query = query.where(JournalEvent.id <= upto)
+    replayed = 0
+    for event_id, event, data in session.execute(query.order_by(JournalEvent.id)):
+        state.apply(event, json.loads(data))
+        last_event_id = event_id
+        replayed += 1
+    return state.to_data(), last_event_id, replayed
+
+
+def find_undo_target(session, run_id):
+    """Jüngstes Event des Runs, das weder selbst ein Undo ist noch schon rückgängig gemacht wurde.
+
+    Wiederholtes Undo geht so Schritt für Schritt weiter zurück. Änderungen aus level_caps.json werden übersprungen.
+    """
+    undone = set()
+    rows = session.scalars(select(JournalEvent).where(JournalEvent.run_id == run_id)
+                           .order_by(JournalEvent.id.desc()).limit(UNDO_SCAN_LIMIT))
+    for row in rows:
+        if row.undo_of is not None:
+            undone.add(row.undo_of)
+        elif row.id not in undone and row.event not in CONFIG_EVENTS and row.event not in MARKER_EVENTS:
+            return row
+    return None
+
+
+def read_history(session, run_id, before=None, limit=50):
+    """Journal-Einträge eines Runs, neueste zuerst. Vollständige Zustände (Resets, Undo) werden weggelassen."""
+    query = select(JournalEvent).where(JournalEvent.run_id == run_id)
+    if before is not None:
+        query = query.where(JournalEvent.id < before)
+    history = []
+    for row in session.scalars(query.order_by(JournalEvent.id.desc()).limit(limit)):
+        data = json.loads(row.data)
+        data.pop('state', None)
+        history.append({'event_id': row.id, 'event': row.event, 'data': data, 'undo_of': row.undo_of,
+                        'created_at': row.created_at})
+    return history
+
+
+# --- Start ---
+def runs_to_recover(session):
+    """IDs der Runs mit Events nach ihrem jüngsten Snapshot oder ganz ohne Snapshot; zwei Aggregate für alle Runs.
+
+    Alle anderen stehen schon vollständig in ihrem Snapshot, der Abgleich beim Start kann sie überspringen.
+    """
+    last_event = (select(JournalEvent.run_id, func.max(JournalEvent.id).label('event_id'))
+                  .group_by(JournalEvent.run_id).subquery())
+    last_snapshot = (select(JournalSnapshot.run_id, func.max(JournalSnapshot.event_id).label('event_id'))
+                     .group_by(JournalSnapshot.run_id).subquery())
+    query = (select(Run.id)
+             .outerjoin(last_event, last_event.c.run_id == Run.id)
+             .outerjoin(last_snapshot, last_snapshot.c.run_id == Run.id)
+             .where(or_(last_snapshot.c.event_id.is_(None),
+                        func.coalesce(last_event.c.event_id, 0) > last_snapshot.c.event_id))
+             .order_by(Run.id))
+    return session.scalars(query).all()
+
+
+def recover_run(session, run_id, level_caps=None):
+    """Bringt Journal und Tabellen eines Runs beim Start in Einklang. Committet nicht.
+
+    Ein abgebrochener Reset (begonnen, aber ohne abschließendes Event) wird zuerst zu Ende geführt.
+    Gelesen werden dann nur der jüngste Snapshot und die Events danach. Weicht das Ergebnis von den Tabellen ab
+    (Datenbank ohne Journal, Änderungen an der API vorbei) oder gibt es noch keinen Snapshot, wird der
+    Tabellenstand als neuer Ausgangspunkt gespeichert, sonst der nachgespielte Stand als neuer Snapshot.
+    Gibt eine Zeile für den Start-Bericht zurück.
+    """
+    start = time.perf_counter()
+    interrupted = _interrupted_reset(session, run_id)
+    if interrupted is not None:
+        print(f"Journal: Run {run_id}: abgebrochenen Reset '{interrupted}' abschließen")
+        complete_reset(session, run_id, interrupted, level_caps)
+        session.flush()
+    live = read_run_data(session, run_id)
+    replayed = replay_state(session, run_id)
+    last_event_id = session.scalar(select(func.max(JournalEvent.id)).where(JournalEvent.run_id == run_id)) or 0
+    if replayed is None or RunStore.from_data(replayed[0]) != RunStore.from_data(live):
+        write_snapshot(session, run_id, last_event_id, live)
+        _events_since_snapshot[run_id] = 0
+        reason = "kein Snapshot" if replayed is None else "Abweichung von den Tabellen"
+        return f"Run {run_id}: neuer Ausgangs-Snapshot bei Event {last_event_id} ({reason})"
+    _, event_id, count = replayed
+    if count:
+        # Geprüften Stand festhalten; der nächste Start überspringt den Run dann, solange nichts dazukommt
+        write_snapshot(session, run_id, event_id, live)
+    _events_since_snapshot[run_id] = 0
+    return (f"Run {run_id}: {count} Events seit dem letzten Snapshot nachgespielt, konsistent "
+            f"({(time.perf_counter() - start) * 1000:.1f} ms)")
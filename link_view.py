@@ -0,0 +1,192 @@
+# link_view.py
+from config_manager import apply_level_cap_diff
+
+# Zustand eines Links (alle Fänge einer Route über alle Spieler)
+LINK_ALIVE = 'alive'  # Alle Spieler haben gefangen, das Team ist nutzbar
+LINK_OPEN = 'open'  # Noch nicht alle Spieler haben auf der Route gefangen
+LINK_DEAD = 'dead'  # "Death Link" oder "Death (Spieler)"
+LINK_FAILED = 'failed'  # "No Catch"
+LINK_STATES = (LINK_ALIVE, LINK_OPEN, LINK_DEAD, LINK_FAILED)
+
+
+def link_state(status, catch_count, player_count):
+    """Leitet den Zustand eines Links aus dem Routenstatus und der Zahl der Fänge ab."""
+    status = status or ""
+    if status == "Death Link" or status.startswith("Death ("):
+        return LINK_DEAD
+    if status == "No Catch":
+        return LINK_FAILED
+    if player_count and catch_count >= player_count:
+        return LINK_ALIVE
+    return LINK_OPEN
+
+
+class LinkView:
+    """Materialisierte Soul-Link-Sicht eines Runs: Links pro Route, Zähler, nutzbare Teams, aktives Level-Cap.
+
+    Die Sicht wird einmal aus der Datenbank gebaut und danach nur noch über apply(event, data) mit den
+    Änderungen aus dem Change-Log fortgeschrieben. Jede Änderung berührt höchstens eine Route (bzw. das
+    Level-Cap); nur Strukturänderungen (neue Spieler, Reset) rechnen alle Routen neu. apply() gibt die
+    abgeleiteten Events zurück, die an die Clients gehen.
+    """
+
+    def __init__(self, players, routes, catches, global_orders, level_caps):
+        self.players = {p['id']: p['name'] for p in sorted(players, key=lambda p: p['id'])}
+        # route_id -> {'name', 'status', 'catches': {player_id: pokemon_name}, 'state'}
+        self.routes = {}
+        self.counts = dict.fromkeys(LINK_STATES, 0)
+        self.rosters = {player_id: {} for player_id in self.players}  # player_id -> {route_id: pokemon_name}
+        for route in sorted(routes, key=lambda r: r['id']):
+            self.routes[route['id']] = {'name': route['name'], 'status': route['status'] or "", 'catches': {},
+                                        'state': None}
+        for catch in catches:
+            route = self.routes.get(catch['route_id'])
+            if route is not None and catch['player_id'] in self.players:
+                route['catches'][catch['player_id']] = catch['pokemon_name']
+        for route_id in self.routes:
+            self._refresh_route(route_id)
+
+        self.orders = {o['order_number']: bool(o['is_obtained']) for o in global_orders}
+        self.level_caps = sorted(level_caps, key=lambda lc: lc['order_number'])
+        self.level_cap = self._current_level_cap()
+
+    # --- Ableitungen ---
+    def _refresh_route(self, route_id):
+        """Berechnet Zustand, Zähler und Teams einer Route neu. Gibt True zurück, wenn sich etwas geändert hat."""
+        route = self.routes[route_id]
+        old_state = route['state']
+        new_state = link_state(route['status'], len(route['catches']), len(self.players))
+        if old_state is not None:
+            self.counts[old_state] -= 1
+        self.counts[new_state] += 1
+        route['state'] = new_state
+
+        for player_id, roster in self.rosters.items():
+            if new_state == LINK_ALIVE:
+                roster[route_id] = route['catches'][player_id]
+            else:
+                roster.pop(route_id, None)
+        return old_state != new_state
+
+    def _refresh_all(self):
+        for route_id in self.routes:
+            self._refresh_route(route_id)
+
+    def _current_level_cap(self):
+        """Erstes Level-Cap, dessen Orden noch fehlt; sind alle erreicht, das letzte."""
+        for level_cap in self.level_caps:
+            if not self.orders.get(level_cap['order_number']):
+                return level_cap
+        return self.level_caps[-1] if self.level_caps else None
+
+    # --- Ausgabe ---
+    def link_payload(self, route_id):
+        route = self.routes[route_id]
+        return {
+            'route_id': route_id,
+            'name': route['name'],
+            'state': route['state'],
+            # Pokémon in der Reihenfolge von 'players' im Snapshot der Sicht, None = noch nicht gefangen
+            'pokemon': [route['catches'].get(player_id) for player_id in self.players],
+            'counts': dict(self.counts),
+        }
+
+    def to_payload(self):
+        """Kompakte Darstellung für /api/links: Links als Zeilen [route_id, name, state, [pokemon...]]."""
+        return {
+            'players': [[player_id, name] for player_id, name in self.players.items()],
+            'links': [
+                [route_id, route['name'], route['state'],
+                 [route['catches'].get(player_id) for player_id in self.players]]
+                for route_id, route in self.routes.items()
+            ],
+            'counts': dict(self.counts),
+            'rosters': {
+                player_id: [[route_id, roster[route_id]] for route_id in self.routes if route_id in roster]
+                for player_id, roster in self.rosters.items()
+            },
+            'level_cap': self.level_cap,
+        }
+
+    # --- Inkrementelle Pflege ---
+    def apply(self, event, data):
+        """Schreibt eine Änderung aus dem Change-Log ein und gibt die abgeleiteten (event, data)-Paare zurück."""
+        data = data or {}
+        if event == 'catch_updated':
+            route = self.routes.get(data['route_id'])
+            if route is None or data['player_id'] not in self.players:
+                return []
+            if data['pokemon_name']:
+                route['catches'][data['player_id']] = data['pokemon_name']
+            else:
+                route['catches'].pop(data['player_id'], None)
+            self._refresh_route(data['route_id'])
+            return [('link_updated', self.link_payload(data['route_id']))]
+
+        if event == 'route_status_updated':
+            route = self.routes.get(data['route_id'])
+            if route is None:
+                return []
+            route['status'] = data['status_text'] or ""
+            if not self._refresh_route(data['route_id']):
+                return []
+            return [('link_updated', self.link_payload(data['route_id']))]
+
+        if event == 'global_order_toggled':
+            self.orders[data['order_number']] = bool(data['is_obtained'])
+            level_cap = self._current_level_cap()
+            if level_cap == self.level_cap:
+                return []
+            self.level_cap = level_cap
+            return [('level_cap_changed', {'level_cap': level_cap})]
+
+        if event == 'level_caps_updated':
+            self.level_caps = apply_level_cap_diff(self.level_caps, data)
+            level_cap = self._current_level_cap()
+            if level_cap == self.level_cap:
+                return []
+            self.level_cap = level_cap
+            return [('level_cap_changed', {'level_cap': level_cap})]
+
+        if event in ('route_added', 'routes_added'):
+            added = data['routes'] if event == 'routes_added' else [data]
+            new_ids = []
+            for route in added:
+                if route['id'] not in self.routes:
+                    self.routes[route['id']] = {'name': route['name'], 'status': route.get('status') or "",
+                                                'catches': {}, 'state': None}
+                    self._refresh_route(route['id'])
+                    new_ids.append(route['id'])
+            if len(new_ids) == 1:
+                return [('link_updated', self.link_payload(new_ids[0]))]
+            return [('link_view_reset', {})] if new_ids else []
+
+        if event == 'route_deleted':
+            route = self.routes.pop(data['route_id'], None)
+            if route is None:
+                return []
+            self.counts[route['state']] -= 1
+            for roster in self.rosters.values():
+                roster.pop(data['route_id'], None)
+            return [('link_removed', {'route_id': data['route_id'], 'counts': dict(self.counts)})]
+
+        if event in ('player_added', 'players_added'):
+            added = data['players'] if event == 'players_added' else [data]
+            new_players = [p for p in added if p['id'] not in self.players]
+            if not new_players:
+                return []
+            for player in new_players:
+                self.players[player['id']] = player['name']
+                self.rosters[player['id']] = {}
+            # Ein neuer Spieler hat noch nichts gefangen: Alle lebenden Links werden wieder offen
+            self._refresh_all()
+            return [('link_view_reset', {})]
+
+        if event == 'all_data_reset':
+            for route in self.routes.values():
+                route['catches'].clear()
+                route['status'] = ""
+            self._refresh_all()
+            return [('link_view_reset', {})]
+
+        return []
@@ -0,0 +1,246 @@
+# metrics.py
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Basis für Counter und Gauge.
+
+    Mit `callback` wird der Wert erst beim Abruf von /metrics gelesen (z.B. Länge einer Warteschlange);
+    callback() liefert einen Wert oder bei Labels ein Dict {Tupel der Label-Werte: Wert}.
+    """
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}  # Tupel der Label-Werte -> Wert
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self):
+        if self.callback is not None:
+            value = self.callback()
+            with self._lock:
+                self._values = value if isinstance(value, dict) else {(): value}
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for labelvalues, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Sammelt Metriken und gibt sie im Prometheus-Textformat (Version 0.0.4) aus."""
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter('soullink_http_requests_total', 'HTTP-Anfragen nach Endpunkt und Status.',
+                                 ('endpoint', 'method', 'status'))
+HTTP_DURATION = REGISTRY.histogram('soullink_http_request_duration_seconds', 'Bearbeitungszeit der HTTP-Anfragen.',
+                                   ('endpoint',))
+SQL_QUERIES = REGISTRY.counter('soullink_sql_queries_total', 'SQL-Statements nach auslösendem Endpunkt.',
+                               ('endpoint',))
+SQL_DURATION = REGISTRY.histogram('soullink_sql_query_duration_seconds', 'Laufzeit der SQL-Statements.',
+                                  ('endpoint',))
+DB_POOL_CHECKOUTS = REGISTRY.counter('soullink_db_pool_checkouts_total',
+                                     'Verbindungen, die aus dem Pool ausgegeben wurden.', ('pool',))
+DB_POOL_CONNECTS = REGISTRY.counter('soullink_db_pool_connects_total',
+                                    'Neu aufgebaute Verbindungen; alle anderen Ausgaben sind Wiederverwendung.',
+                                    ('pool',))
+DB_SESSIONS = REGISTRY.counter('soullink_db_sessions_total', 'Geöffnete Request-Sessions nach Art.', ('kind',))
+
+_pools = {}  # Name -> Pool der instrumentierten Engines
+
+
+def _pool_connections():
+    values = {}
+    for name, pool in list(_pools.items()):
+        values[(name, 'checked_out')] = pool.checkedout()
+        values[(name, 'idle')] = pool.checkedin()
+        values[(name, 'overflow')] = max(pool.overflow(), 0)
+    return values
+
+
+REGISTRY.gauge('soullink_db_pool_connections',
+               'Verbindungen pro Pool: ausgegeben, frei im Pool und über pool_size hinaus.', ('pool', 'state'),
+               callback=_pool_connections)
+
+
+def _current_endpoint():
+    # Statements aus Hintergrund-Greenlets (Schreib-Warteschlange, Start) haben keinen Request
+    if has_request_context():
+        return request.endpoint or 'unbekannt'
+    return 'hintergrund'
+
+
+def instrument_engine(engine):
+    """Zählt und misst alle SQL-Statements der Engine, zugeordnet zum Endpunkt des laufenden Requests."""
+
+    # Eine Verbindung führt immer nur ein Statement zugleich aus, ein Wert statt eines Stapels genügt. Schlägt ein
+    # Statement fehl, kommt kein after_cursor_execute; sein Startwert wird vom nächsten Statement überschrieben.
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('query_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        endpoint = _current_endpoint()
+        SQL_QUERIES.inc(endpoint=endpoint)
+        SQL_DURATION.observe(elapsed, endpoint=endpoint)
+        if has_request_context() and 'slow_log_queries' in g:
+            g.slow_log_queries.append((elapsed, statement))
+
+
+def instrument_pool(engine, name):
+    """Zählt Ausgaben und Neuaufbauten von Verbindungen; das Verhältnis zeigt, ob der Pool groß genug ist."""
+    _pools[name] = engine.pool
+
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTS.inc(pool=name)
+
+    @event.listens_for(engine, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc(pool=name)
+
+
+def instrument_app(app, slow_request_ms=None):
+    """Misst jede Anfrage; mit slow_request_ms werden langsame Anfragen samt ihrer Statements geloggt."""
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+        if slow_request_ms is not None:
+            g.slow_log_queries = []
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unbekannt'
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_DURATION.observe(elapsed, endpoint=endpoint)
+
+        if slow_request_ms is not None and elapsed * 1000 >= slow_request_ms:
+            queries = g.pop('slow_log_queries', [])
+            print(f"Langsame Anfrage: {request.method} {request.path} ({endpoint}) {elapsed * 1000:.1f} ms, "
+                  f"{len(queries)} SQL-Statements, {sum(q[0] for q in queries) * 1000:.1f} ms in SQL")
+            for query_elapsed, statement in sorted(queries, reverse=True)[:5]:
+                print(f"    {query_elapsed * 1000:8.2f} ms  {' '.join(statement.split())[:200]}")
+        return response
@@ -1,5 +1,6 @@
 # models.py
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import (create_engine, event, inspect, insert, select, Column, Integer, String, Boolean, Float, Text,
+                        ForeignKey, Index, UniqueConstraint, text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import json
@@ -9,11 +10,27 @@ Base = declarative_base()
 
 # --- Datenbank-Modelle ---
 
+DEFAULT_RUN_ID = 1  # Run für die Routen ohne Run-ID (/api/data, / und /summary)
+DEFAULT_RUN_NAME = "Standard-Run"
+
+class Run(Base):
+    """Repräsentiert einen Challenge-Run; alle übrigen Tabellen sind über run_id einem Run zugeordnet."""
+    __tablename__ = 'runs'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+    # Letzte vergebene Sequenznummer im Mehr-Worker-Betrieb, damit alle Worker dieselben Versionen verwenden
+    state_version = Column(Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f"<Run(id={self.id}, name='{self.name}')>"
+
 class Player(Base):
     """Repräsentiert einen Teilnehmer der Soul Link Challenge."""
     __tablename__ = 'players'
+    __table_args__ = (UniqueConstraint('run_id', 'name', name='uq_players_run_name'),)
     id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False)  # Über uq_players_run_name indiziert
+    name = Column(String, nullable=False)
 
     pokemon_catches = relationship('PokemonCatch', back_populates='player', cascade='all, delete-orphan')
 
@@ -23,8 +40,10 @@ class Player(Base):
 class Route(Base):
     """Repräsentiert eine Route im Spiel."""
     __tablename__ = 'routes'
+    __table_args__ = (UniqueConstraint('run_id', 'name', name='uq_routes_run_name'),)
     id = Column(Integer, primary_key=True)
-    name = Column(String, unique=True, nullable=False)
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False)  # Über uq_routes_run_name indiziert
+    name = Column(String, nullable=False)
     status = Column(String, default="") # Statusfeld für die Route
 
     pokemon_catches = relationship('PokemonCatch', back_populates='route', cascade='all, delete-orphan')
@@ -33,13 +52,22 @@ class Route(Base):
         return f"<Route(id={self.id}, name='{self.name}', status='{self.status}')>"
 
 class PokemonCatch(Base):
-    """Repräsentiert ein gefangenes Pokémon eines Spielers auf einer bestimmten Route."""
+    """Repräsentiert ein gefangenes Pokémon eines Spielers auf einer bestimmten Route.
+
+    Zeilen existieren nur für tatsächliche Fänge: Eine fehlende Zeile bedeutet "noch nichts gefangen".
+    """
     __tablename__ = 'pokemon_catches'
+    __table_args__ = (
+        # Pro Spieler und Route höchstens ein Fang; Grundlage für das Upsert in update_catch
+        Index('uq_pokemon_catches_player_route', 'player_id', 'route_id', unique=True),
+    )
     id = Column(Integer, primary_key=True)
-    pokemon_name = Column(String, nullable=True) # Kann leer sein, wenn noch nichts gefangen wurde
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False, index=True)  # Für Run-Snapshots und Run-Resets
+    pokemon_name = Column(String, nullable=True) # Alt-Datenbanken enthalten hier NULL; werden durch migrate_db() entfernt
 
     player_id = Column(Integer, ForeignKey('players.id'), nullable=False)
-    route_id = Column(Integer, ForeignKey('routes.id'), nullable=False)
+    # player_id wird vom zusammengesetzten Index (player_id, route_id) mit abgedeckt
+    route_id = Column(Integer, ForeignKey('routes.id'), nullable=False, index=True)
 
     player = relationship('Player', back_populates='pokemon_catches')
     route = relationship('Route', back_populates='pokemon_catches')
@@ -50,8 +78,10 @@ class PokemonCatch(Base):
 class GlobalOrder(Base):
     """Repräsentiert den globalen Status eines Ordens (für alle Spieler)."""
     __tablename__ = 'global_orders'
+    __table_args__ = (UniqueConstraint('run_id', 'order_number', name='uq_global_orders_run_order'),)
     id = Column(Integer, primary_key=True)
-    order_number = Column(Integer, unique=True, nullable=False) # 1 bis 8, oder spezielle IDs für Top 4/Champ
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False)
+    order_number = Column(Integer, nullable=False) # 1 bis 8, oder spezielle IDs für Top 4/Champ
     is_obtained = Column(Boolean, default=False) # True, wenn der Orden/Meilenstein erreicht wurde
 
     def __repr__(self):
@@ -60,22 +90,116 @@ class GlobalOrder(Base):
 class LevelCap(Base):
     """Repräsentiert das Level-Cap für einen bestimmten Meilenstein (Orden, Top 4, Champ)."""
     __tablename__ = 'level_caps'
+    __table_args__ = (UniqueConstraint('run_id', 'order_number', name='uq_level_caps_run_order'),)
     id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False)
     name = Column(String, nullable=False) # Z.B. "1. Arena", "Top 4 (1)", "Champ"
-    order_number = Column(Integer, unique=True, nullable=False) # UNIQUE, da dies der Identifikator ist
+    order_number = Column(Integer, nullable=False) # Pro Run eindeutig, da dies der Identifikator ist
     max_level = Column(Integer, nullable=False)
     adjusted_level = Column(Integer, nullable=False) # Max Level - 2
 
     def __repr__(self):
         return f"<LevelCap(id={self.id}, name='{self.name}', order_number={self.order_number}, max_level={self.max_level}, adjusted_level={self.adjusted_level})>"
 
+class JournalEvent(Base):
+    """Eintrag im Append-only-Journal: eine Änderung, die die API an einem Run ausgeführt hat (siehe journal.py).
+
+    Die ID steigt mit der Commit-Reihenfolge, weil SQLite Schreibtransaktionen nacheinander ausführt.
+    """
+    __tablename__ = 'journal_events'
+    __table_args__ = (
+        Index('ix_journal_events_run_id', 'run_id', 'id'),
+        {'sqlite_autoincrement': True},  # IDs gelöschter Runs werden nie wiederverwendet
+    )
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False)
+    event = Column(String, nullable=False)  # Gleicher Name wie das SocketIO-Event, z.B. 'catch_updated'
+    data = Column(Text, nullable=False)  # JSON
+    undo_of = Column(Integer, nullable=True)  # ID des Events, das dieser Eintrag rückgängig macht
+    created_at = Column(Float, nullable=False)  # Unix-Zeit
+
+    def __repr__(self):
+        return f"<JournalEvent(id={self.id}, run_id={self.run_id}, event='{self.event}')>"
+
+class JournalSnapshot(Base):
+    """Kompletter Zustand eines Runs nach allen seinen Journal-Events bis einschließlich event_id."""
+    __tablename__ = 'journal_snapshots'
+    __table_args__ = (Index('ix_journal_snapshots_run_event', 'run_id', 'event_id'),)
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False)
+    event_id = Column(Integer, nullable=False)  # 0 = vor dem ersten Event
+    state = Column(Text, nullable=False)  # JSON im Format von read_run_data()
+    created_at = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<JournalSnapshot(id={self.id}, run_id={self.run_id}, event_id={self.event_id})>"
+
+
+class DbMeta(Base):
+    """Schlüssel-Wert-Paare über die Datenbank selbst, z.B. der Seed-Stempel (siehe init_db)."""
+    __tablename__ = 'db_meta'
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+
+    def __repr__(self):
+        return f"<DbMeta(key='{self.key}', value='{self.value}')>"
+
 
 # --- Datenbank-Initialisierung ---
 
 DATABASE_URL = "sqlite:///soul_link_challenge.db"
 
-engine = create_engine(DATABASE_URL)
+# SQLite-Profil für viele gleichzeitige Greenlets: WAL erlaubt Lesen während geschrieben wird,
+# busy_timeout lässt Schreiber warten statt sofort mit "database is locked" abzubrechen.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # Im WAL-Modus sicher gegen Korruption, nur der letzte Commit kann bei Stromausfall fehlen
+    "busy_timeout": 5000,  # Millisekunden
+    "cache_size": -16000,  # Negativ = KiB, also ca. 16 MB Page-Cache pro Verbindung
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+# Verbindungs-Pool pro Engine. Greenlets halten eine Verbindung nur für die Dauer ihrer Session; reicht der
+# Pool nicht, kommen bis zu DB_MAX_OVERFLOW Verbindungen dazu, danach wartet der Greenlet bis DB_POOL_TIMEOUT.
+DB_POOL_SIZE = int(os.environ.get('SOULLINK_DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('SOULLINK_DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.environ.get('SOULLINK_DB_POOL_TIMEOUT', 10))
+
+
+def create_db_engine(database_url=DATABASE_URL, pragmas=SQLITE_PRAGMAS, read_only=False):
+    """Erzeugt die Engine und setzt die SQLite-Pragmas auf jeder neuen Verbindung.
+
+    Mit read_only arbeitet die Engine ohne Transaktionen (jedes SELECT für sich, kein BEGIN) und SQLite
+    lehnt über query_only jeden Schreibversuch ab.
+    """
+    connect_args = {}
+    if pragmas and "busy_timeout" in pragmas:
+        connect_args["timeout"] = pragmas["busy_timeout"] / 1000  # Gleiches Timeout auch im sqlite3-Treiber
+    options = {}
+    if read_only:
+        pragmas = dict(pragmas or {}, query_only="ON")
+        options["isolation_level"] = "AUTOCOMMIT"
+    db_engine = create_engine(database_url, connect_args=connect_args, pool_size=DB_POOL_SIZE,
+                              max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT, **options)
+
+    if pragmas:
+        @event.listens_for(db_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.close()
+
+    return db_engine
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Eigener Pool für lesende Requests: Sie warten weder auf Schreib-Verbindungen noch halten sie Transaktionen offen
+read_engine = create_db_engine(read_only=True)
+ReadSessionLocal = sessionmaker(autoflush=False, bind=read_engine)
 
 # Level Cap Daten aus JSON laden
 def load_json_data(file_path): # Umbenannt von load_level_caps_from_json, da jetzt universell
@@ -110,59 +234,251 @@ def load_json_data(file_path): # Umbenannt von load_level_caps_from_json, da jet
         return []
 
 
-def init_db():
-    """Erstellt alle Tabellen in der Datenbank, falls sie noch nicht existieren."""
-    Base.metadata.create_all(bind=engine)
-    print("Datenbanktabellen erstellt oder aktualisiert.")
+# --- Schema-Migrationen ---
+# Die Schema-Version steht in PRAGMA user_version. Jeder Schritt wird genau einmal ausgeführt.
 
-    session = SessionLocal()
-    try:
-        # Füge Standard-Level-Caps hinzu, falls noch nicht vorhanden
-        level_cap_data = load_json_data('level_caps.json')
-        for item in level_cap_data:
-            if not session.query(LevelCap).filter_by(order_number=item['order_number']).first():
-                session.add(LevelCap(
-                    name=item['name'],
-                    order_number=item['order_number'],
-                    max_level=item['max_level'],
-                    adjusted_level=item['adjusted_level']
-                ))
-        session.commit()
-        print("Standard-Level-Caps aus JSON hinzugefügt.")
-
-        # Initialisiere globale Orden, falls noch nicht vorhanden
-        order_milestones = [
-            {"number": 1, "name": "1. Arena"}, {"number": 2, "name": "2. Arena"},
-            {"number": 3, "name": "3. Arena"}, {"number": 4, "name": "4. Arena"},
-            {"number": 5, "name": "5. Arena"}, {"number": 6, "name": "6. Arena"},
-            {"number": 7, "name": "7. Arena"}, {"number": 8, "name": "8. Arena"},
-            {"number": 9, "name": "Top 4 (1)"}, {"number": 10, "name": "Top 4 (2)"},
-            {"number": 11, "name": "Top 4 (3)"}, {"number": 12, "name": "Top 4 (4)"},
-            {"number": 13, "name": "Champ"}
-        ]
-        for milestone in order_milestones:
-            if not session.query(GlobalOrder).filter_by(order_number=milestone["number"]).first():
-                session.add(GlobalOrder(order_number=milestone["number"], is_obtained=False))
-        session.commit()
-        print("Globale Orden/Meilensteine hinzugefügt.")
+def _migrate_sparse_catches(connection):
+    """Version 1: Leere Fang-Zeilen entfernen (fehlende Zeile = kein Fang) und (player_id, route_id) eindeutig machen."""
+    removed = connection.execute(text(
+        "DELETE FROM pokemon_catches WHERE pokemon_name IS NULL OR pokemon_name = ''")).rowcount
+    # Falls es doppelte Zellen gibt, gewinnt der zuletzt geschriebene Eintrag
+    duplicates = connection.execute(text(
+        "DELETE FROM pokemon_catches WHERE id NOT IN "
+        "(SELECT MAX(id) FROM pokemon_catches GROUP BY player_id, route_id)")).rowcount
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_pokemon_catches_player_route ON pokemon_catches (player_id, route_id)"))
+    print(f"Migration: {removed} leere und {duplicates} doppelte Fang-Zeilen entfernt.")
 
-    except Exception as e:
-        session.rollback()
-        print(f"Fehler beim Initialisieren der Datenbank: {e}")
-    finally:
-        session.close()
-
-def reset_full_db():
-    """Löscht alle Tabellen und initialisiert die Datenbank neu."""
-    print("Starte vollständigen Datenbank-Reset...")
-    Base.metadata.drop_all(bind=engine) # Löscht alle Tabellen
-    print("Alle Datenbanktabellen gelöscht.")
-    init_db() # Initialisiert sie neu mit Standarddaten
-    print("Datenbank vollständig zurückgesetzt und neu initialisiert.")
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+def _migrate_foreign_key_indexes(connection):
+    """Version 2: Index auf pokemon_catches.route_id (Route löschen, Fänge pro Route)."""
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_pokemon_catches_route_id ON pokemon_catches (route_id)"))
+
+
+def _rebuild_table(connection, model, copy_columns, run_id_expression):
+    """Baut eine Tabelle nach dem aktuellen Modell neu auf (SQLite kann Constraints nicht per ALTER ändern)."""
+    table = model.__table__
+    old_name = f"{table.name}_old"
+    # Benannte Indizes hängen nach dem Umbenennen an der alten Tabelle und würden beim Neuanlegen kollidieren
+    for index_name in connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"),
+            {"table": table.name}).scalars().all():
+        connection.execute(text(f"DROP INDEX {index_name}"))
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+    table.create(connection)
+    columns = ", ".join(copy_columns)
+    connection.execute(text(
+        f"INSERT INTO {table.name} (id, run_id, {columns}) SELECT id, {run_id_expression}, {columns} FROM {old_name}"))
+    connection.execute(text(f"DROP TABLE {old_name}"))
+
+
+def _migrate_runs(connection):
+    """Version 3: Run-Tabelle einführen und alle bestehenden Daten dem Standard-Run zuordnen."""
+    # Beim Umbenennen keine Fremdschlüssel anderer Tabellen umschreiben; pokemon_catches wird zuletzt neu gebaut
+    connection.execute(text("PRAGMA legacy_alter_table = ON"))
+    connection.execute(text("INSERT OR IGNORE INTO runs (id, name) VALUES (:id, :name)"),
+                       {"id": DEFAULT_RUN_ID, "name": DEFAULT_RUN_NAME})
+    _rebuild_table(connection, Player, ["name"], DEFAULT_RUN_ID)
+    _rebuild_table(connection, Route, ["name", "status"], DEFAULT_RUN_ID)
+    _rebuild_table(connection, GlobalOrder, ["order_number", "is_obtained"], DEFAULT_RUN_ID)
+    _rebuild_table(connection, LevelCap, ["name", "order_number", "max_level", "adjusted_level"], DEFAULT_RUN_ID)
+    _rebuild_table(connection, PokemonCatch, ["pokemon_name", "player_id", "route_id"],
+                   "(SELECT run_id FROM players WHERE players.id = pokemon_catches_old.player_id)")
+    connection.execute(text("PRAGMA legacy_alter_table = OFF"))
+
+
+def _migrate_run_state_version(connection):
+    """Version 4: Zähler für die Zustandsversion pro Run (Sequenznummern im Mehr-Worker-Betrieb)."""
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(runs)"))]
+    if "state_version" in columns:
+        return  # runs wurde erst von create_all() angelegt und hat die Spalte schon
+    connection.execute(text("ALTER TABLE runs ADD COLUMN state_version INTEGER NOT NULL DEFAULT 0"))
+
+
+def _migrate_db_meta(connection):
+    """Version 5: Tabelle db_meta für den Seed-Stempel (legt create_all() schon an, daher nur zur Sicherheit)."""
+    DbMeta.__table__.create(connection, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, _migrate_sparse_catches),
+    (2, _migrate_foreign_key_indexes),
+    (3, _migrate_runs),
+    (4, _migrate_run_state_version),
+    (5, _migrate_db_meta),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _run_migrations(connection):
+    current_version = connection.execute(text("PRAGMA user_version")).scalar()
+    for version, step in MIGRATIONS:
+        if version > current_version:
+            print(f"Führe Datenbank-Migration auf Version {version} aus...")
+            step(connection)
+            connection.execute(text(f"PRAGMA user_version = {version}"))
+
+
+def migrate_db():
+    """Bringt eine bestehende Datenbank auf die aktuelle Schema-Version."""
+    with engine.begin() as connection:
+        _run_migrations(connection)
+
+
+# Meilensteine, für die jeder Run einen Orden-Status hat
+ORDER_MILESTONES = [
+    {"number": 1, "name": "1. Arena"}, {"number": 2, "name": "2. Arena"},
+    {"number": 3, "name": "3. Arena"}, {"number": 4, "name": "4. Arena"},
+    {"number": 5, "name": "5. Arena"}, {"number": 6, "name": "6. Arena"},
+    {"number": 7, "name": "7. Arena"}, {"number": 8, "name": "8. Arena"},
+    {"number": 9, "name": "Top 4 (1)"}, {"number": 10, "name": "Top 4 (2)"},
+    {"number": 11, "name": "Top 4 (3)"}, {"number": 12, "name": "Top 4 (4)"},
+    {"number": 13, "name": "Champ"}
+]
+
+
+# Bei jeder Änderung an ORDER_MILESTONES oder am Seeding erhöhen, damit init_db() bestehende Datenbanken nachzieht
+SEED_VERSION = 1
+SEED_STAMP_KEY = 'seed_stamp'
+
+# Ein Statement pro Tabelle, das für alle Runs (run_id NULL) oder einen Run fehlende Zeilen anlegt; die
+# Eindeutigkeit von (run_id, order_number) lässt vorhandene Zeilen per OR IGNORE unverändert
+_SEED_LEVEL_CAPS = text(
+    "INSERT OR IGNORE INTO level_caps (run_id, name, order_number, max_level, adjusted_level) "
+    "SELECT id, :name, :order_number, :max_level, :adjusted_level FROM runs WHERE :run_id IS NULL OR id = :run_id")
+_SEED_GLOBAL_ORDERS = text(
+    "INSERT OR IGNORE INTO global_orders (run_id, order_number, is_obtained) "
+    "SELECT id, :order_number, 0 FROM runs WHERE :run_id IS NULL OR id = :run_id")
+
+
+def _seed_stamp():
+    return f"schema {SCHEMA_VERSION}, seed {SEED_VERSION}"
+
+
+def _seed(connection, run_id, level_caps):
+    """Legt fehlende Level-Caps und Orden an, für einen Run oder (run_id None) für alle."""
+    if level_caps is None:
+        level_caps = load_json_data('level_caps.json')
+    if level_caps:
+        connection.execute(_SEED_LEVEL_CAPS, [
+            {'run_id': run_id, 'name': item['name'], 'order_number': item['order_number'],
+             'max_level': item['max_level'], 'adjusted_level': item['adjusted_level']} for item in level_caps])
+    connection.execute(_SEED_GLOBAL_ORDERS, [{'run_id': run_id, 'order_number': milestone["number"]}
+                                             for milestone in ORDER_MILESTONES])
+
+
+def seed_run(session, run_id, level_caps=None):
+    """Legt Level-Caps und Orden eines Runs an, soweit sie noch fehlen. Committet nicht.
+
+    level_caps: validierter Inhalt von level_caps.json (ohne Angabe wird die Datei gelesen).
+    """
+    _seed(session, run_id, level_caps)
+
+
+def _db_is_current(connection):
+    """True, wenn Schema und Seed dem Stand dieses Codes entsprechen (zwei Lesezugriffe, keine Transaktion)."""
+    if connection.execute(text("PRAGMA user_version")).scalar() != SCHEMA_VERSION:
+        return False
+    has_meta = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'db_meta'")).first() is not None
+    return has_meta and connection.execute(text("SELECT value FROM db_meta WHERE key = :key"),
+                                           {'key': SEED_STAMP_KEY}).scalar() == _seed_stamp()
+
+
+def init_db(level_caps=None):
+    """Bringt die Datenbank auf den aktuellen Stand: Tabellen, Migrationen, Standard-Run, Level-Caps und Orden.
+
+    Ist sie schon aktuell (Seed-Stempel in db_meta), passiert nichts weiter. Sonst läuft alles in einer
+    Transaktion; das Seeding ist je Tabelle ein INSERT OR IGNORE über alle Runs. Spätere Änderungen an
+    level_caps.json gleicht die App selbst ab (_sync_level_caps), sie gehören nicht zum Stempel.
+    Gibt True zurück, wenn etwas zu tun war.
+    """
+    with engine.connect() as connection:
+        if _db_is_current(connection):
+            return False
+    with engine.begin() as connection:
+        is_new_db = not inspect(connection).has_table('players')
+        Base.metadata.create_all(bind=connection)
+        if is_new_db:
+            # Frisch angelegte Tabellen entsprechen bereits dem aktuellen Schema
+            connection.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+        else:
+            _run_migrations(connection)
+        connection.execute(text("INSERT OR IGNORE INTO runs (id, name, state_version) VALUES (:id, :name, 0)"),
+                           {'id': DEFAULT_RUN_ID, 'name': DEFAULT_RUN_NAME})
+        _seed(connection, None, level_caps)
+        connection.execute(text("INSERT OR REPLACE INTO db_meta (key, value) VALUES (:key, :value)"),
+                           {'key': SEED_STAMP_KEY, 'value': _seed_stamp()})
+    print("Datenbanktabellen erstellt oder aktualisiert; Standard-Level-Caps und Orden für alle Runs angelegt.")
+    return True
+
+
+def create_run(session, name, level_caps=None):
+    """Legt einen neuen Run samt Level-Caps und Orden an. Committet nicht."""
+    run = Run(name=name)
+    session.add(run)
+    session.flush()
+    seed_run(session, run.id, level_caps)
+    return run
+
+
+def reset_run(session, run_id, level_caps=None):
+    """Setzt einen Run vollständig zurück (Spieler, Routen, Fänge, Orden), ohne andere Runs zu berühren.
+
+    Statt drop_all werden nur die Zeilen dieses Runs gelöscht und danach neu angelegt. Committet nicht.
+    """
+    for model in (PokemonCatch, Player, Route, GlobalOrder, LevelCap):
+        session.query(model).filter(model.run_id == run_id).delete(synchronize_session=False)
+    seed_run(session, run_id, level_caps)
+
+
+def _rows(session, run_id, columns, order_by=None):
+    model = columns[0].class_
+    query = select(*columns).where(model.run_id == run_id)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    return [dict(row) for row in session.execute(query).mappings()]
+
+
+def read_run_data(session, run_id):
+    """Liest Spieler, Routen, Fänge, Orden und Level-Caps eines Runs als einfache Dicts.
+
+    Nur die Spalten, ohne ORM-Objekte; das zählt bei großen Runs (Journal-Snapshots, Import).
+    """
+    return {
+        'players': _rows(session, run_id, (Player.id, Player.name), Player.id),
+        # Wichtig: Routen nach ID sortieren, um die Einfügereihenfolge zu behalten
+        'routes': _rows(session, run_id, (Route.id, Route.name, Route.status), Route.id),
+        'catches': _rows(session, run_id, (PokemonCatch.player_id, PokemonCatch.route_id, PokemonCatch.pokemon_name)),
+        'global_orders': _rows(session, run_id, (GlobalOrder.order_number, GlobalOrder.is_obtained)),
+        'level_caps': _rows(session, run_id, (LevelCap.name, LevelCap.order_number, LevelCap.max_level,
+                                              LevelCap.adjusted_level)),
+    }
+
+
+def restore_run(session, run_id, data):
+    """Ersetzt alle Zeilen eines Runs durch einen Zustand im Format von read_run_data(). Committet nicht.
+
+    Spieler und Routen behalten ihre IDs, damit Fänge und spätere Journal-Events weiter passen.
+    """
+    for model in (PokemonCatch, Player, Route, GlobalOrder, LevelCap):
+        session.query(model).filter(model.run_id == run_id).delete(synchronize_session=False)
+    rows = [
+        (Player, [{'id': p['id'], 'run_id': run_id, 'name': p['name']} for p in data['players']]),
+        (Route, [{'id': r['id'], 'run_id': run_id, 'name': r['name'], 'status': r['status']}
+                 for r in data['routes']]),
+        (PokemonCatch, [dict(c, run_id=run_id) for c in data['catches']]),
+        (GlobalOrder, [dict(go, run_id=run_id) for go in data['global_orders']]),
+        (LevelCap, [dict(lc, run_id=run_id) for lc in data['level_caps']]),
+    ]
+    for model, values in rows:
+        if values:
+            session.execute(insert(model), values)
+
+
+def delete_run(session, run_id):
+    """Löscht einen Run mit allen zugehörigen Zeilen samt Journal. Committet nicht."""
+    for model in (PokemonCatch, Player, Route, GlobalOrder, LevelCap, JournalEvent, JournalSnapshot):
+        session.query(model).filter(model.run_id == run_id).delete(synchronize_session=False)
+    session.query(Run).filter(Run.id == run_id).delete(synchronize_session=False)
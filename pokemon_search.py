@@ -0,0 +1,109 @@
+# pokemon_search.py
+import unicodedata
+
+NGRAM_SIZE = 3
+MIN_NGRAM_SIMILARITY = 0.3  # Anteil der Query-N-Gramme, die ein Name enthalten muss, um als Tippfehler-Treffer zu gelten
+
+
+def normalize_name(name):
+    """Vereinheitlicht Schreibweisen für die Suche (Groß/Klein, Akzente, ß)."""
+    folded = unicodedata.normalize('NFKD', name.casefold().replace('ß', 'ss'))
+    return ''.join(ch for ch in folded if not unicodedata.combining(ch)).strip()
+
+
+def _ngrams(text, n=NGRAM_SIZE):
+    # Führende/abschließende Leerzeichen, damit auch Wortanfang und -ende als N-Gramm zählen
+    padded = ' ' * (n - 1) + text + ' '
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class PokemonNameIndex:
+    """Unveränderlicher Suchindex über die Pokémon-Namen: Präfix-Trie plus N-Gramm-Index für Tippfehler.
+
+    Der Index wird bei jedem Config-Reload komplett neu gebaut und danach als Ganzes ersetzt,
+    laufende Suchen arbeiten also immer auf einem konsistenten Stand.
+    """
+
+    def __init__(self, names):
+        # Doppelte Einträge entfernen, Reihenfolge der Datei beibehalten
+        self.names = list(dict.fromkeys(name for name in names if name))
+        self._normalized = [normalize_name(name) for name in self.names]
+        self._exact = {}
+        for name_id, normalized in enumerate(self._normalized):
+            self._exact.setdefault(normalized, name_id)
+
+        # Ranking für Präfix-Treffer: kürzere Namen zuerst, dann alphabetisch
+        order = sorted(range(len(self.names)), key=lambda i: (len(self._normalized[i]), self._normalized[i]))
+
+        # Trie-Knoten: {'children': {zeichen: knoten}, 'ids': [name_id, ...]} - ids bereits fertig sortiert
+        self._trie = {'children': {}, 'ids': []}
+        self._ngram_index = {}
+        self._ngram_counts = [0] * len(self.names)
+        for name_id in order:
+            normalized = self._normalized[name_id]
+            node = self._trie
+            node['ids'].append(name_id)
+            for ch in normalized:
+                node = node['children'].setdefault(ch, {'children': {}, 'ids': []})
+                node['ids'].append(name_id)
+            grams = _ngrams(normalized)
+            self._ngram_counts[name_id] = len(grams)
+            for gram in grams:
+                self._ngram_index.setdefault(gram, []).append(name_id)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_ids(self, normalized_query):
+        node = self._trie
+        for ch in normalized_query:
+            node = node['children'].get(ch)
+            if node is None:
+                return []
+        return node['ids']
+
+    def _fuzzy_ids(self, normalized_query):
+        query_grams = _ngrams(normalized_query)
+        counts = {}
+        for gram in query_grams:
+            for name_id in self._ngram_index.get(gram, ()):
+                counts[name_id] = counts.get(name_id, 0) + 1
+
+        threshold = MIN_NGRAM_SIMILARITY * len(query_grams)
+        total = len(query_grams)
+        ngram_counts = self._ngram_counts
+        normalized_names = self._normalized
+
+        # Enthaltene Teilstrings vor Tippfehlern, danach nach Dice-Ähnlichkeit der N-Gramm-Mengen
+        scored = [
+            (normalized_query not in normalized_names[name_id], -2.0 * count / (total + ngram_counts[name_id]), name_id)
+            for name_id, count in counts.items() if count >= threshold
+        ]
+        scored.sort()
+        return [name_id for _, _, name_id in scored]
+
+    def search(self, query, limit=10):
+        """Gibt bis zu `limit` Namen zurück: exakter Treffer, dann Präfix-Treffer, dann unscharfe Treffer."""
+        normalized_query = normalize_name(query or '')
+        if not normalized_query:
+            return []
+
+        result_ids = []
+        seen = set()
+
+        def take(ids):
+            for name_id in ids:
+                if len(result_ids) >= limit:
+                    return
+                if name_id not in seen:
+                    seen.add(name_id)
+                    result_ids.append(name_id)
+
+        exact_id = self._exact.get(normalized_query)
+        if exact_id is not None:
+            take([exact_id])
+        take(self._prefix_ids(normalized_query))
+        if len(result_ids) < limit:
+            take(self._fuzzy_ids(normalized_query))
+
+        return [self.names[name_id] for name_id in result_ids]
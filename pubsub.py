@@ -0,0 +1,148 @@
+# pubsub.py
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import socketio
+
+from broadcast import CONTROL_ROOM
+
+# Kanal, über den die Worker eines Clusters Socket-Events und Steuernachrichten austauschen
+DEFAULT_CHANNEL = 'soullink'
+
+
+class ClusterManagerMixin:
+    """Ergänzt einen python-socketio-PubSubManager um Listener für die App selbst.
+
+    Jede Nachricht, die über den Bus läuft, geht auf JEDEM Worker (auch dem sendenden) durch
+    _handle_emit. Die Listener sehen dort (event, data, room) und können z.B. den Change-Log des Runs
+    fortschreiben. Nachrichten an CONTROL_ROOM sind reine Server-Nachrichten und gehen an keinen Client.
+    """
+
+    def add_listener(self, listener):
+        if not hasattr(self, '_listeners'):
+            self._listeners = []
+        self._listeners.append(listener)
+
+    def _handle_emit(self, message):
+        for listener in getattr(self, '_listeners', ()):
+            try:
+                listener(message['event'], message['data'], message.get('room'))
+            except Exception as e:
+                print(f"Fehler bei der Verarbeitung einer Cluster-Nachricht ({message['event']}): {e}")
+        if message.get('room') == CONTROL_ROOM:
+            return
+        super()._handle_emit(message)
+
+
+class InProcessManager(socketio.PubSubManager):
+    """Bus innerhalb eines Prozesses: mehrere SocketIO-Server teilen sich einen Kanal (für Tests und Benchmarks).
+
+    Nachrichten werden wie bei Redis gepickelt, damit nicht serialisierbare Daten auch hier auffallen.
+    """
+    name = 'memory'
+    _subscribers = {}  # channel -> [Liste der Nachrichten-Queues aller Manager]
+
+    def __init__(self, url='memory://', channel=DEFAULT_CHANNEL, write_only=False, logger=None):
+        from gevent.queue import Queue
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue = Queue()
+        self._subscribers.setdefault(channel, []).append(self._queue)
+
+    def _publish(self, data):
+        payload = pickle.dumps(data)
+        for queue in self._subscribers.get(self.channel, ()):
+            queue.put(payload)  # Auch an sich selbst; eigene Nachrichten filtert PubSubManager über host_id
+
+    def _listen(self):
+        while True:
+            yield self._queue.get()
+
+
+class SQLiteBusManager(socketio.PubSubManager):
+    """Lokaler Ersatz für Redis: Worker auf demselben Rechner tauschen Nachrichten über eine SQLite-Tabelle aus.
+
+    Die AUTOINCREMENT-ID legt eine gemeinsame Reihenfolge fest, jeder Worker liest per Polling alles nach
+    seiner zuletzt gesehenen ID. Alte Nachrichten werden nach `retention` Sekunden gelöscht.
+    """
+    name = 'sqlite'
+
+    def __init__(self, url='sqlite:///soullink_bus.db', channel=DEFAULT_CHANNEL, write_only=False, logger=None,
+                 poll_interval=0.02, retention=60):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = url[len('sqlite:///'):] if url.startswith('sqlite:///') else url
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._db = sqlite3.connect(os.path.abspath(self.path), timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bus_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, payload BLOB NOT NULL, "
+            "created REAL NOT NULL)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _publish(self, data):
+        self._execute("INSERT INTO bus_messages (channel, payload, created) VALUES (?, ?, ?)",
+                      (self.channel, pickle.dumps(data), time.time()))
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < self.retention / 4:
+            return
+        self._last_cleanup = now
+        self._execute("DELETE FROM bus_messages WHERE created < ?", (now - self.retention,))
+
+    def _listen(self):
+        # Nur neue Nachrichten; was vor dem Start dieses Workers verschickt wurde, steckt bereits in der Datenbank
+        last_id = self._execute("SELECT COALESCE(MAX(id), 0) FROM bus_messages")[0][0]
+        while True:
+            rows = self._execute("SELECT id, payload FROM bus_messages WHERE channel = ? AND id > ? ORDER BY id",
+                                 (self.channel, last_id))
+            for message_id, payload in rows:
+                last_id = message_id
+                yield payload
+            if not rows:
+                self._cleanup()
+                self.server.sleep(self.poll_interval)
+
+
+def _backend_class(url):
+    if url.startswith('memory://'):
+        return InProcessManager
+    if url.startswith('sqlite://'):
+        return SQLiteBusManager
+    # Gleiche Zuordnung wie Flask-SocketIO für message_queue; die Treiber (redis, kombu, ...) sind optional
+    if url.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager
+    if url.startswith('kafka://'):
+        return socketio.KafkaManager
+    if url.startswith('zmq'):
+        return socketio.ZmqManager
+    return socketio.KombuManager
+
+
+def create_client_manager(url, channel=DEFAULT_CHANNEL):
+    """Erzeugt den Client-Manager für SocketIO(client_manager=...) zu einer Message-Queue-URL.
+
+    Unterstützt memory:// (ein Prozess), sqlite:///pfad.db (mehrere Worker auf einem Rechner) sowie alle
+    Backends von python-socketio (redis://, amqp://, kafka://, zmq+tcp://).
+    """
+    base = _backend_class(url)
+    manager_class = type(f'Cluster{base.__name__}', (ClusterManagerMixin, base), {})
+    return manager_class(url, channel=channel)
+
+
+def start_listening(socketio_server):
+    """Startet den Empfang vom Bus sofort und nicht erst beim ersten Client (python-socketio initialisiert lazy)."""
+    if not socketio_server.manager_initialized:
+        socketio_server.manager_initialized = True
+        socketio_server.manager.initialize()
@@ -0,0 +1,330 @@
+# run_archive.py
+"""Export und Import von Runs als NDJSON-Archiv (eine JSON-Zeile pro Datensatz, optional gzip-komprimiert).
+
+Aufbau eines Archivs:
+    {"type": "run", "format": 1, "name": ..., "exported_at": ...}
+    {"type": "player", "id": ..., "name": ...}                      (alle Spieler, dann alle Routen usw.)
+    {"type": "route", "id": ..., "name": ..., "status": ...}
+    {"type": "catch", "player_id": ..., "route_id": ..., "pokemon_name": ...}
+    {"type": "global_order", "order_number": ..., "is_obtained": ...}
+    {"type": "level_cap", "name": ..., "order_number": ..., "max_level": ..., "adjusted_level": ...}
+    {"type": "end", "counts": {"player": ..., ...}}
+
+IDs im Archiv sind die des exportierenden Servers; beim Import bekommen Spieler und Routen neue IDs, die
+Fänge werden umgeschlüsselt. Beide Richtungen arbeiten zeilenweise, der Run wird nie komplett geladen.
+
+Aufruf aus dem Projektverzeichnis (auch bei laufendem Server):
+    python run_archive.py export --run 1 -o run1.ndjson.gz
+    python run_archive.py import run1.ndjson.gz --name "Archiv 2024"
+"""
+import argparse
+import gzip
+import io
+import json
+import sys
+import time
+import zlib
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import (SessionLocal, Run, Player, Route, PokemonCatch, GlobalOrder, LevelCap, init_db, delete_run,
+                    read_run_data, seed_run)
+from journal import write_snapshot
+from wire_format import GZIP_LEVEL
+
+ARCHIVE_FORMAT = 1
+NDJSON_MIMETYPE = 'application/x-ndjson'
+GZIP_MIMETYPE = 'application/gzip'
+
+EXPORT_BATCH_SIZE = 1000  # Zeilen pro Datenbank-Abruf und pro geschriebenem Block
+IMPORT_BATCH_SIZE = 1000  # Zeilen pro Import-Transaktion
+
+# Datensatztypen in Archiv-Reihenfolge: Modell, Spalten im Archiv, Sortierung beim Export
+ARCHIVE_TABLES = (
+    ('player', Player, ('id', 'name'), Player.id),
+    ('route', Route, ('id', 'name', 'status'), Route.id),
+    ('catch', PokemonCatch, ('player_id', 'route_id', 'pokemon_name'), PokemonCatch.id),
+    ('global_order', GlobalOrder, ('order_number', 'is_obtained'), GlobalOrder.order_number),
+    ('level_cap', LevelCap, ('name', 'order_number', 'max_level', 'adjusted_level'), LevelCap.order_number),
+)
+_TABLES_BY_TYPE = {record_type: (model, columns) for record_type, model, columns, _ in ARCHIVE_TABLES}
+# Spalten, die pro Run eindeutig sein müssen (Fänge nach Umschreiben auf die neuen IDs)
+_UNIQUE_KEYS = {
+    'player': ('name',),
+    'route': ('name',),
+    'catch': ('player_id', 'route_id'),
+    'global_order': ('order_number',),
+    'level_cap': ('order_number',),
+}
+
+
+class ArchiveError(ValueError):
+    """Archiv ist unvollständig oder hat nicht das erwartete Format."""
+
+
+class RunExistsError(ArchiveError):
+    """Ein Run mit dem Namen aus dem Archiv (oder dem angegebenen) existiert bereits."""
+
+
+# --- Export ---
+def _line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def export_lines(session, run_id, batch_size=EXPORT_BATCH_SIZE):
+    """Erzeugt das Archiv eines Runs als Textblöcke aus je bis zu `batch_size` Zeilen.
+
+    Die Tabellen werden nacheinander per Cursor gelesen (yield_per), nicht komplett geladen.
+    """
+    name = session.scalar(select(Run.name).where(Run.id == run_id))
+    if name is None:
+        raise ArchiveError(f"Run {run_id} existiert nicht.")
+    yield _line({'type': 'run', 'format': ARCHIVE_FORMAT, 'name': name, 'exported_at': time.time()})
+    counts = {}
+    for record_type, model, columns, order_by in ARCHIVE_TABLES:
+        query = (select(*(getattr(model, column) for column in columns))
+                 .where(model.run_id == run_id).order_by(order_by)
+                 .execution_options(yield_per=batch_size))
+        count = 0
+        for rows in session.execute(query).partitions():
+            block = []
+            for row in rows:
+                record = {'type': record_type}
+                record.update(zip(columns, row))
+                block.append(_line(record))
+            count += len(block)
+            yield ''.join(block)
+        counts[record_type] = count
+    yield _line({'type': 'end', 'counts': counts})
+
+
+def encode_chunks(chunks, compress=False):
+    """Text-Blöcke als Bytes, mit compress als fortlaufender gzip-Strom."""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+: gzip-Header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# --- Import ---
+def open_archive(stream):
+    """Liest ein Archiv zeilenweise aus einem Byte-Strom; gzip wird an den ersten Bytes erkannt."""
+    buffered = stream if hasattr(stream, 'peek') else io.BufferedReader(stream)
+    if buffered.peek(2)[:2] == b'\x1f\x8b':
+        buffered = gzip.GzipFile(fileobj=buffered, mode='rb')
+    return io.TextIOWrapper(buffered, encoding='utf-8')
+
+
+def _records(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ArchiveError(f"Zeile {number} ist kein gültiges JSON: {e}")
+        if not isinstance(record, dict) or 'type' not in record:
+            raise ArchiveError(f"Zeile {number} hat keinen Datensatztyp.")
+        yield number, record
+
+
+def read_header(lines):
+    """Liest die Kopfzeile und gibt (Kopf, restliche Datensätze) zurück."""
+    records = _records(lines)
+    first = next(records, None)
+    if first is None or first[1]['type'] != 'run':
+        raise ArchiveError("Das Archiv beginnt nicht mit einem Run-Datensatz.")
+    header = first[1]
+    if header.get('format') != ARCHIVE_FORMAT:
+        raise ArchiveError(f"Archiv-Format {header.get('format')} wird nicht unterstützt (erwartet {ARCHIVE_FORMAT}).")
+    return header, records
+
+
+class _BatchWriter:
+    """Sammelt Zeilen pro Modell und schreibt sie per executemany; committet alle `batch_size` Zeilen."""
+
+    def __init__(self, session, run_id, batch_size):
+        self.session = session
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.pending = {}  # Modell -> Zeilen
+        self.pending_lines = []  # (Zeilennummer, Schlüssel) der ausstehenden Zeilen
+        self.pending_count = 0
+        self.first_lines = {}  # Schlüssel -> Zeilennummer, in der er zuerst vorkam
+        self.player_ids = {}  # Archiv-ID -> neue ID
+        self.route_ids = {}
+        self.skipped = 0
+
+    def add(self, record_type, number, record):
+        model, columns = _TABLES_BY_TYPE[record_type]
+        try:
+            values = {column: record[column] for column in columns}
+        except KeyError as e:
+            raise ArchiveError(f"Zeile {number}: Feld {e} fehlt.")
+        if record_type == 'catch':
+            self.flush_ids()  # Fänge brauchen die neuen IDs aller Spieler und Routen davor
+            player_id = self.player_ids.get(values['player_id'])
+            route_id = self.route_ids.get(values['route_id'])
+            if player_id is None or route_id is None or not values['pokemon_name']:
+                self.skipped += 1  # Verweist auf nichts im Archiv oder ist leer
+                return
+            values.update(player_id=player_id, route_id=route_id)
+        values['run_id'] = self.run_id
+        key = (record_type, *(values[column] for column in _UNIQUE_KEYS[record_type]))
+        self.first_lines.setdefault(key, number)
+        self.pending.setdefault(model, []).append(values)
+        self.pending_lines.append((number, key))
+        self.pending_count += 1
+        if self.pending_count >= self.batch_size:
+            self.flush(commit=True)
+
+    def flush_ids(self):
+        if self.pending.get(Player) or self.pending.get(Route):
+            self.flush(commit=False)
+
+    def conflict(self):
+        """Gibt (Zeile, frühere Zeile) der ersten ausstehenden Zeile zurück, deren Schlüssel schon vorkam."""
+        for number, key in self.pending_lines:
+            first = self.first_lines[key]
+            if first != number:
+                return number, first
+        return None
+
+    def flush(self, commit=True):
+        for model, rows in self.pending.items():
+            if model in (Player, Route):
+                archive_ids = [row.pop('id') for row in rows]
+                table = model.__table__
+                new_ids = self.session.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                                               rows).scalars().all()
+                (self.player_ids if model is Player else self.route_ids).update(zip(archive_ids, new_ids))
+            elif rows:
+                self.session.execute(insert(model.__table__), rows)  # Core-executemany, ohne ORM-Bulk-Pfad
+        self.pending = {}
+        self.pending_lines = []
+        self.pending_count = 0
+        if commit:
+            self.session.commit()
+
+
+def import_run(session, lines, name=None, level_caps=None, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+    """Legt aus einem Archiv einen neuen Run an und gibt (Run-ID, Zähler pro Datensatztyp) zurück.
+
+    Geschrieben wird in Transaktionen zu je `batch_size` Zeilen, damit große Archive die Schreibsperre
+    nur kurz halten. Schlägt der Import fehl, wird der halb angelegte Run wieder gelöscht; doppelte Namen
+    oder Nummern im Archiv werden als ArchiveError mit der Zeilennummer gemeldet.
+    Ohne Orden oder Level-Caps im Archiv werden sie wie bei einem neuen Run angelegt (level_caps wie
+    in models.seed_run). on_progress(Zähler) wird nach jedem Block aufgerufen.
+    """
+    header, records = read_header(lines)
+    name = (name or header.get('name') or '').strip()
+    if not name:
+        raise ArchiveError("Das Archiv enthält keinen Run-Namen; bitte einen angeben.")
+    if session.scalar(select(Run.id).where(Run.name == name)) is not None:
+        raise RunExistsError(f"Ein Run mit dem Namen '{name}' existiert bereits.")
+
+    run = Run(name=name)
+    session.add(run)
+    session.commit()
+    run_id = run.id
+    writer = _BatchWriter(session, run_id, batch_size)
+    counts = {record_type: 0 for record_type in _TABLES_BY_TYPE}
+    try:
+        end = None
+        for number, record in records:
+            record_type = record['type']
+            if record_type == 'end':
+                end = record
+                break
+            if record_type not in _TABLES_BY_TYPE:
+                raise ArchiveError(f"Zeile {number}: unbekannter Datensatztyp '{record_type}'.")
+            writer.add(record_type, number, record)
+            counts[record_type] += 1
+            if on_progress is not None and writer.pending_count == 0:
+                on_progress(counts)
+        if end is None:
+            raise ArchiveError("Das Archiv ist unvollständig (Ende fehlt).")
+        expected = end.get('counts', {})
+        if any(expected.get(record_type, count) != count for record_type, count in counts.items()):
+            raise ArchiveError(f"Das Archiv ist unvollständig: erwartet {expected}, gelesen {counts}.")
+        writer.flush(commit=False)
+        seed_run(session, run_id, level_caps)  # Füllt nur Fehlendes auf (INSERT OR IGNORE)
+        write_snapshot(session, run_id, 0, read_run_data(session, run_id))  # Ausgangspunkt für das Journal
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        delete_run(session, run_id)
+        session.commit()
+        if isinstance(e, IntegrityError):
+            conflict = writer.conflict()
+            if conflict is None:
+                raise ArchiveError(f"Das Archiv enthält doppelte Einträge: {e.orig}") from e
+            raise ArchiveError(f"Zeile {conflict[0]}: doppelter Eintrag, schon in Zeile {conflict[1]}.") from e
+        raise
+    counts['catch'] -= writer.skipped
+    counts['skipped'] = writer.skipped
+    return run_id, counts
+
+
+# --- Kommandozeile ---
+def _export_command(args):
+    compress = args.gzip if args.gzip is not None else bool(args.output and args.output.endswith('.gz'))
+    session = SessionLocal()
+    try:
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for data in encode_chunks(export_lines(session, args.run), compress):
+                output.write(data)
+        finally:
+            if args.output:
+                output.close()
+    finally:
+        session.close()
+    if args.output:
+        print(f"Run {args.run} nach {args.output} exportiert.", file=sys.stderr)
+
+
+def _import_command(args):
+    start = time.perf_counter()
+    session = SessionLocal()
+    try:
+        with (open(args.archive, 'rb') if args.archive != '-' else sys.stdin.buffer) as stream:
+            run_id, counts = import_run(session, open_archive(stream), args.name, batch_size=args.batch_size)
+    finally:
+        session.close()
+    print(f"Run {run_id} importiert in {time.perf_counter() - start:.2f} s: {counts}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs als NDJSON-Archiv exportieren und importieren.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='Run als Archiv schreiben')
+    export_parser.add_argument('--run', type=int, default=1, help='ID des Runs (Standard: 1)')
+    export_parser.add_argument('-o', '--output', help='Zieldatei (Standard: stdout); auf .gz endend = gzip')
+    export_parser.add_argument('--gzip', action='store_true', default=None, help='gzip-komprimiert schreiben')
+    import_parser = commands.add_parser('import', help='Archiv als neuen Run anlegen')
+    import_parser.add_argument('archive', help='Archivdatei, gzip oder unkomprimiert; - für stdin')
+    import_parser.add_argument('--name', help='Name des neuen Runs (Standard: Name aus dem Archiv)')
+    import_parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Zeilen pro Transaktion')
+    args = parser.parse_args()
+
+    init_db()  # Schema und Seed prüfen; ist die Datenbank aktuell, nur ein kurzer Abgleich
+    try:
+        if args.command == 'export':
+            _export_command(args)
+        else:
+            _import_command(args)
+    except ArchiveError as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# run_state.py
+import threading
+from collections import deque
+
+CHANGE_LOG_SIZE = 512
+MAX_OUT_OF_ORDER = 32  # So viele Änderungen dürfen hinter einer Lücke warten, bevor die Lücke übersprungen wird
+
+
+class RunState:
+    """In-Memory-Zustand eines Runs: Zustandsversion, Snapshot-Cache für /api/data und Change-Log.
+
+    Jede schreibende Operation erhöht die Version. Der Snapshot wird nur einmal pro Version und Darstellung serialisiert.
+    Der Change-Log ist ein Ringpuffer der letzten Änderungen; die Sequenznummer einer Änderung ist die
+    Zustandsversion nach der Änderung, so dass Clients Lücken erkennen und gezielt nachladen können.
+    """
+
+    def __init__(self, run_id, change_log_size=CHANGE_LOG_SIZE, version=0):
+        self.run_id = run_id
+        self.version = version
+        self.snapshot_version = None
+        self.snapshot_payload = None
+        self.snapshot_bodies = {}  # Darstellung (z.B. 'json', 'compact+gzip') -> serialisierter Snapshot
+        self.change_log = deque(maxlen=change_log_size)
+        self.lock = threading.RLock()
+        self._out_of_order = {}  # seq -> entry, nur im Mehr-Worker-Betrieb (ingest)
+        self.local_seqs = set()  # Im Mehr-Worker-Betrieb: von diesem Worker vergebene, noch nicht empfangene Nummern
+        self.link_view = None  # link_view.LinkView, wird beim ersten Zugriff aus der Datenbank gebaut
+        self.store = None  # state_store.RunStore, Zustand im Speicher (nur im Ein-Prozess-Betrieb)
+
+    def record(self, changes, publish=None):
+        """Vergibt Sequenznummern für (event, data)-Paare und legt sie im Change-Log ab.
+
+        publish(entries) wird noch unter dem Lock aufgerufen, damit Broadcasts in Sequenz-Reihenfolge rausgehen.
+        """
+        entries = []
+        with self.lock:
+            for event, data in changes:
+                self.version += 1
+                entry = {'seq': self.version, 'event': event, 'data': dict(data or {}, seq=self.version)}
+                self.change_log.append(entry)
+                entries.append(entry)
+            if publish is not None and entries:
+                publish(entries)
+        return entries
+
+    def ingest(self, entries):
+        """Übernimmt Änderungen mit bereits vergebenen Sequenznummern (Mehr-Worker-Betrieb, vom Bus).
+
+        Die Nummern vergibt die Datenbank; über den Bus können Änderungen verschiedener Worker vertauscht
+        ankommen. Der Change-Log bleibt trotzdem lückenlos: Vorgezogene Einträge warten, bis die Lücke
+        gefüllt ist. Kommt sie nicht (z.B. Nachricht vor dem Start dieses Workers), wird sie übersprungen
+        und der Log neu begonnen - Clients mit älterem Stand laden dann den Snapshot.
+
+        Gibt die neu in den Change-Log übernommenen Einträge in Sequenz-Reihenfolge zurück.
+        """
+        appended = []
+        with self.lock:
+            for entry in entries:
+                if entry['seq'] > self.version:
+                    self._out_of_order[entry['seq']] = entry
+            if len(self._out_of_order) > MAX_OUT_OF_ORDER:
+                self.version = min(self._out_of_order) - 1
+                self.change_log.clear()
+            while self.version + 1 in self._out_of_order:
+                entry = self._out_of_order.pop(self.version + 1)
+                self.change_log.append(entry)
+                self.version = entry['seq']
+                appended.append(entry)
+        return appended
+
+    def changes_since(self, since):
+        """Gibt die Änderungen nach `since` zurück oder None, wenn der Ringpuffer sie nicht mehr enthält."""
+        with self.lock:
+            if since > self.version:
+                return None  # Client kennt einen Stand, den es in diesem Prozess nie gab
+            if since == self.version:
+                return []
+            if not self.change_log or self.change_log[0]['seq'] > since + 1:
+                return None  # Bereits aus dem Ringpuffer gefallen
+            return [change for change in self.change_log if change['seq'] > since]
+
+    def snapshot(self, build, version=None, variant='json', encode=None):
+        """Gibt (Version, serialisierter Snapshot) zurück.
+
+        build(version) liefert den Zustand als Dict und wird nur bei neuer Version aufgerufen;
+        encode(zustand) serialisiert ihn und läuft einmal pro Version und Darstellung (`variant`).
+        Ohne `version` gilt die lokale Zustandsversion; im Mehr-Worker-Betrieb übergibt der Aufrufer die
+        Version aus der Datenbank.
+        """
+        with self.lock:
+            version = self.version if version is None else version
+            if self.snapshot_version != version:
+                # Die Version wird VOR dem Lesen festgehalten: Ändert sich der Zustand währenddessen,
+                # ist der Snapshot höchstens zu alt markiert und wird beim nächsten Abruf neu gebaut.
+                self.snapshot_payload = build(version)
+                self.snapshot_version = version
+                self.snapshot_bodies = {}
+            body = self.snapshot_bodies.get(variant)
+            if body is None:
+                body = self.snapshot_bodies[variant] = encode(self.snapshot_payload)
+            return version, body
@@ -0,0 +1,34 @@
+# startup_profile.py
+import os
+import time
+
+
+class StartupProfile:
+    """Zeitmessung der Startphasen (Imports, Monkey-Patching, Configs, Datenbank, ...).
+
+    mark(phase) schließt die laufende Phase ab. Mit SOULLINK_STARTUP_PROFILE=1 gibt report() am Ende des
+    Starts eine Tabelle aus; die Zeiten stehen unabhängig davon auch unter /metrics.
+    """
+
+    def __init__(self, start=None, enabled=None):
+        self.start = time.perf_counter() if start is None else start
+        self.enabled = os.environ.get('SOULLINK_STARTUP_PROFILE', '') not in ('', '0') if enabled is None else enabled
+        self.phases = []  # [(Phase, Sekunden)] in Reihenfolge
+        self._last = self.start
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.start
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startzeiten:")
+        for phase, seconds in self.phases:
+            print(f"  {phase:32} {seconds * 1000:8.1f} ms")
+        print(f"  {'Gesamt':32} {self.total * 1000:8.1f} ms")
@@ -0,0 +1,144 @@
+# state_store.py
+from config_manager import apply_level_cap_diff, LEVEL_CAP_FIELDS
+
+# Events, die den Zustand eines Runs ändern und von RunStore.apply verstanden werden. Abgeleitete Events
+# (Link-Sicht) und Config-Events betreffen nur die Clients.
+STATE_CHANGE_EVENTS = frozenset({
+    'catch_updated', 'route_status_updated', 'global_order_toggled', 'player_added', 'players_added',
+    'route_added', 'routes_added', 'route_deleted', 'all_data_reset', 'level_caps_updated',
+    'full_db_reset', 'run_restored',
+})
+
+# Events, deren Daten den vollständigen Zustand danach enthalten ({'state': ...}); im Change-Log fehlt er
+STATE_EVENTS = ('full_db_reset', 'run_restored')
+
+# Markierungen im Journal ohne Wirkung auf den Zustand (z.B. Beginn eines Resets, siehe journal.complete_reset)
+MARKER_EVENTS = ('reset_started',)
+
+
+class PlayerRecord:
+    __slots__ = ('id', 'name')
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class RouteRecord:
+    __slots__ = ('id', 'name', 'status')
+
+    def __init__(self, id, name, status=""):
+        self.id = id
+        self.name = name
+        self.status = status or ""
+
+
+class LevelCapRecord:
+    __slots__ = LEVEL_CAP_FIELDS
+
+    def __init__(self, name, order_number, max_level, adjusted_level):
+        self.name = name
+        self.order_number = order_number
+        self.max_level = max_level
+        self.adjusted_level = adjusted_level
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in LEVEL_CAP_FIELDS}
+
+
+class RunStore:
+    """Zustand eines Runs im Speicher, indiziert nach IDs.
+
+    players und routes: id -> Datensatz in ID-Reihenfolge, catches: (player_id, route_id) -> Pokémon,
+    global_orders: order_number -> erhalten, level_caps: order_number -> Datensatz. Änderungen kommen
+    als dieselben (event, data)-Paare, die auch Journal und Change-Log tragen; alle sind absolut
+    (z.B. "Fang ist jetzt X"), doppeltes Anwenden schadet also nicht.
+    """
+    __slots__ = ('players', 'routes', 'catches', 'global_orders', 'level_caps')
+
+    def __init__(self):
+        self.players = {}
+        self.routes = {}
+        self.catches = {}
+        self.global_orders = {}
+        self.level_caps = {}
+
+    @classmethod
+    def from_data(cls, data):
+        """Baut den Zustand aus dem Format von models.read_run_data()."""
+        store = cls()
+        store.load(data)
+        return store
+
+    def load(self, data):
+        self.players = {p['id']: PlayerRecord(p['id'], p['name']) for p in sorted(data['players'], key=_by_id)}
+        self.routes = {r['id']: RouteRecord(r['id'], r['name'], r['status'])
+                       for r in sorted(data['routes'], key=_by_id)}
+        self.catches = {(c['player_id'], c['route_id']): c['pokemon_name'] for c in data['catches']}
+        self.global_orders = {go['order_number']: bool(go['is_obtained']) for go in data['global_orders']}
+        self.level_caps = {lc['order_number']: LevelCapRecord(**{field: lc[field] for field in LEVEL_CAP_FIELDS})
+                           for lc in sorted(data['level_caps'], key=lambda lc: lc['order_number'])}
+
+    def to_data(self):
+        """Zustand im Format von models.read_run_data(); Spieler und Routen nach ID, Level-Caps nach Nummer."""
+        return {
+            'players': [{'id': p.id, 'name': p.name} for p in self.players.values()],
+            'routes': [{'id': r.id, 'name': r.name, 'status': r.status} for r in self.routes.values()],
+            'catches': [{'player_id': player_id, 'route_id': route_id, 'pokemon_name': name}
+                        for (player_id, route_id), name in self.catches.items()],
+            'global_orders': [{'order_number': number, 'is_obtained': obtained}
+                              for number, obtained in sorted(self.global_orders.items())],
+            'level_caps': [lc.to_dict() for lc in self.level_caps.values()],
+        }
+
+    def _key(self):
+        return ({p.id: p.name for p in self.players.values()},
+                {r.id: (r.name, r.status) for r in self.routes.values()},
+                self.catches, self.global_orders,
+                {number: lc.to_dict() for number, lc in self.level_caps.items()})
+
+    def __eq__(self, other):
+        return isinstance(other, RunStore) and self._key() == other._key()
+
+    __hash__ = None
+
+    def apply(self, event, data):
+        """Wendet eine Änderung an; unbekannte Events sind ein Fehler (ValueError)."""
+        if event == 'catch_updated':
+            key = (data['player_id'], data['route_id'])
+            if data['pokemon_name']:
+                self.catches[key] = data['pokemon_name']
+            else:
+                self.catches.pop(key, None)
+        elif event == 'route_status_updated':
+            route = self.routes.get(data['route_id'])
+            if route is not None:
+                route.status = data['status_text'] or ""
+        elif event == 'global_order_toggled':
+            self.global_orders[data['order_number']] = bool(data['is_obtained'])
+        elif event in ('player_added', 'players_added'):
+            for player in data['players'] if event == 'players_added' else [data]:
+                self.players[player['id']] = PlayerRecord(player['id'], player['name'])
+        elif event in ('route_added', 'routes_added'):
+            for route in data['routes'] if event == 'routes_added' else [data]:
+                self.routes[route['id']] = RouteRecord(route['id'], route['name'], route.get('status'))
+        elif event == 'route_deleted':
+            self.routes.pop(data['route_id'], None)
+            self.catches = {key: name for key, name in self.catches.items() if key[1] != data['route_id']}
+        elif event == 'all_data_reset':
+            self.catches = {}
+            for route in self.routes.values():
+                route.status = ""
+        elif event == 'level_caps_updated':
+            level_caps = apply_level_cap_diff([lc.to_dict() for lc in self.level_caps.values()], data)
+            self.level_caps = {lc['order_number']: LevelCapRecord(**lc) for lc in level_caps}
+        elif event in STATE_EVENTS:
+            self.load(data['state'])
+        elif event in MARKER_EVENTS:
+            pass
+        else:
+            raise ValueError(f"Unbekanntes Event '{event}' für den Run-Zustand")
+
+
+def _by_id(row):
+    return row['id']
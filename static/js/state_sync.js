@@ -0,0 +1,334 @@
+// state_sync.js
+// Gemeinsame Delta-Synchronisation für Hauptansicht und Kurzansicht.
+//
+// Der Server versieht jedes SocketIO-Event mit einer Sequenznummer (= Zustandsversion nach der Änderung).
+// Passt die Nummer lückenlos an den lokalen Stand, wird nur das Event angewendet. Bei einer Lücke oder
+// nach einem Reconnect werden die fehlenden Änderungen über /api/changes nachgeladen; nur wenn der
+// Ringpuffer des Servers sie nicht mehr enthält, wird der komplette Snapshot von /api/data geholt.
+// Gebündelte Änderungen kommen als 'changes_batch' mit einer Liste von {seq, event, data}.
+//
+// Die statischen Namenslisten (Pokémon, Routen) sind nicht Teil des Live-Zustands. Snapshot und
+// Config-Events tragen nur den Hash des Config-Bundles; das Bundle selbst wird nur bei neuem Hash
+// geladen und ist unter seiner inhaltsadressierten URL dauerhaft im Browser-Cache.
+//
+// Mit options.compact holt die Synchronisation Snapshots spaltenweise (Accept: COMPACT_MIMETYPE) und
+// erwartet Socket-Events als 'changes_compact'; der Socket muss dafür mit format=compact verbunden sein.
+// Namen stehen dort als Index in die Listen des Config-Bundles. Beides wird hier in die gewohnte Form
+// zurückübersetzt, die Seiten sehen keinen Unterschied (Aufbau siehe wire_format.py).
+
+const CONFIG_EVENTS = ['config_changed', 'config_saved', 'configs_reloaded'];
+
+const SYNC_EVENTS = [
+    'player_added',
+    'players_added',
+    'route_added',
+    'routes_added',
+    'catch_updated',
+    'global_order_toggled',
+    'route_status_updated',
+    'level_caps_updated',
+    'all_data_reset',
+    'route_deleted',
+    'full_db_reset',
+    'run_restored',
+    'config_changed',
+    'config_saved',
+    'configs_reloaded',
+];
+
+// Wendet ein Listen-Diff des Servers an: [[von, bis, [neue Einträge]], ...], rückwärts wie splice.
+function applyListDiff(items, diff) {
+    for (let i = diff.length - 1; i >= 0; i--) {
+        const [start, end, replacement] = diff[i];
+        items.splice(start, end - start, ...replacement);
+    }
+}
+
+// Wendet ein Level-Cap-Diff {upsert: [...], removed: [order_number, ...]} an, Ergebnis nach order_number sortiert.
+function applyLevelCapDiff(levelCaps, diff) {
+    const byNumber = new Map(levelCaps.map(lc => [lc.order_number, lc]));
+    (diff.removed || []).forEach(number => byNumber.delete(number));
+    (diff.upsert || []).forEach(lc => byNumber.set(lc.order_number, { ...lc }));
+    return [...byNumber.values()].sort((a, b) => a.order_number - b.order_number);
+}
+
+const COMPACT_MIMETYPE = 'application/vnd.soullink.compact+json';
+
+// Spalten der Snapshot-Tabellen und Felder der als Werteliste übertragenen Events (wie in wire_format.py)
+const COMPACT_TABLES = {
+    players: ['id', 'name'],
+    routes: ['id', 'name', 'status'],
+    catches: ['player_id', 'route_id', 'pokemon_name'],
+    global_orders: ['order_number', 'is_obtained'],
+    level_caps: ['name', 'order_number', 'max_level', 'adjusted_level'],
+};
+const COMPACT_DICT_COLUMNS = {
+    'routes.name': 'all_route_names',
+    'catches.pokemon_name': 'all_pokemon_names',
+};
+const COMPACT_EVENT_FIELDS = {
+    catch_updated: ['player_id', 'route_id', 'pokemon_name'],
+    route_status_updated: ['route_id', 'status_text'],
+    global_order_toggled: ['order_number', 'is_obtained'],
+    link_updated: ['route_id', 'name', 'state', 'pokemon', 'counts'],
+};
+const COMPACT_EVENT_DICT_FIELDS = {
+    'catch_updated.pokemon_name': 'all_pokemon_names',
+    'link_updated.name': 'all_route_names',
+    'link_updated.pokemon': 'all_pokemon_names',
+};
+
+// Zahlen sind Indizes in die Namensliste des Bundles, Strings und null bleiben, wie sie sind.
+function decodeName(names, value) {
+    if (Array.isArray(value)) return value.map(item => decodeName(names, item));
+    return typeof value === 'number' ? names[value] : value;
+}
+
+function decodeCompactSnapshot(data, bundle) {
+    const result = {};
+    Object.entries(data).forEach(([key, value]) => {
+        if (key !== 'format' && !(key in COMPACT_TABLES)) result[key] = value;
+    });
+    Object.entries(COMPACT_TABLES).forEach(([table, columns]) => {
+        const values = columns.map(column => {
+            const dictKey = COMPACT_DICT_COLUMNS[`${table}.${column}`];
+            const encoded = data[table][column];
+            return dictKey ? decodeName(bundle[dictKey], encoded) : encoded;
+        });
+        const rows = [];
+        for (let i = 0; i < (values[0] || []).length; i++) {
+            const row = {};
+            columns.forEach((column, c) => { row[column] = values[c][i]; });
+            rows.push(row);
+        }
+        result[table] = rows;
+    });
+    return result;
+}
+
+function decodeCompactChanges(frame, bundle) {
+    return frame.c.map(([seq, event, values]) => {
+        let data;
+        if (Array.isArray(values)) {
+            data = {};
+            COMPACT_EVENT_FIELDS[event].forEach((field, i) => {
+                const dictKey = COMPACT_EVENT_DICT_FIELDS[`${event}.${field}`];
+                data[field] = dictKey ? decodeName(bundle[dictKey], values[i]) : values[i];
+            });
+        } else {
+            data = { ...values };
+        }
+        data.seq = seq;
+        return { seq, event, data };
+    });
+}
+
+// Abgeleitete Events der Link-Sicht (/api/links). Sie zählen in der Sequenz mit, Seiten ohne
+// handlers.applyDerived übergehen sie einfach.
+const DERIVED_EVENTS = ['link_updated', 'link_removed', 'level_cap_changed', 'link_view_reset'];
+
+// handlers.applySnapshot(data)        - übernimmt einen vollständigen Snapshot von /api/data
+// handlers.applyChange(event, data)   - wendet eine Änderung an; false erzwingt einen neuen Snapshot
+// handlers.applyConfig(bundle)        - übernimmt die Namenslisten aus dem Config-Bundle
+// handlers.render()                   - zeichnet die Oberfläche nach angewendeten Änderungen neu
+// handlers.applyDerived(event, data)  - optional, wendet ein Event der Link-Sicht an (DERIVED_EVENTS)
+// handlers.onError(error)             - optional, wird bei fehlgeschlagenem Laden aufgerufen
+// apiBase: Präfix der Run-Endpunkte, z.B. '/api/runs/2' (Standard: '/api' für den Standard-Run)
+// options.compact: kompakte Darstellung für Snapshot und Socket-Events (siehe oben)
+function createStateSync(socket, handlers, apiBase = '/api', options = {}) {
+    let stateVersion = null;
+    let bootId = null;
+    let configHash = null;
+    let bundle = null;
+    let busy = false;
+    let resyncPending = false;
+
+    async function ensureConfig(hash) {
+        if (!hash || hash === configHash) return;
+        const response = await fetch(`/api/config_bundle/${encodeURIComponent(hash)}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        bundle = await response.json();
+        handlers.applyConfig(bundle);
+        configHash = bundle.config_hash;
+    }
+
+    // config_changed trägt nur das Diff zum vorherigen Bundle; passt der eigene Stand nicht, wird geladen.
+    async function applyConfigDiff(data) {
+        if (data.config_hash === configHash) return;
+        if (!bundle || data.previous_hash !== configHash) {
+            await ensureConfig(data.config_hash);
+            return;
+        }
+        Object.entries(data.diff).forEach(([key, diff]) => applyListDiff(bundle[key], diff));
+        bundle.config_hash = data.config_hash;
+        configHash = data.config_hash;
+        handlers.applyConfig(bundle);
+    }
+
+    // Wendet ein Event an; Config-Events werden hier behandelt, alle anderen von der Seite.
+    async function applyEvent(event, data) {
+        if (event === 'config_changed') {
+            await applyConfigDiff(data);
+            return true;
+        }
+        if (CONFIG_EVENTS.includes(event)) {
+            await ensureConfig(data.config_hash);
+            return true;
+        }
+        return applyLocal(event, data);
+    }
+
+    // Wendet ein Event ohne Nachladen an; false erzwingt einen neuen Snapshot.
+    function applyLocal(event, data) {
+        if (DERIVED_EVENTS.includes(event)) {
+            return !handlers.applyDerived || handlers.applyDerived(event, data) !== false;
+        }
+        return handlers.applyChange(event, data) !== false;
+    }
+
+    async function loadSnapshot() {
+        const headers = options.compact ? { Accept: COMPACT_MIMETYPE } : {};
+        const response = await fetch(`${apiBase}/data`, { cache: 'no-cache', headers }); // Revalidierung per ETag, bei unverändertem Stand antwortet der Server mit 304
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        let data = await response.json();
+        await ensureConfig(data.config_hash);
+        if (data.format) {
+            data = decodeCompactSnapshot(data, bundle);
+        }
+        handlers.applySnapshot(data);
+        stateVersion = data.state_version;
+        bootId = data.boot_id;
+        handlers.render();
+    }
+
+    async function catchUp() {
+        const response = await fetch(`${apiBase}/changes?since=${stateVersion}&boot_id=${encodeURIComponent(bootId)}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const result = await response.json();
+        if (result.truncated) {
+            await loadSnapshot();
+            return;
+        }
+        await applyChanges(result.changes);
+    }
+
+    // Wendet eine lückenlose Folge von Änderungen an (aus /api/changes oder einem 'changes_batch').
+    async function applyChanges(changes) {
+        let applied = false;
+        for (const change of changes) {
+            if (change.seq <= stateVersion) continue;
+            if (change.seq !== stateVersion + 1 || !(await applyEvent(change.event, change.data))) {
+                await loadSnapshot();
+                return;
+            }
+            stateVersion = change.seq;
+            applied = true;
+        }
+        if (applied) {
+            handlers.render();
+        }
+    }
+
+    // Es läuft immer höchstens ein Ladevorgang; währenddessen eintreffende Lücken lösen danach einen weiteren aus.
+    async function run(task) {
+        if (busy) {
+            resyncPending = true;
+            return;
+        }
+        busy = true;
+        try {
+            await task();
+        } catch (error) {
+            console.error('Fehler bei der Synchronisation:', error);
+            if (handlers.onError) handlers.onError(error);
+        } finally {
+            busy = false;
+        }
+        if (resyncPending) {
+            resyncPending = false;
+            run(stateVersion === null ? loadSnapshot : catchUp);
+        }
+    }
+
+    function onEvent(event, data) {
+        if (stateVersion === null || busy) {
+            // Snapshot oder Nachladen läuft noch; danach wird der Stand erneut abgeglichen
+            resyncPending = true;
+            return;
+        }
+        if (!data || typeof data.seq !== 'number') {
+            run(loadSnapshot);
+            return;
+        }
+        if (data.seq <= stateVersion) return; // Bereits bekannt
+        if (data.seq !== stateVersion + 1) {
+            run(catchUp); // Lücke: fehlende Änderungen nachladen
+            return;
+        }
+        if (CONFIG_EVENTS.includes(event)) {
+            // Bundle muss erst geladen werden, daher über die Ladewarteschlange
+            run(async () => {
+                await applyEvent(event, data);
+                stateVersion = data.seq;
+                handlers.render();
+            });
+            return;
+        }
+        if (!applyLocal(event, data)) {
+            run(loadSnapshot);
+            return;
+        }
+        stateVersion = data.seq;
+        if (DERIVED_EVENTS.includes(event) && !handlers.applyDerived) return; // Nichts geändert
+        handlers.render();
+    }
+
+    function onBatch(batch) {
+        const changes = (batch && batch.changes) || [];
+        if (changes.length === 0) return;
+        if (stateVersion === null || busy) {
+            resyncPending = true;
+            return;
+        }
+        if (changes[0].seq > stateVersion + 1) {
+            run(catchUp); // Lücke vor dem Batch
+            return;
+        }
+        run(() => applyChanges(changes));
+    }
+
+    // Kompakte Frames sind gegen ein bestimmtes Bundle kodiert; passt es nicht, wird über /api/changes nachgeladen.
+    function onCompact(frame) {
+        if (stateVersion === null || busy) {
+            resyncPending = true;
+            return;
+        }
+        if (!bundle || frame.h !== configHash) {
+            run(catchUp);
+            return;
+        }
+        onBatch({ changes: decodeCompactChanges(frame, bundle) });
+    }
+
+    socket.on('changes_batch', onBatch);
+    socket.on('changes_compact', onCompact);
+
+    SYNC_EVENTS.concat(DERIVED_EVENTS).forEach(event => {
+        socket.on(event, (data) => onEvent(event, data));
+    });
+
+    socket.on('connect', () => {
+        run(stateVersion === null ? loadSnapshot : catchUp);
+    });
+
+    return {
+        refresh: () => run(loadSnapshot),
+        getStateVersion: () => stateVersion,
+    };
+}
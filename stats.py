@@ -0,0 +1,242 @@
+# stats.py
+"""Statistiken über alle Runs für /api/stats.
+
+- Pokémon pro Route: wie oft welche Art auf einer Route (nach Namen, über alle Runs) gefangen wurde.
+- Todesrate pro Route: Anteil der Routen mit diesem Namen, deren Status ein Tod ist (wie in link_view).
+- Routen pro Meilenstein: wie viele Routen ein Run schon genutzt hatte (mindestens ein Fang eingetragen),
+  als der Orden zum ersten Mal als erhalten markiert wurde. Die Zeitpunkte stammen aus dem Journal; es zählt
+  nur der Durchgang seit dem letzten (nicht rückgängig gemachten) Reset des Runs.
+
+Die Zähler werden einmal per SQL (GROUP BY über alle Runs) gebaut und danach mit den Änderungen aus dem
+Change-Log fortgeschrieben. Für die Differenz braucht apply() den Zustand des Runs vor der Änderung
+(state_store.RunStore). Was sich nicht als Differenz ausdrücken lässt (Undo eines Resets, gelöschte
+Routen, Importe) oder ohne Speicher-Zustand ankommt, markiert die Zähler als veraltet; der nächste Abruf
+baut sie dann neu.
+"""
+import heapq
+import threading
+from collections import Counter
+
+from sqlalchemy import text, bindparam
+
+from link_view import link_state, LINK_DEAD, LINK_FAILED
+from journal import RESET_EVENTS
+
+TOP_SPECIES = 5  # So viele Arten pro Route stehen in der Antwort
+
+# Gleiche Einteilung wie link_view.link_state, als SQL
+_DEAD_SQL = "(status = 'Death Link' OR status LIKE 'Death (%')"
+_FAILED_SQL = "status = 'No Catch'"
+
+_SPECIES_QUERY = text(
+    "SELECT r.name, c.pokemon_name, COUNT(*) FROM pokemon_catches c JOIN routes r ON r.id = c.route_id "
+    "GROUP BY r.name, c.pokemon_name")
+_ROUTES_QUERY = text(
+    f"SELECT name, COUNT(*), SUM(CASE WHEN {_DEAD_SQL} THEN 1 ELSE 0 END), "
+    f"SUM(CASE WHEN {_FAILED_SQL} THEN 1 ELSE 0 END) FROM routes GROUP BY name")
+
+
+def _reset_events():
+    # Als gebundene Liste, nicht als Python-Repr im SQL-Text
+    return bindparam('reset_events', list(RESET_EVENTS), expanding=True)
+
+
+# Letzter Reset je Run, der nicht per Undo zurückgenommen wurde; nur Events danach zählen
+_RESETS_CTE = (
+    "WITH resets AS (SELECT run_id, MAX(id) AS reset_id FROM journal_events "
+    "WHERE event IN :reset_events "
+    "AND id NOT IN (SELECT undo_of FROM journal_events WHERE undo_of IS NOT NULL) GROUP BY run_id) ")
+# Routen mit mindestens einem eingetragenen Fang laut Journal, pro Run
+_CAUGHT_ROUTES_QUERY = text(
+    _RESETS_CTE
+    + "SELECT DISTINCT e.run_id, json_extract(e.data, '$.route_id') FROM journal_events e "
+    "LEFT JOIN resets r ON r.run_id = e.run_id "
+    "WHERE e.event = 'catch_updated' AND json_extract(e.data, '$.pokemon_name') IS NOT NULL "
+    "AND e.id > COALESCE(r.reset_id, 0)").bindparams(_reset_events())
+# Erstes "erhalten" je Run und Orden und die Zahl der Routen mit Fängen davor
+_MILESTONES_QUERY = text(
+    _RESETS_CTE
+    + "SELECT m.run_id, m.order_number, "
+    "(SELECT COUNT(DISTINCT json_extract(c.data, '$.route_id')) FROM journal_events c "
+    " WHERE c.run_id = m.run_id AND c.id > m.reset_id AND c.id < m.first_id AND c.event = 'catch_updated' "
+    " AND json_extract(c.data, '$.pokemon_name') IS NOT NULL) "
+    "FROM (SELECT e.run_id, json_extract(e.data, '$.order_number') AS order_number, MIN(e.id) AS first_id, "
+    "      COALESCE(r.reset_id, 0) AS reset_id "
+    "      FROM journal_events e LEFT JOIN resets r ON r.run_id = e.run_id "
+    "      WHERE e.event = 'global_order_toggled' AND json_extract(e.data, '$.is_obtained') = 1 "
+    "      AND e.id > COALESCE(r.reset_id, 0) GROUP BY e.run_id, order_number) m").bindparams(_reset_events())
+
+# Events ohne Einfluss auf die Statistik
+_IGNORED_EVENTS = ('player_added', 'players_added', 'level_caps_updated')
+
+
+def _decrement(counter, key, delta=1):
+    # Keine Nullen stehen lassen, sonst unterscheiden sich fortgeschriebene und neu gebaute Zähler
+    counter[key] -= delta
+    if counter[key] <= 0:
+        del counter[key]
+
+
+def _status_class(status):
+    state = link_state(status, 0, 0)
+    return state if state in (LINK_DEAD, LINK_FAILED) else None
+
+
+class RunStats:
+    """Verlauf eines Runs, soweit die Statistik ihn braucht."""
+    __slots__ = ('caught_routes', 'milestones')
+
+    def __init__(self):
+        self.caught_routes = set()  # Routen-IDs, auf denen je ein Fang eingetragen wurde
+        self.milestones = {}  # order_number -> genutzte Routen beim ersten "erhalten"
+
+
+class StatsEngine:
+    """Zähler über alle Runs; version steigt mit jeder Änderung (für Caches und ETags)."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.dirty = True  # Erst der erste Abruf baut die Zähler, der Start bleibt schnell
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.species = {}  # Routenname -> Counter(Pokémon -> Fänge)
+        self.routes = Counter()  # Routenname -> Routen mit diesem Namen über alle Runs
+        self.dead = Counter()
+        self.failed = Counter()
+        self.runs = {}  # run_id -> RunStats
+
+    def _run(self, run_id):
+        run = self.runs.get(run_id)
+        if run is None:
+            run = self.runs[run_id] = RunStats()
+        return run
+
+    # --- Neuaufbau ---
+    def rebuild(self, session):
+        """Baut alle Zähler per SQL neu. Ändert sich währenddessen etwas, bleiben sie als veraltet markiert."""
+        with self.lock:
+            start_version = self.version
+        species = {}
+        for route_name, pokemon_name, count in session.execute(_SPECIES_QUERY):
+            species.setdefault(route_name, Counter())[pokemon_name] = count
+        routes, dead, failed = Counter(), Counter(), Counter()
+        for route_name, total, dead_count, failed_count in session.execute(_ROUTES_QUERY):
+            routes[route_name] = total
+            dead[route_name] = dead_count or 0
+            failed[route_name] = failed_count or 0
+        runs = {}
+        for run_id, route_id in session.execute(_CAUGHT_ROUTES_QUERY):
+            runs.setdefault(run_id, RunStats()).caught_routes.add(route_id)
+        for run_id, order_number, routes_used in session.execute(_MILESTONES_QUERY):
+            runs.setdefault(run_id, RunStats()).milestones[order_number] = routes_used
+
+        with self.lock:
+            self.species, self.routes, self.dead, self.failed, self.runs = species, routes, dead, failed, runs
+            self.dirty = self.version != start_version  # Änderungen während des Lesens: beim nächsten Mal neu
+            self.version += 1
+
+    def invalidate(self):
+        with self.lock:
+            self.dirty = True
+            self.version += 1
+
+    # --- Fortschreiben ---
+    def apply(self, run_id, store, event, data):
+        """Schreibt eine Änderung ein; `store` ist der Zustand des Runs VOR der Änderung (oder None)."""
+        if event in _IGNORED_EVENTS:
+            return
+        with self.lock:
+            self.version += 1
+            if self.dirty:
+                return
+            if store is None or not self._apply(run_id, store, event, data):
+                self.dirty = True
+
+    def _apply(self, run_id, store, event, data):
+        if event == 'catch_updated':
+            route = store.routes.get(data['route_id'])
+            if route is None:
+                return False
+            counter = self.species.setdefault(route.name, Counter())
+            old = store.catches.get((data['player_id'], data['route_id']))
+            new = data['pokemon_name'] or None
+            if old:
+                _decrement(counter, old)
+            if new:
+                counter[new] += 1
+                self._run(run_id).caught_routes.add(data['route_id'])
+            return True
+        if event == 'route_status_updated':
+            route = store.routes.get(data['route_id'])
+            if route is None:
+                return False
+            self._count_status(route.name, route.status, -1)
+            self._count_status(route.name, data['status_text'], 1)
+            return True
+        if event == 'global_order_toggled':
+            run = self._run(run_id)
+            if data['is_obtained'] and data['order_number'] not in run.milestones:
+                run.milestones[data['order_number']] = len(run.caught_routes)
+            return True
+        if event in ('route_added', 'routes_added'):
+            for route in data['routes'] if event == 'routes_added' else [data]:
+                self.routes[route['name']] += 1
+                self._count_status(route['name'], route.get('status'), 1)
+            return True
+        if event in RESET_EVENTS:
+            # Fänge (und bei full_db_reset die Routen) des Runs fallen weg, sein Verlauf beginnt von vorn
+            for (_, route_id), pokemon_name in store.catches.items():
+                route = store.routes.get(route_id)
+                if route is not None and self.species.get(route.name):
+                    _decrement(self.species[route.name], pokemon_name)
+            for route in store.routes.values():
+                self._count_status(route.name, route.status, -1)
+                if event == 'full_db_reset':
+                    _decrement(self.routes, route.name)
+            self.species = {name: counter for name, counter in self.species.items() if counter}
+            self.runs.pop(run_id, None)
+            return True
+        return False  # Gelöschte Routen, wiederhergestellte Runs: neu aufbauen
+
+    def _count_status(self, route_name, status, delta):
+        status_class = _status_class(status)
+        if status_class == LINK_DEAD:
+            self.dead[route_name] += delta
+        elif status_class == LINK_FAILED:
+            self.failed[route_name] += delta
+
+    # --- Ausgabe ---
+    def to_payload(self, milestone_names=None, top=TOP_SPECIES):
+        """Statistik als Dict; milestone_names: order_number -> Name (z.B. aus level_caps.json)."""
+        milestone_names = milestone_names or {}
+        with self.lock:
+            routes = []
+            for route_name in sorted(set(self.routes) | set(self.species)):
+                total = self.routes.get(route_name, 0)
+                counter = self.species.get(route_name, Counter())
+                routes.append({
+                    'name': route_name,
+                    'runs': total,
+                    'dead': self.dead.get(route_name, 0),
+                    'failed': self.failed.get(route_name, 0),
+                    'death_rate': round(self.dead.get(route_name, 0) / total, 4) if total else None,
+                    'catches': sum(counter.values()),
+                    # Bei Gleichstand nach Namen, damit die Antwort nicht von der Einfügereihenfolge abhängt
+                    'top_species': [{'pokemon_name': name, 'count': count} for name, count in
+                                    heapq.nsmallest(top, counter.items(), key=lambda item: (-item[1], item[0]))],
+                })
+            by_milestone = {}
+            for run in self.runs.values():
+                for order_number, routes_used in run.milestones.items():
+                    by_milestone.setdefault(order_number, []).append(routes_used)
+            milestones = [{
+                'order_number': order_number,
+                'name': milestone_names.get(order_number),
+                'runs': len(values),
+                'avg_routes_used': round(sum(values) / len(values), 2),
+                'min_routes_used': min(values),
+                'max_routes_used': max(values),
+            } for order_number, values in sorted(by_milestone.items())]
+            return {'version': self.version, 'routes': routes, 'milestones': milestones}
@@ -0,0 +1,182 @@
+# wire_format.py
+"""Kompakte Darstellung von Snapshots (/api/data) und Socket-Events für schwache Geräte.
+
+Statt einer Liste von Objekten mit immer gleichen Schlüsseln wird jede Tabelle spaltenweise übertragen
+({'player_id': [...], 'route_id': [...], 'pokemon_name': [...]}). Routen- und Pokémon-Namen stehen als
+Index in die Namenslisten des Config-Bundles, das der Client ohnehin hat; Namen, die dort nicht
+vorkommen (eigene Routen, Tippfehler), bleiben Strings. Häufige Socket-Events gehen als Werteliste in
+fester Feldreihenfolge raus. Die Darstellung ist JSON, mit installiertem msgpack auch MessagePack.
+"""
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:  # Optional; ohne msgpack gibt es die kompakte Darstellung nur als JSON
+    msgpack = None
+
+COMPACT_VERSION = 1
+
+JSON_MIMETYPE = 'application/json'
+COMPACT_MIMETYPE = 'application/vnd.soullink.compact+json'
+MSGPACK_MIMETYPE = 'application/vnd.soullink.compact+msgpack'
+
+# Kurzname je Darstellung, z.B. für ETags und Metriken
+FORMAT_NAMES = {JSON_MIMETYPE: 'json', COMPACT_MIMETYPE: 'compact', MSGPACK_MIMETYPE: 'msgpack'}
+
+GZIP_LEVEL = 6  # Guter Kompromiss aus Größe und Zeit; der Snapshot wird nur einmal pro Version komprimiert
+
+# Tabellen des Snapshots und ihre Spalten in der Reihenfolge von models.read_run_data()
+SNAPSHOT_TABLES = {
+    'players': ('id', 'name'),
+    'routes': ('id', 'name', 'status'),
+    'catches': ('player_id', 'route_id', 'pokemon_name'),
+    'global_orders': ('order_number', 'is_obtained'),
+    'level_caps': ('name', 'order_number', 'max_level', 'adjusted_level'),
+}
+
+# Spalten, deren Werte als Index in eine Namensliste des Config-Bundles übertragen werden
+SNAPSHOT_DICT_COLUMNS = {
+    ('routes', 'name'): 'all_route_names',
+    ('catches', 'pokemon_name'): 'all_pokemon_names',
+}
+
+# Socket-Events, die als Werteliste übertragen werden, und ihre Felder ('seq' steht im Eintrag selbst)
+EVENT_FIELDS = {
+    'catch_updated': ('player_id', 'route_id', 'pokemon_name'),
+    'route_status_updated': ('route_id', 'status_text'),
+    'global_order_toggled': ('order_number', 'is_obtained'),
+    'link_updated': ('route_id', 'name', 'state', 'pokemon', 'counts'),
+}
+
+EVENT_DICT_FIELDS = {
+    ('catch_updated', 'pokemon_name'): 'all_pokemon_names',
+    ('link_updated', 'name'): 'all_route_names',
+    ('link_updated', 'pokemon'): 'all_pokemon_names',
+}
+
+
+def available_mimetypes():
+    """Darstellungen von /api/data; die erste ist der Standard."""
+    mimetypes = [JSON_MIMETYPE, COMPACT_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    return mimetypes
+
+
+class NameDictionary:
+    """Namenslisten eines Config-Bundles mit Index Name -> Position (bei Dubletten die erste)."""
+
+    def __init__(self, bundle):
+        self.config_hash = bundle.get('config_hash')
+        self._names = {key: list(bundle[key]) for key in ('all_route_names', 'all_pokemon_names')}
+        self._indexes = {}
+        for key, names in self._names.items():
+            index = {}
+            for position, name in enumerate(names):
+                index.setdefault(name, position)
+            self._indexes[key] = index
+
+    def encode(self, key, value):
+        if key is None:
+            return value
+        if isinstance(value, list):
+            return [self.encode(key, item) for item in value]
+        if isinstance(value, str):
+            return self._indexes[key].get(value, value)
+        return value
+
+    def decode(self, key, value):
+        if key is None:
+            return value
+        if isinstance(value, list):
+            return [self.decode(key, item) for item in value]
+        if isinstance(value, int) and not isinstance(value, bool):
+            return self._names[key][value]
+        return value
+
+
+def _names_for(names, config_hash):
+    # Passt das Wörterbuch nicht zum Bundle des Zustands, werden Namen als Strings übertragen
+    return names if names is not None and names.config_hash == config_hash else None
+
+
+# --- Snapshot ---
+def encode_snapshot(payload, names):
+    """Spaltenweise Darstellung eines Snapshots von /api/data (Dict, noch nicht serialisiert)."""
+    names = _names_for(names, payload.get('config_hash'))
+    compact = {key: value for key, value in payload.items() if key not in SNAPSHOT_TABLES}
+    compact['format'] = COMPACT_VERSION
+    for table, columns in SNAPSHOT_TABLES.items():
+        rows = payload.get(table, [])
+        encoded = {}
+        for column in columns:
+            values = [row[column] for row in rows]
+            key = SNAPSHOT_DICT_COLUMNS.get((table, column))
+            encoded[column] = names.encode(key, values) if names is not None and key else values
+        compact[table] = encoded
+    return compact
+
+
+def decode_snapshot(compact, names):
+    """Umkehrung von encode_snapshot; `names` muss zum config_hash des Snapshots passen."""
+    payload = {key: value for key, value in compact.items() if key not in SNAPSHOT_TABLES and key != 'format'}
+    for table, columns in SNAPSHOT_TABLES.items():
+        encoded = compact[table]
+        values = [names.decode(SNAPSHOT_DICT_COLUMNS.get((table, column)), encoded[column]) for column in columns]
+        payload[table] = [dict(zip(columns, row)) for row in zip(*values)]
+    return payload
+
+
+# --- Socket-Events ---
+def encode_changes(entries, names):
+    """Frame für 'changes_compact': {'h': Config-Hash des Wörterbuchs, 'c': [[seq, event, werte], ...]}.
+
+    `werte` ist bei Events aus EVENT_FIELDS eine Liste in Feldreihenfolge, sonst das Daten-Dict ohne 'seq'.
+    """
+    return {'h': names.config_hash, 'c': [_encode_change(entry, names) for entry in entries]}
+
+
+def _encode_change(entry, names):
+    event, data = entry['event'], entry['data']
+    fields = EVENT_FIELDS.get(event)
+    if fields is not None and len(data) == len(fields) + 1 and all(field in data for field in fields):
+        values = [names.encode(EVENT_DICT_FIELDS.get((event, field)), data[field]) for field in fields]
+    else:
+        values = {key: value for key, value in data.items() if key != 'seq'}
+    return [entry['seq'], event, values]
+
+
+def decode_changes(frame, names):
+    """Umkehrung von encode_changes: Liste von {seq, event, data} wie im Change-Log."""
+    entries = []
+    for seq, event, values in frame['c']:
+        if isinstance(values, list):
+            fields = EVENT_FIELDS[event]
+            data = {field: names.decode(EVENT_DICT_FIELDS.get((event, field)), value)
+                    for field, value in zip(fields, values)}
+        else:
+            data = dict(values)
+        data['seq'] = seq
+        entries.append({'seq': seq, 'event': event, 'data': data})
+    return entries
+
+
+# --- Serialisierung ---
+def serialize(obj, mimetype):
+    """Kompakte Darstellung als Bytes im gewünschten Format (COMPACT_MIMETYPE oder MSGPACK_MIMETYPE)."""
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def deserialize(body, mimetype):
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    return json.loads(body)
+
+
+def gzip_compress(body):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)  # mtime=0: gleiche Eingabe, gleiche Bytes
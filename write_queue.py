@@ -0,0 +1,119 @@
+# write_queue.py
+import gevent
+from gevent.event import AsyncResult, Event
+from gevent.lock import RLock
+
+# Haltbarkeitsstufen für häufige Einzeländerungen (Fänge, Routenstatus)
+WRITE_MODE_SYNC = 'sync'  # Jede Änderung eine eigene Transaktion (Standard, bisheriges Verhalten)
+WRITE_MODE_BATCHED = 'batched'  # Group-Commit: Antwort erst nach dem gemeinsamen Commit, nichts geht verloren
+WRITE_MODE_ASYNC = 'async'  # Write-Behind: Antwort sofort, bei Absturz fehlt höchstens das letzte Flush-Intervall
+WRITE_MODES = (WRITE_MODE_SYNC, WRITE_MODE_BATCHED, WRITE_MODE_ASYNC)
+
+
+class WriteBehindQueue:
+    """Sammelt Änderungen im Prozess und schreibt sie gebündelt in einer Transaktion.
+
+    Änderungen werden über einen Schlüssel (z.B. ('catch', player_id, route_id)) identifiziert; schreibt
+    jemand dieselbe Zelle erneut, bevor geflusht wurde, gewinnt der letzte Wert und es entsteht nur ein
+    Schreibvorgang. Ein Hintergrund-Greenlet flusht spätestens nach `flush_interval` Sekunden oder sobald
+    `max_batch` Änderungen anstehen.
+
+    apply_operation(session, key, value) schreibt eine Änderung in die Session und gibt (event, data) für
+    den Broadcast zurück. on_flushed(changes) wird nach dem Commit mit allen (event, data) aufgerufen.
+    """
+
+    def __init__(self, session_factory, apply_operation, on_flushed, flush_interval=0.005, max_batch=100):
+        self.session_factory = session_factory
+        self.apply_operation = apply_operation
+        self.on_flushed = on_flushed
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._pending = {}  # key -> (value, [AsyncResult, ...])
+        self._lock = RLock()
+        self._wakeup = Event()
+        self._worker = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, key, value):
+        """Reiht eine Änderung ein; das AsyncResult wird nach dem Commit (oder mit dem Fehler) gesetzt."""
+        result = AsyncResult()
+        with self._lock:
+            _, waiters = self._pending.pop(key, (None, []))
+            waiters.append(result)
+            self._pending[key] = (value, waiters)  # Neu einfügen, damit die Reihenfolge der letzten Änderung gilt
+            pending = len(self._pending)
+
+        if self._worker is None or self._worker.dead:
+            self._worker = gevent.spawn(self._run)
+        if pending >= self.max_batch:
+            gevent.spawn(self.flush)
+        else:
+            self._wakeup.set()
+        return result
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            gevent.sleep(self.flush_interval)  # Weitere Änderungen einsammeln
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Fehler beim Schreiben der gebündelten Änderungen: {e}")
+
+    def flush(self):
+        """Schreibt alle anstehenden Änderungen in einer Transaktion; gibt die Zahl der geschriebenen zurück.
+
+        Scheitert der gemeinsame Commit, wird jede Änderung einzeln in einer eigenen Transaktion wiederholt:
+        nur wessen Änderung auch dann scheitert, bekommt den Fehler, alle anderen werden normal geschrieben.
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = {}
+
+            failed = {}  # key -> Exception
+            try:
+                changes = self._write([(key, value) for key, (value, _) in batch.items()])
+            except Exception as e:
+                print(f"Gebündelter Commit fehlgeschlagen ({e}), schreibe {len(batch)} Änderungen einzeln")
+                changes = []
+                for key, (value, _) in batch.items():
+                    try:
+                        changes.extend(self._write([(key, value)]))
+                    except Exception as single_error:
+                        print(f"Änderung {key} verworfen: {single_error}")
+                        failed[key] = single_error
+
+            # Noch unter dem Lock, damit Broadcasts in Commit-Reihenfolge rausgehen. Geschrieben ist dann schon
+            # alles; scheitert das Verteilen, dürfen die Wartenden trotzdem nicht hängen bleiben.
+            try:
+                self.on_flushed([change for change in changes if change is not None])
+            except Exception as e:
+                print(f"Fehler beim Verteilen der geschriebenen Änderungen: {e}")
+
+        for key, (_, waiters) in batch.items():
+            error = failed.get(key)
+            for waiter in waiters:
+                if error is None:
+                    waiter.set(True)
+                else:
+                    waiter.set_exception(error)
+        return len(batch) - len(failed)
+
+    def _write(self, operations):
+        """Schreibt [(key, value)] in einer Transaktion und gibt die Änderungen für on_flushed zurück."""
+        session = self.session_factory()
+        try:
+            changes = [self.apply_operation(session, key, value) for key, value in operations]
+            session.commit()
+            return changes
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()